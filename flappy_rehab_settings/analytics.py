@@ -0,0 +1,276 @@
+"""Streaming analytics over recorded sessions (see recorder.py).
+
+Files are memory-mapped and walked one chunk at a time as NumPy record arrays, so memory stays
+flat however long a session is; files are spread over a process pool.
+
+Per session (the input signal is the value the game used, or the raw sensor in flap mode):
+    rom_lo, rom_hi, rom   5th / 95th percentile of the input signal, and their difference
+    time_in_gap           share of the time spent between pipes with the bird inside the gap
+    reaction_ms           median time from a new pipe becoming the next obstacle to the input
+                          moving towards its gap (position mode only)
+    jerk_rms              RMS third derivative of the input signal, 1/s^3 (lower = smoother)
+    attempts, score_best, score_mean, score_slope (points gained per attempt)
+
+    python analytics.py sessions/ --csv summary.csv
+    python analytics.py sessions/*.frrec --by-preset --workers 4
+"""
+from __future__ import annotations
+import argparse, csv, glob, mmap, os, time, zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from recorder import SessionReader, RECORD, CHUNK, MAX_PIPES
+from entities import Bird
+from settings import Settings, preset_of
+from config import WINDOW_H
+
+# one recorder.RECORD as a NumPy structured type (same offsets as its struct format)
+RECORD_DTYPE = np.dtype({
+    "names": ["t", "dt", "frame", "attempt", "raw", "value", "flap", "flags", "score",
+              "bird_y", "bird_vy", "npipes", "pipes"],
+    "formats": ["<f8", "<f8", "<u4", "<u2", "<f4", "<f8", "u1", "u1", "<u2",
+                "<f4", "<f4", "u1", ("<i2", (MAX_PIPES, 4))],   # pipes: x, gap_y, gap, width
+    "offsets": [0, 8, 16, 20, 22, 26, 34, 35, 36, 38, 42, 46, 48],
+    "itemsize": RECORD.size,
+})
+
+_BIRD = Bird(Settings()).rect    # x and size never change; only the centre y is recorded
+HIST_BINS = 1000                 # input-signal histogram resolution (for the ROM percentiles)
+REACT_DELTA = 0.05               # input movement towards the new gap that counts as a reaction
+REACT_TIMEOUT = 3.0              # seconds; no reaction within this is not counted
+REACT_SMOOTH = 12                # records averaged before looking for the reaction (100 ms at 120 Hz)
+COLUMNS = ("file", "created", "preset", "control_mode", "duration_s", "frames", "attempts",
+           "score_best", "score_mean", "score_slope", "rom_lo", "rom_hi", "rom",
+           "time_in_gap", "reaction_ms", "reactions", "jerk_rms")
+
+def iter_chunks(reader: SessionReader, mm) -> np.ndarray:
+    """Yield each chunk of an open recording as a record array (zero-copy when uncompressed)."""
+    view = memoryview(mm)
+    try:
+        for off, _, _ in reader.index:
+            n, plen, _, _ = CHUNK.unpack_from(mm, off)
+            start = off + CHUNK.size
+            if reader.compressed:
+                yield np.frombuffer(zlib.decompress(view[start:start + plen]), RECORD_DTYPE)
+            else:
+                yield np.frombuffer(view, RECORD_DTYPE, n, start)
+    finally:
+        view.release()
+
+class SessionStats:
+    """Per-session accumulators, fed chunk by chunk; state that spans chunks is carried over."""
+    def __init__(self, meta: dict):
+        s = meta.get("settings", {})
+        self.position = s.get("control_mode", "position") == "position"
+        h = meta.get("size", (0, WINDOW_H))[1]
+        self.floor = h - s.get("ground_height", Settings.ground_height)
+        self.hist = np.zeros(HIST_BINS, np.int64)
+        self.frames = 0
+        self.duration = 0.0
+        self.between = 0.0        # seconds with a pipe overlapping the bird horizontally
+        self.in_gap = 0.0         # ... of which the bird was inside the gap
+        self.jerk_sq = 0.0
+        self.jerk_n = 0
+        self.reactions = []
+        self.final_scores = {}    # attempt -> last score seen
+        self._tail = None         # last few distinct input samples (t, v, attempt) for the jerk
+        self._target = -1         # gap y of the next obstacle at the end of the previous chunk
+        self._pending = None      # (t0, v0, direction, attempt) waiting for a reaction
+        self._sm_tail = np.zeros(0)
+
+    def add(self, a: np.ndarray):
+        n = len(a)
+        if not n:
+            return
+        self.frames += n
+        dt = a["dt"]
+        self.duration += float(dt.sum())
+        sig = a["value"] if self.position else a["raw"].astype(np.float64)
+        ok = ~np.isnan(sig)     # all False for keyboard sessions: there is no signal to measure
+        if ok.any():
+            self.hist += np.bincount(np.clip((sig[ok] * HIST_BINS).astype(np.int64), 0, HIST_BINS - 1),
+                                     minlength=HIST_BINS)
+
+        att = a["attempt"]
+        last = np.flatnonzero(np.r_[att[1:] != att[:-1], True])
+        self.final_scores.update(zip(att[last].tolist(), a["score"][last].tolist()))
+
+        # time in gap: pipes overlapping the bird horizontally, bird fully between the openings
+        p = a["pipes"].astype(np.int32)
+        px, gy, gap, pw = p[..., 0], p[..., 1], p[..., 2], p[..., 3]
+        live = np.arange(MAX_PIPES) < a["npipes"][:, None]
+        over = live & (px < _BIRD.right) & (px + pw > _BIRD.left)
+        top = np.round(a["bird_y"] - _BIRD.height / 2)[:, None]
+        inside = over & (top >= gy - gap // 2) & (top + _BIRD.height <= gy + gap // 2)
+        self.between += float(dt[over.any(1)].sum())
+        self.in_gap += float(dt[inside.any(1)].sum())
+
+        if self.position:
+            ahead = live & (px + pw >= _BIRD.left)
+            k = ahead.argmax(1)
+            target = np.where(ahead.any(1), gy[np.arange(n), k], -1)
+            self._reactions(a["t"], self._smooth(sig), att, target)
+        if ok.any():
+            self._jerk(a["t"][ok], sig[ok], att[ok])
+
+    def _smooth(self, sig):
+        # moving average so sensor noise alone does not count as a reaction
+        x = np.r_[self._sm_tail, sig]
+        self._sm_tail = x[-(REACT_SMOOTH - 1):]
+        c = np.cumsum(np.r_[0.0, x])
+        i = np.arange(1, len(x) + 1)
+        lo = np.maximum(i - REACT_SMOOTH, 0)
+        return ((c[i] - c[lo]) / (i - lo))[-len(sig):]
+
+    def _reactions(self, t, sig, att, target):
+        prev = np.r_[self._target, target[:-1]]
+        events = np.flatnonzero((target != prev) & (target >= 0))
+        self._target = int(target[-1])
+        start = 0
+        for i in events.tolist() + [len(t)]:
+            self._resolve(t, sig, att, start, i)
+            if i == len(t):
+                break
+            v0 = sig[i]
+            want = (self.floor - target[i]) / self.floor - v0
+            self._pending = None
+            if not np.isnan(v0) and abs(want) >= 2 * REACT_DELTA:
+                self._pending = (t[i], v0, 1.0 if want > 0 else -1.0, att[i])
+            start = i + 1
+
+    def _resolve(self, t, sig, att, lo, hi):
+        if self._pending is None or lo >= hi:
+            return
+        t0, v0, direction, attempt = self._pending
+        moved = ((sig[lo:hi] - v0) * direction >= REACT_DELTA) & (att[lo:hi] == attempt)
+        j = int(moved.argmax())
+        if moved[j] and t[lo + j] - t0 <= REACT_TIMEOUT:
+            self.reactions.append(t[lo + j] - t0)
+            self._pending = None
+        elif t[hi - 1] - t0 > REACT_TIMEOUT or (att[lo:hi] != attempt).any():
+            self._pending = None
+
+    def _jerk(self, t, v, att):
+        if not len(v):
+            return
+        # several physics steps share one input reading; collapse repeats to the distinct samples
+        keep = np.r_[True, v[1:] != v[:-1]]
+        t, v, att = t[keep], v[keep], att[keep]
+        if self._tail is not None:
+            tt, tv, ta = self._tail
+            # drop a carried sample that this chunk merely repeats
+            if len(v) and len(tv) and v[0] == tv[-1]:
+                t, v, att = t[1:], v[1:], att[1:]
+            t, v, att = np.r_[tt, t], np.r_[tv, v], np.r_[ta, att]
+        self._tail = (t[-3:], v[-3:], att[-3:])
+        if len(v) < 4:
+            return
+        d1 = np.diff(v) / np.diff(t)
+        t1 = (t[1:] + t[:-1]) / 2
+        d2 = np.diff(d1) / np.diff(t1)
+        t2 = (t1[1:] + t1[:-1]) / 2
+        d3 = np.diff(d2) / np.diff(t2)
+        d3 = d3[att[3:] == att[:-3]]      # windows that straddle a restart are meaningless
+        self.jerk_sq += float(np.square(d3).sum())
+        self.jerk_n += len(d3)
+
+    def summary(self) -> dict:
+        total = self.hist.sum()
+        rom_lo = rom_hi = float("nan")
+        if total:
+            cum = np.cumsum(self.hist)
+            rom_lo = int(np.searchsorted(cum, 0.05 * total)) / HIST_BINS
+            rom_hi = int(np.searchsorted(cum, 0.95 * total)) / HIST_BINS
+        scores = np.array([s for _, s in sorted(self.final_scores.items())], np.float64)
+        slope = float(np.polyfit(np.arange(len(scores)), scores, 1)[0]) if len(scores) >= 2 else 0.0
+        return {
+            "duration_s": round(self.duration, 2),
+            "frames": self.frames,
+            "attempts": len(scores),
+            "score_best": int(scores.max()) if len(scores) else 0,
+            "score_mean": round(float(scores.mean()), 3) if len(scores) else 0.0,
+            "score_slope": round(slope, 4),
+            "rom_lo": rom_lo, "rom_hi": rom_hi, "rom": round(rom_hi - rom_lo, 3),
+            "time_in_gap": round(self.in_gap / self.between, 4) if self.between else float("nan"),
+            "reaction_ms": round(float(np.median(self.reactions)) * 1e3, 1) if self.reactions else float("nan"),
+            "reactions": len(self.reactions),
+            "jerk_rms": round((self.jerk_sq / self.jerk_n) ** 0.5, 1) if self.jerk_n else float("nan"),
+        }
+
+def analyze_file(path: str) -> dict:
+    with SessionReader(path) as reader, open(path, "rb") as f:
+        stats = SessionStats(reader.meta)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        chunks = iter_chunks(reader, mm)
+        try:
+            for chunk in chunks:
+                stats.add(chunk)
+                del chunk     # uncompressed chunks are views of the map; let go before closing it
+        finally:
+            chunks.close()
+            mm.close()
+        s = reader.meta.get("settings", {})
+        created = reader.meta.get("created")
+    row = {"file": os.path.basename(path),
+           "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created)) if created else "",
+           "preset": preset_of(s), "control_mode": s.get("control_mode", "")}
+    row.update(stats.summary())
+    return row
+
+def by_preset(rows: list[dict]) -> dict[str, dict]:
+    """Score progression per preset, over sessions in recording order."""
+    out = {}
+    for preset in sorted({r["preset"] for r in rows}):
+        rs = sorted((r for r in rows if r["preset"] == preset), key=lambda r: r["created"])
+        means = np.array([r["score_mean"] for r in rs], np.float64)
+        slope = float(np.polyfit(np.arange(len(means)), means, 1)[0]) if len(means) >= 2 else 0.0
+        out[preset] = {"sessions": len(rs), "first": means[0], "last": means[-1], "best": max(r["score_best"] for r in rs),
+                       "slope_per_session": round(slope, 4), "minutes": round(sum(r["duration_s"] for r in rs) / 60, 1)}
+    return out
+
+def _expand(paths: list[str]) -> list[str]:
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(sorted(glob.glob(os.path.join(p, "*.frrec"))))
+        else:
+            out.extend(sorted(glob.glob(p)) or [p])
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("paths", nargs="+", help="recordings, globs or directories of .frrec files")
+    ap.add_argument("--csv", help="write the per-session summary table here")
+    ap.add_argument("--by-preset", action="store_true", help="also print score progression per preset")
+    ap.add_argument("--workers", type=int)
+    args = ap.parse_args(argv)
+
+    paths = _expand(args.paths)
+    t0 = time.perf_counter()
+    if len(paths) == 1 or args.workers == 1:
+        rows = [analyze_file(p) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count()) as ex:
+            rows = list(ex.map(analyze_file, paths, chunksize=4))
+    el = time.perf_counter() - t0
+    rows.sort(key=lambda r: r["created"])
+
+    print(f"{'file':<34} {'preset':<16} {'att':>4} {'best':>4} {'mean':>6} {'rom':>5} {'in gap':>6} "
+          f"{'react ms':>8} {'jerk':>8}")
+    for r in rows:
+        print(f"{r['file']:<34} {r['preset']:<16} {r['attempts']:>4} {r['score_best']:>4} {r['score_mean']:>6.2f} "
+              f"{r['rom']:>5.2f} {r['time_in_gap']:>6.1%} {r['reaction_ms']:>8.0f} {r['jerk_rms']:>8.0f}")
+    frames = sum(r["frames"] for r in rows)
+    print(f"{len(rows)} sessions, {frames} frames in {el:.2f}s ({frames / el if el else 0:,.0f} frames/s)")
+    if args.by_preset:
+        print(f"\n{'preset':<16} {'sessions':>8} {'first':>6} {'last':>6} {'best':>5} {'slope':>7} {'minutes':>8}")
+        for name, p in by_preset(rows).items():
+            print(f"{name:<16} {p['sessions']:>8} {p['first']:>6.2f} {p['last']:>6.2f} {p['best']:>5} "
+                  f"{p['slope_per_session']:>+7.3f} {p['minutes']:>8.1f}")
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=COLUMNS)
+            w.writeheader()
+            w.writerows(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Headless benchmark suite: Game scenes plus the entity/UI/settings hot paths.
+
+Runs under the SDL dummy video driver, so it needs no display or GPU.
+
+    python benchmark.py run --out baseline.json             # full suite
+    python benchmark.py run --out new.json --only playing   # names matching a regex
+    python benchmark.py compare baseline.json new.json --threshold 0.15   # exit 1 on regression
+
+Each benchmark is timed in `repeat` rounds of enough calls to last --min-time seconds;
+the median per-call time is what gets compared.
+"""
+from __future__ import annotations
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+import argparse, json, platform, re, statistics, sys, tempfile, time
+import pygame as pg
+
+SCENE_FRAMES = 60      # Game.update/draw calls per timed call of a scene benchmark
+WINDOW_SIZES = ((400, 600), (800, 1200))
+PIPE_DENSITIES = {"sparse": 2.0, "normal": 1.25, "dense": 0.45}   # pipe_spawn_every
+
+def timeit(fn, repeat: int = 5, min_time: float = 0.05) -> dict:
+    """Median/min seconds per call of fn() over `repeat` rounds."""
+    number, el = 1, 0.0
+    while True:   # calibrate: double until one round lasts min_time
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        el = time.perf_counter() - t0
+        if el >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    rounds = [el / number]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - t0) / number)
+    return {"median": statistics.median(rounds), "min": min(rounds), "number": number, "repeat": repeat}
+
+# ---------- benchmarks ----------
+# each factory returns the callable to time (setup happens outside the timed region)
+
+def _game(size, scene: str, spawn_every: float | None = None):
+    from game import Game
+    screen = pg.display.set_mode(size)
+    game = Game(screen)
+    game.settings_watcher.stop()
+    if spawn_every is not None:
+        game.settings.pipe_spawn_every = spawn_every
+        game.settings.control_mode = "position"
+        game.settings.input_mode = "slider"
+        game._action_start()
+        # warm up so the screen has its steady-state number of pipes
+        for _ in range(int(game.sim.w / -game.settings.pipe_speed * 60) + 60):
+            _play_frame(game)
+    else:
+        game.scene = scene
+    return game
+
+def _play_frame(game):
+    # steer like a patient who can see the gap; restart after a crash
+    sim = game.sim
+    gap = sim.pipes.next_gap(sim.bird.rect.left)
+    floor = sim.h - sim.settings.ground_height
+    game.slider.value = 0.5 if gap is None else (floor - gap) / floor
+    game.update(1 / 60)
+    if game.scene == "dead":
+        game.scene = "playing"
+        game.reset()
+
+def scene_update(size, scene, spawn_every=None):
+    game = _game(size, scene, spawn_every)
+    if spawn_every is None:
+        def run():
+            for _ in range(SCENE_FRAMES):
+                game.update(1 / 60)
+    else:
+        def run():
+            for _ in range(SCENE_FRAMES):
+                _play_frame(game)
+    return run
+
+def scene_draw(size, scene, spawn_every=None):
+    game = _game(size, scene, spawn_every)
+    def run():
+        for _ in range(SCENE_FRAMES):
+            game.draw()
+    return run
+
+def _pipes(n_pipes: int):
+    from entities import PipeManager, Course
+    from settings import Settings
+    s = Settings()
+    pm = PipeManager(400, 600, s, Course(1))
+    for i in range(n_pipes):   # evenly spaced from the bird onwards, like a long dense course
+        pm.spawn()
+        for r in pm.pipes[-1][:2]:
+            r.x = 60 + i * 90
+    s.pipe_speed = 0.0     # keep the population steady while timing
+    s.pipe_spawn_every = 1e9
+    return pm
+
+def pipes_update(n_pipes):
+    pm = _pipes(n_pipes)
+    return lambda: pm.update(1 / 120)
+
+def pipes_collides(n_pipes):
+    pm = _pipes(n_pipes)
+    rects = [pg.Rect(100, y, 28, 22) for y in range(0, 560, 40)]
+    def run():
+        for r in rects:
+            pm.collides(r)
+    return run
+
+def pipes_count_passed(n_pipes):
+    pm = _pipes(n_pipes)
+    r = pg.Rect(100, 260, 28, 22)
+    def run():
+        for p in pm.pipes:
+            p[2] = False
+        pm.count_passed(r)
+    return run
+
+def pipes_draw(n_pipes):
+    surf = pg.display.set_mode((400, 600))
+    pm = _pipes(n_pipes)
+    return lambda: pm.draw(surf)
+
+def ground_draw():
+    from entities import Ground
+    from settings import Settings
+    surf = pg.display.set_mode((400, 600))
+    g = Ground(400, 600, Settings())
+    return lambda: g.draw(surf)
+
+def button_draw():
+    from ui import Button
+    surf = pg.display.set_mode((400, 600))
+    b = Button((90, 200, 220, 44), "Settings")
+    return lambda: b.draw(surf)
+
+def hud_text():
+    from graphics import draw_hud_text
+    surf = pg.display.set_mode((400, 600))
+    n = [0]
+    def run():
+        n[0] = (n[0] + 1) % 50   # a score that changes now and then, like the HUD
+        draw_hud_text(surf, f"Score: {n[0] // 10}", 22, (10, 30))
+    return run
+
+def telemetry_frame():
+    from metrics import Telemetry
+    game = _game((400, 600), "menu")
+    t = Telemetry()
+    return lambda: t.frame(1 / 60, 0.004, game)
+
+def settings_load(tmpdir):
+    from settings import Settings, save_settings, load_settings
+    path = os.path.join(tmpdir, "settings.json")
+    save_settings(Settings(), path)
+    return lambda: load_settings(path)
+
+def suite(tmpdir: str) -> dict:
+    """name -> zero-arg factory returning the callable to time."""
+    out = {}
+    for w, h in WINDOW_SIZES:
+        tag = f"{w}x{h}"
+        for scene in ("menu", "settings"):
+            out[f"game.update/{scene}/{tag}"] = lambda s=(w, h), sc=scene: scene_update(s, sc)
+            out[f"game.draw/{scene}/{tag}"] = lambda s=(w, h), sc=scene: scene_draw(s, sc)
+        for dens, every in PIPE_DENSITIES.items():
+            out[f"game.update/playing-{dens}/{tag}"] = lambda s=(w, h), e=every: scene_update(s, "playing", e)
+            out[f"game.draw/playing-{dens}/{tag}"] = lambda s=(w, h), e=every: scene_draw(s, "playing", e)
+    for n in (4, 16, 64):
+        out[f"PipeManager.update/{n}"] = lambda n=n: pipes_update(n)
+        out[f"PipeManager.collides/{n}"] = lambda n=n: pipes_collides(n)
+        out[f"PipeManager.count_passed/{n}"] = lambda n=n: pipes_count_passed(n)
+        out[f"PipeManager.draw/{n}"] = lambda n=n: pipes_draw(n)
+    out["Ground.draw"] = ground_draw
+    out["Button.draw"] = button_draw
+    out["draw_hud_text"] = hud_text
+    out["Telemetry.frame"] = telemetry_frame
+    out["load_settings"] = lambda: settings_load(tmpdir)
+    return out
+
+# ---------- commands ----------
+def run_suite(only: str | None = None, repeat: int = 5, min_time: float = 0.05, log=print) -> dict:
+    pg.init()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in suite(tmp).items():
+            if only and not re.search(only, name):
+                continue
+            r = timeit(factory(), repeat, min_time)
+            if name.startswith("game."):
+                r["per_frame"] = r["median"] / SCENE_FRAMES
+            results[name] = r
+            log(f"{name:<40} {r['median'] * 1e6:>10.1f} us")
+    pg.quit()
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pg.version.ver,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        },
+        "results": results,
+    }
+
+def compare(base: dict, new: dict) -> list[tuple[str, float, float, float]]:
+    """Rows of (name, base s, new s, ratio) for benchmarks present in both."""
+    rows = []
+    for name, b in base["results"].items():
+        n = new["results"].get(name)
+        if n is not None:
+            rows.append((name, b["median"], n["median"], n["median"] / b["median"]))
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the suite and write a JSON result file")
+    r.add_argument("--out", default="benchmark.json")
+    r.add_argument("--only", metavar="REGEX")
+    r.add_argument("--repeat", type=int, default=5)
+    r.add_argument("--min-time", type=float, default=0.05, help="seconds per timing round")
+    c = sub.add_parser("compare", help="compare two result files")
+    c.add_argument("baseline")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10, help="flag slowdowns beyond this fraction")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "run":
+        res = run_suite(args.only, args.repeat, args.min_time)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+        print(f"{len(res['results'])} benchmarks -> {args.out}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    rows = compare(base, new)
+    regressions = 0
+    print(f"{'benchmark':<40} {'baseline':>10} {'new':>10} {'change':>8}   (us)")
+    for name, b, n, ratio in rows:
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = "  faster"
+        print(f"{name:<40} {b * 1e6:>10.1f} {n * 1e6:>10.1f} {ratio - 1:>+8.1%}{flag}")
+    unmatched = len(set(base["results"]) ^ set(new["results"]))
+    if unmatched:
+        print(f"{unmatched} benchmark(s) only in one of the files (skipped)")
+    if regressions:
+        print(f"{regressions} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,386 @@
+"""Session video capture, encoded off the game thread.
+
+    python main.py --capture run.frv                       # half size, 15 fps, delta + zlib
+    python main.py --capture run.mp4 --capture-fps 30      # ffmpeg, when it is on PATH
+    python main.py --capture frames/ --capture-scale 1     # one PNG per frame
+    python capture.py info run.frv
+    python capture.py play run.frv --speed 2
+    python capture.py export run.frv frames/              # PNGs, e.g. for ffmpeg -i frames/frame_%06d.png
+
+The game thread scales the presented frame straight into one slot of a fixed ring of frame
+buffers in shared memory (each slot is wrapped by a pygame Surface, so there is no extra copy)
+and posts the slot number to an encoder process. The encoder copies the pixels out, frees the
+slot and encodes: XOR against the previous frame + zlib with a keyframe every
+KEYFRAME_SECONDS (.frv), PNG files (a directory) or raw frames piped to ffmpeg (any other
+extension). Memory is bounded by the ring; when every slot is still waiting for the encoder
+the new frame is dropped and counted, the game never waits. The encoder reports its
+throughput, which FrameCapture.report() prints on close.
+
+.frv layout:
+    header   MAGIC, version, width, height, fps, meta length, meta JSON (pixel format, keyframes)
+    frame*   FRAME header (frame number, t, kind, payload bytes) + zlib payload
+    end      FRAME header with kind END, payload = encoder stats JSON
+"""
+from __future__ import annotations
+import argparse, json, multiprocessing, os, queue, shutil, struct, subprocess, sys, time, zlib
+import pygame as pg
+
+MAGIC = b"FRVID\x00\x01\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIHHfI")          # magic, version, width, height, fps, meta length
+FRAME = struct.Struct("<IdBI")              # frame number, t, kind, payload bytes
+KEY, DELTA, END = 0, 1, 2
+KEYFRAME_SECONDS = 2.0
+STATS_EVERY = 1.0                           # seconds between encoder stats updates
+
+def pick_codec(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".frv":
+        return "delta"
+    if not ext or os.path.isdir(path):
+        return "png"
+    return "ffmpeg"
+
+# ---------- sinks (encoder process) ----------
+class DeltaSink:
+    def __init__(self, path, size, fmt, fps):
+        import numpy as np
+        self.np = np
+        w, h = size
+        self.key_every = max(1, round(KEYFRAME_SECONDS * fps))
+        self.prev = np.zeros((w * h, 3), np.uint8)
+        self.delta = np.empty_like(self.prev)
+        self.n = 0
+        self.f = open(path, "wb")
+        mb = json.dumps(dict(pixel_format=fmt, keyframe_every=self.key_every, created=time.time())).encode("utf-8")
+        self.f.write(HEADER.pack(MAGIC, VERSION, w, h, fps, len(mb)))
+        self.f.write(mb)
+
+    def write(self, frame, seq: int, t: float) -> int:
+        if self.n % self.key_every == 0:
+            kind, payload = KEY, zlib.compress(frame, 1)
+        else:
+            self.np.bitwise_xor(frame, self.prev, out=self.delta)
+            kind, payload = DELTA, zlib.compress(self.delta, 1)
+        self.prev[...] = frame
+        self.n += 1
+        self.f.write(FRAME.pack(seq, t, kind, len(payload)))
+        self.f.write(payload)
+        return FRAME.size + len(payload)
+
+    def close(self, stats: dict):
+        tb = json.dumps(stats).encode("utf-8")
+        self.f.write(FRAME.pack(self.n, 0.0, END, len(tb)))
+        self.f.write(tb)
+        self.f.close()
+
+class PngSink:
+    def __init__(self, path, size, fmt, fps):
+        os.makedirs(path, exist_ok=True)
+        self.path, self.size, self.fmt = path, size, fmt
+
+    def write(self, frame, seq: int, t: float) -> int:
+        name = os.path.join(self.path, f"frame_{seq:06d}.png")
+        pg.image.save(pg.image.frombuffer(frame, self.size, self.fmt), name)
+        return os.path.getsize(name)
+
+    def close(self, stats: dict):
+        with open(os.path.join(self.path, "capture.json"), "w") as f:
+            json.dump(stats, f, indent=1)
+
+class FfmpegSink:
+    """Constant frame rate: frames the game did not produce (idle menu, drops) repeat the last one."""
+    def __init__(self, path, size, fmt, fps):
+        w, h = size
+        self.path = path
+        self.proc = subprocess.Popen(
+            [shutil.which("ffmpeg"), "-loglevel", "error", "-y", "-f", "rawvideo",
+             "-pix_fmt", "bgr24" if fmt == "BGR" else "rgb24", "-s", f"{w}x{h}", "-r", str(fps),
+             "-i", "-", "-pix_fmt", "yuv420p", path], stdin=subprocess.PIPE)
+        self.last = None
+        self.n = 0
+
+    def write(self, frame, seq: int, t: float) -> int:
+        out = self.proc.stdin
+        while self.last is not None and self.n < seq:
+            out.write(self.last)
+            self.n += 1
+        self.last = frame.tobytes()
+        out.write(self.last)
+        self.n += 1
+        return 0   # ffmpeg owns the file; its size is reported on close
+
+    def close(self, stats: dict):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+SINKS = {"delta": DeltaSink, "png": PngSink, "ffmpeg": FfmpegSink}
+
+def _encode_main(raw, states, work, stats_q, path, codec, size, fmt, fps):
+    import numpy as np
+    w, h = size
+    slots = np.frombuffer(raw, np.uint8).reshape(len(states), w * h, 4)
+    frame = np.empty((w * h, 3), np.uint8)
+    try:
+        sink = SINKS[codec](path, size, fmt, fps)
+    except (OSError, ImportError) as e:
+        stats_q.put(dict(error=f"{type(e).__name__}: {e}"))
+        return
+    st = dict(codec=codec, frames=0, bytes_in=0, bytes_out=0, busy_s=0.0, elapsed_s=0.0)
+    stats_q.put(dict(st))     # ready
+    t_start = last_report = time.perf_counter()
+    while True:
+        item = work.get()
+        if item is None:
+            break
+        slot, t = item
+        t0 = time.perf_counter()
+        frame[...] = slots[slot, :, :3]    # drop the padding byte
+        states[slot] = 0                   # the game may reuse the slot now
+        st["bytes_out"] += sink.write(frame, round(t * fps), t)
+        t1 = time.perf_counter()
+        st["frames"] += 1
+        st["bytes_in"] += frame.nbytes
+        st["busy_s"] += t1 - t0
+        if t1 - last_report >= STATS_EVERY:
+            st["elapsed_s"] = t1 - t_start
+            stats_q.put(dict(st))
+            last_report = t1
+    st["elapsed_s"] = time.perf_counter() - t_start
+    sink.close(st)
+    if codec != "png":
+        st["bytes_out"] = os.path.getsize(path) if os.path.exists(path) else 0
+    stats_q.put(st)
+
+# ---------- game thread ----------
+def _pixel_format(surf: pg.Surface) -> str | None:
+    """Byte order of a 32-bit surface as frombuffer spells it, or None for anything else."""
+    if surf.get_bitsize() != 32:
+        return None
+    return {0xFF0000: "BGR", 0xFF: "RGB"}.get(surf.get_masks()[0])
+
+class FrameCapture:
+    def __init__(self, path: str, screen_size, fps: float = 15.0, scale: float = 0.5,
+                 slots: int = 8, codec: str | None = None, like: pg.Surface | None = None):
+        self.codec = codec or pick_codec(path)
+        if self.codec == "ffmpeg" and not shutil.which("ffmpeg"):
+            path = os.path.splitext(path)[0] + ".frv"
+            print(f"capture: ffmpeg not found on PATH, writing {path} instead")
+            self.codec = "delta"
+        self.path = path
+        self.fps = fps
+        self.period = 1.0 / fps
+        sw, sh = screen_size
+        # even sizes: yuv420p (ffmpeg's default output) needs them
+        self.size = w, h = max(2, int(sw * scale) & ~1), max(2, int(sh * scale) & ~1)
+        fmt = _pixel_format(like) if like is not None else None
+        self.fmt = fmt or "BGR"
+        self._direct = fmt is not None      # same layout as the screen: scale straight into the slot
+        self._tmp = None if self._direct else pg.Surface(self.size)
+        self.frames = 0
+        self.dropped = 0          # frames lost because every slot was still waiting on the encoder
+        self.copy_ns = 0
+        self.encoder = {}
+
+        ctx = multiprocessing.get_context("spawn")   # a forked child would share SDL's state
+        slot_bytes = w * h * 4
+        self._raw = ctx.RawArray("B", slot_bytes * slots)
+        self._states = ctx.RawArray("b", slots)      # 1 = waiting for the encoder
+        view = memoryview(self._raw).cast("B")
+        self._surfs = [pg.image.frombuffer(view[i * slot_bytes:(i + 1) * slot_bytes], self.size, self.fmt + "A")
+                       for i in range(slots)]
+        self._slot = 0
+        self._work = ctx.Queue()
+        self._stats = ctx.Queue()
+        self._proc = ctx.Process(target=_encode_main, name="capture-encoder", daemon=True,
+                                 args=(self._raw, self._states, self._work, self._stats,
+                                       path, self.codec, self.size, self.fmt, fps))
+        self._proc.start()
+        # a spawned interpreter takes a moment to start; frames grabbed before that would only be dropped
+        self.encoder = self._wait_ready(timeout=60)
+        if "error" in self.encoder:
+            self._proc.join()
+            raise RuntimeError(f"capture: {self.encoder['error']}")
+        self._t0 = None
+        self._next = 0.0
+
+    def _wait_ready(self, timeout: float) -> dict:
+        """The encoder's first stats message; fails fast if the process dies before sending one."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self._stats.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            if not self._proc.is_alive():
+                try:
+                    return self._stats.get(timeout=0.1)    # sent just before it exited
+                except queue.Empty:
+                    raise RuntimeError(f"capture: encoder exited with code {self._proc.exitcode}") from None
+            if time.monotonic() > deadline:
+                self._proc.terminate()
+                self._proc.join()
+                raise RuntimeError(f"capture: encoder not ready after {timeout:.0f}s")
+
+    def grab(self, screen: pg.Surface, now: float | None = None) -> bool:
+        """Copy the presented frame if one is due; never waits for the encoder."""
+        now = time.perf_counter() if now is None else now
+        if self._t0 is None:
+            self._t0 = self._next = now
+        if now < self._next:
+            return False
+        self._next += self.period
+        if self._next <= now:           # after a stall (idle menu) restart the schedule
+            self._next = now + self.period
+        i = self._slot
+        if self._states[i]:             # the ring is full: the encoder has fallen behind
+            self.dropped += 1
+            return False
+        t0 = time.perf_counter_ns()
+        dst = self._surfs[i]
+        if not self._direct:
+            pg.transform.scale(screen, self.size, self._tmp)
+            dst.blit(self._tmp, (0, 0))
+        elif screen.get_size() == self.size:
+            dst.blit(screen, (0, 0))
+        else:
+            pg.transform.scale(screen, self.size, dst)
+        self._states[i] = 1
+        self._work.put((i, now - self._t0))
+        self._slot = (i + 1) % len(self._surfs)
+        self.frames += 1
+        self.copy_ns += time.perf_counter_ns() - t0
+        return True
+
+    def poll_stats(self) -> dict:
+        """Latest encoder stats (frames, bytes_in/out, busy_s, elapsed_s)."""
+        try:
+            while True:
+                self.encoder = self._stats.get_nowait()
+        except queue.Empty:
+            pass
+        return self.encoder
+
+    def close(self, timeout: float = 30.0):
+        """Let the encoder finish the queued frames, then collect its final stats."""
+        if self._proc is None:
+            return
+        self._work.put(None)
+        deadline = time.monotonic() + timeout
+        while self._proc.is_alive() and time.monotonic() < deadline:
+            self.poll_stats()
+            self._proc.join(0.1)
+        if self._proc.is_alive():
+            self._proc.terminate()
+        self._proc.join()
+        self.poll_stats()
+        self._proc = None
+
+    def report(self) -> str:
+        e = self.encoder
+        n = e.get("frames", 0)
+        busy, el = e.get("busy_s", 0.0), e.get("elapsed_s", 0.0)
+        lines = [f"capture: {self.frames} frames {self.size[0]}x{self.size[1]} @ {self.fps:g} fps "
+                 f"-> {self.path} ({self.codec}), {self.dropped} dropped (encoder behind), "
+                 f"copy {self.copy_ns / 1e3 / max(1, self.frames):.0f} us/frame on the game thread"]
+        if n:
+            mb_in = e["bytes_in"] / 1e6
+            lines.append(f"encoder: {n} frames, {n / busy if busy else 0:.0f} frames/s while busy "
+                         f"({mb_in / busy if busy else 0:.1f} MB/s raw), busy {100 * busy / el if el else 0:.0f}%, "
+                         f"{e['bytes_out'] / 1e6:.2f} MB written"
+                         + (f" ({e['bytes_in'] / e['bytes_out']:.1f}x smaller than raw)" if e["bytes_out"] else ""))
+        return "\n".join(lines)
+
+# ---------- reading .frv ----------
+class CaptureReader:
+    def __init__(self, path: str):
+        self._f = open(path, "rb")
+        magic, version, w, h, fps, ml = HEADER.unpack(self._f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a capture file")
+        self.size = (w, h)
+        self.fps = fps
+        self.meta = json.loads(self._f.read(ml))
+        self.stats = {}
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def frames(self):
+        """Yields (frame number, t, pixels); pixels is an (h, w, 3) array reused between frames."""
+        import numpy as np
+        w, h = self.size
+        cur = np.zeros((h, w, 3), np.uint8)
+        f = self._f
+        while True:
+            hdr = f.read(FRAME.size)
+            if len(hdr) < FRAME.size:
+                return                 # the game did not close the capture
+            seq, t, kind, n = FRAME.unpack(hdr)
+            payload = f.read(n)
+            if kind == END:
+                self.stats = json.loads(payload)
+                return
+            data = np.frombuffer(zlib.decompress(payload), np.uint8).reshape(h, w, 3)
+            if kind == KEY:
+                cur[...] = data
+            else:
+                cur ^= data
+            yield seq, t, cur
+
+def _surface(pixels, fmt: str) -> pg.Surface:
+    h, w, _ = pixels.shape
+    return pg.image.frombuffer(pixels.tobytes(), (w, h), fmt)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("info", help="frames, duration, size and encoder stats")
+    p.add_argument("path")
+    p = sub.add_parser("play", help="show a capture in a window")
+    p.add_argument("path")
+    p.add_argument("--speed", type=float, default=1.0)
+    p = sub.add_parser("export", help="write every frame as PNG")
+    p.add_argument("path")
+    p.add_argument("out_dir")
+    args = ap.parse_args(argv)
+
+    with CaptureReader(args.path) as r:
+        fmt = r.meta["pixel_format"]
+        if args.cmd == "info":
+            n, t_last = 0, 0.0
+            for _, t_last, _ in r.frames():
+                n += 1
+            print(json.dumps(dict(size=r.size, fps=r.fps, frames=n, duration_s=round(t_last, 2),
+                                  file_bytes=os.path.getsize(args.path), meta=r.meta, encoder=r.stats), indent=1))
+        elif args.cmd == "export":
+            os.makedirs(args.out_dir, exist_ok=True)
+            n = 0
+            for seq, _, px in r.frames():
+                pg.image.save(_surface(px, fmt), os.path.join(args.out_dir, f"frame_{seq:06d}.png"))
+                n += 1
+            print(f"{n} frames -> {args.out_dir}")
+        else:
+            pg.display.init()
+            screen = pg.display.set_mode(r.size, pg.SCALED | pg.RESIZABLE)
+            pg.display.set_caption(os.path.basename(args.path))
+            start = time.perf_counter()
+            for _, t, px in r.frames():
+                delay = t / args.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                if any(e.type == pg.QUIT or (e.type == pg.KEYDOWN and e.key == pg.K_ESCAPE) for e in pg.event.get()):
+                    break
+                screen.blit(_surface(px, fmt), (0, 0))
+                pg.display.flip()
+            pg.quit()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,9 @@
 WINDOW_W, WINDOW_H = 400, 600
 WINDOW_SIZE = (WINDOW_W, WINDOW_H)
 FPS = 60
+IDLE_WAIT_MS = 250        # static screens block on input, waking at least this often
+PHYSICS_HZ = 120          # fixed simulation step, independent of the display rate
+MAX_CATCHUP_STEPS = 8     # physics steps per frame at most; beyond that game time slows instead
 
 # Colors (UI/theme)
 COLOR_BG = (20, 28, 38)
@@ -0,0 +1,79 @@
+"""The game window: everything is drawn at the logical WINDOW_SIZE, SDL scales it to the screen.
+
+With pg.SCALED the display surface stays at the logical size and SDL's renderer (on the GPU where
+there is one) stretches it over the window when presenting, so drawing costs the same in a
+400x600 window and on a 4K wall display. SDL also maps mouse positions back to logical pixels,
+so the UI and the slider never see physical coordinates.
+
+By default a window is scaled by whole multiples (crisp, letterboxed) and fullscreen fills the
+screen; scaling="integer" or "fit" forces one or the other. smooth=True filters when scaling
+(softer text at odd scales) instead of repeating pixels.
+"""
+from __future__ import annotations
+import math, os, sys
+import pygame as pg
+
+SCALING = ("integer", "fit")
+
+class Display:
+    def __init__(self, size, fullscreen: bool = False, vsync: bool = False, scaling: str | None = None,
+                 window_scale: int | None = None, smooth: bool = False):
+        self.size = tuple(size)
+        self.fullscreen = fullscreen
+        self.vsync = vsync
+        self.scaling = scaling
+        self.window_scale = window_scale
+        self.smooth = smooth
+        self.scaled = False       # False: plain window at the logical size (no renderer available)
+        self.surface = None
+        self._renderer = None
+        self._window = None
+
+    def open(self) -> pg.Surface:
+        if self.smooth:
+            os.environ["SDL_RENDER_SCALE_QUALITY"] = "linear"   # pygame only defaults it to "nearest"
+        flags = pg.SCALED | (pg.FULLSCREEN if self.fullscreen else pg.RESIZABLE)
+        try:
+            try:
+                self.surface = pg.display.set_mode(self.size, flags, vsync=int(self.vsync))
+            except pg.error:
+                if not self.vsync:
+                    raise
+                self.vsync = False    # no vsync on this driver; the caller falls back to its frame cap
+                self.surface = pg.display.set_mode(self.size, flags)
+            self.scaled = True
+        except pg.error as e:
+            print(f"display: no scaled output ({e}); using a {self.size[0]}x{self.size[1]} window", file=sys.stderr)
+            self.fullscreen = self.vsync = False
+            self.surface = pg.display.set_mode(self.size)
+            return self.surface
+        if self.scaling is not None or self.window_scale:
+            from pygame._sdl2.video import Window, Renderer
+            self._window = Window.from_display_module()
+            self._renderer = Renderer.from_window(self._window)
+            if self.window_scale and not self.fullscreen:
+                lw, lh = self.size
+                self._window.size = (lw * self.window_scale, lh * self.window_scale)
+            self.fit()
+        return self.surface
+
+    def fit(self):
+        """Re-apply `scaling` after the window changed size (SDL recomputes its own on resize)."""
+        if self._renderer is None or self.scaling is None:
+            return
+        lw, lh = self.size
+        ww, wh = self._window.size
+        f = min(ww / lw, wh / lh)
+        if self.scaling == "integer" and f >= 1:
+            f = math.floor(f)
+        r = self._renderer
+        r.scale = (f, f)
+        # the viewport is given in logical pixels; SDL maps mouse events through it and the scale
+        r.set_viewport(pg.Rect(round((ww / f - lw) / 2), round((wh / f - lh) / 2), lw, lh))
+
+    def toggle_fullscreen(self):
+        if not self.scaled:
+            return
+        pg.display.toggle_fullscreen()
+        self.fullscreen = not self.fullscreen
+        self.fit()
@@ -0,0 +1,428 @@
+"""Synthetic rehab device on a pseudo-terminal, for stress and soak testing without hardware.
+
+The device streams a waveform in the game's wire protocol (see input.py) into a pty and keeps
+a symlink pointing at it; set rehab_serial_port to the link and the real RehabFingerInput
+(pyserial + SerialReader) reads it like a USB sensor. Faults can be injected: noise, garbage
+bytes, dropouts (silent gaps; binary sequence numbers keep counting) and disconnects (the pty
+goes away and a new one appears behind the same link, like a re-plugged cable). POSIX only.
+
+    python emulator.py run --wave sine:0.3 --rate 1000                # prints the link to use
+    python emulator.py run --wave trace:sessions/session_x.frrec --protocol binary --garbage 0.001
+    python emulator.py soak --duration 2h --rate 5000 --protocol binary --noise 0.02 \\
+        --garbage 0.0005 --dropout-every 30 --disconnect-every 600 --report soak.json
+
+Waves: sine[:hz], step[:period_s], trace:PATH (the raw sensor column of a recorded session,
+looped). The soak runs the game headless in position control against the emulator, prints one
+line per --interval and fails (exit 1) if memory, objects or threads grow, the sample rate or
+latency drifts, or the game stops receiving samples.
+"""
+from __future__ import annotations
+import argparse, bisect, errno, json, math, os, random, statistics, sys, tempfile, threading, time
+from input import encode_frame
+
+# ---------- waveforms ----------
+def make_wave(spec: str):
+    """t (seconds) -> value in 0..1."""
+    kind, _, arg = spec.partition(":")
+    if kind == "sine":
+        hz = float(arg or 0.25)
+        return lambda t: 0.5 + 0.4 * math.sin(2 * math.pi * hz * t)
+    if kind == "step":
+        period = float(arg or 1.0)
+        return lambda t: 0.8 if int(t / period) % 2 else 0.2
+    if kind == "trace":
+        return _trace_wave(arg)
+    raise ValueError(f"unknown wave {spec!r} (sine[:hz], step[:period_s], trace:PATH)")
+
+def _trace_wave(path: str):
+    from recorder import SessionReader, FIELDS
+    ti, ri = FIELDS.index("t"), FIELDS.index("raw")
+    ts, vs = [], []
+    with SessionReader(path) as r:
+        for rec in r.iter_records():
+            v = rec[ri]
+            if v == v:   # NaN when the session was not played on the rehab device
+                ts.append(rec[ti])
+                vs.append(min(1.0, max(0.0, v)))
+    if len(ts) < 2:
+        raise ValueError(f"{path}: no rehab sensor samples recorded")
+    t0, span = ts[0], ts[-1] - ts[0]
+    ts = [t - t0 for t in ts]
+    def wave(t):
+        t %= span
+        i = bisect.bisect_right(ts, t)
+        if i >= len(ts):
+            return vs[-1]
+        a, b = ts[i - 1], ts[i]
+        return vs[i - 1] + (vs[i] - vs[i - 1]) * ((t - a) / (b - a) if b > a else 0.0)
+    return wave
+
+# ---------- device ----------
+class PtyDevice(threading.Thread):
+    """Streams `wave` at `rate_hz` into a pty reachable at `link`.
+
+    Writes are non-blocking: if the reader falls more than `max_pending` bytes behind, the oldest
+    bytes are thrown away (a UART without flow control) and counted in `overrun_bytes`.
+    """
+    GARBAGE_ASCII = b"#?!~@xyz "
+
+    def __init__(self, wave, rate_hz: float = 250.0, protocol: str = "ascii", channels: int = 1,
+                 noise: float = 0.0, garbage: float = 0.0, dropout_every: float = 0.0, dropout_s: float = 0.25,
+                 disconnect_every: float = 0.0, reconnect_s: float = 0.5, burst_ms: float = 1.0,
+                 link: str | None = None, max_pending: int = 1 << 16, seed: int = 0):
+        super().__init__(name="pty-device", daemon=True)
+        import pty, tty   # POSIX only
+        self._pty, self._tty = pty, tty
+        self.wave = wave
+        self.rate_hz = rate_hz
+        self.binary = protocol == "binary"
+        self.channels = channels
+        self.noise = noise
+        self.garbage = garbage
+        self.dropout_every, self.dropout_s = dropout_every, dropout_s
+        self.disconnect_every, self.reconnect_s = disconnect_every, reconnect_s
+        self.tick = max(0.001, burst_ms / 1000.0)
+        self.max_pending = max_pending
+        self.rng = random.Random(seed)
+        self._tmpdir = None
+        if link is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="rehab-emu-")
+            link = os.path.join(self._tmpdir, "tty")
+        self.link = link
+        self.sent = 0              # samples emitted (sequence numbers advance through dropouts)
+        self.garbage_bytes = 0
+        self.dropouts = 0
+        self.dropped_samples = 0   # samples not written because of a dropout or disconnect
+        self.disconnects = 0
+        self.overrun_bytes = 0
+        self.cpu_s = 0.0           # this thread's CPU time
+        self.emit_t = [0.0] * 256  # binary: monotonic emit time of the newest frame with seq i
+        self._pending = bytearray()
+        self._master = self._slave = None
+        self._stop_evt = threading.Event()
+        self._open()
+
+    @property
+    def port(self) -> str:
+        return self.link
+
+    def _open(self):
+        master, slave = self._pty.openpty()
+        self._tty.setraw(slave)
+        os.set_blocking(master, False)
+        self._master, self._slave = master, slave
+        tmp = self.link + ".new"
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        os.symlink(os.ttyname(slave), tmp)
+        os.replace(tmp, self.link)
+
+    def _close(self):
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+        self._pending.clear()
+
+    def _next_fault(self, every: float, now: float) -> float:
+        return now + self.rng.expovariate(1.0 / every) if every > 0 else math.inf
+
+    def _encode(self, k: int, t: float) -> bytes:
+        v = self.wave(t)
+        if self.noise:
+            v += self.rng.gauss(0.0, self.noise)
+        v = min(1.0, max(0.0, v))
+        return encode_frame(k, [v] * self.channels) if self.binary else b"%.4f\n" % v
+
+    def _garbage(self) -> bytes:
+        n = self.rng.randint(1, 16)
+        if self.binary:
+            return self.rng.randbytes(n)
+        alphabet = self.GARBAGE_ASCII
+        return bytes(self.rng.choice(alphabet) for _ in range(n)) + b"\n"
+
+    def _flush(self):
+        pending = self._pending
+        if len(pending) > self.max_pending:
+            cut = len(pending) - self.max_pending
+            del pending[:cut]
+            self.overrun_bytes += cut
+        try:
+            n = os.write(self._master, pending)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno != errno.EIO:   # EIO: nobody has the slave open yet
+                raise
+            return
+        del pending[:n]
+
+    def run(self):
+        cpu0 = time.thread_time()
+        t0 = time.monotonic()
+        next_dropout = self._next_fault(self.dropout_every, t0)
+        next_disconnect = self._next_fault(self.disconnect_every, t0)
+        silent_until = -math.inf
+        rate, rng, garbage, emit_t = self.rate_hz, self.rng, self.garbage, self.emit_t
+        while not self._stop_evt.wait(self.tick):
+            now = time.monotonic()
+            if now >= next_disconnect:
+                self.disconnects += 1
+                self._close()
+                if self._stop_evt.wait(self.reconnect_s):
+                    break
+                self._open()
+                now = time.monotonic()
+                next_disconnect = self._next_fault(self.disconnect_every, now)
+            if now >= next_dropout:
+                self.dropouts += 1
+                silent_until = now + self.dropout_s
+                next_dropout = self._next_fault(self.dropout_every, silent_until)
+            due = int((now - t0) * rate)
+            if now < silent_until:
+                self.dropped_samples += due - self.sent
+                self.sent = due
+                continue
+            out = self._pending
+            for k in range(self.sent, due):
+                out += self._encode(k, k / rate)
+                if garbage and rng.random() < garbage:
+                    g = self._garbage()
+                    out += g
+                    self.garbage_bytes += len(g)
+                emit_t[k & 0xFF] = now
+            self.sent = due
+            self._flush()
+            self.cpu_s = time.thread_time() - cpu0
+        self._close()
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join(timeout=2.0)
+        if os.path.lexists(self.link):
+            os.unlink(self.link)
+        if self._tmpdir is not None:
+            os.rmdir(self._tmpdir)
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "dropouts": self.dropouts, "dropped_samples": self.dropped_samples,
+                "disconnects": self.disconnects, "garbage_bytes": self.garbage_bytes,
+                "overrun_bytes": self.overrun_bytes, "cpu_s": round(self.cpu_s, 3)}
+
+# ---------- soak test ----------
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource   # peak, not current, but still catches steady growth
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _pct(values, p):
+    if not values:
+        return float("nan")
+    v = sorted(values)
+    return v[min(len(v) - 1, int(p * len(v)))]
+
+def _seq_latency(dev: PtyDevice, seq: int, now: float, rate: float) -> float | None:
+    # the newest frame with this sequence number; ambiguous beyond 256 frames, hence the cap
+    t = dev.emit_t[seq]
+    return now - t if 0 < now - t < 256 / rate else None
+
+def soak(dev: PtyDevice, seconds: float, interval: float = 60.0, fps: int | None = None,
+         protocol: str = "ascii", log=print) -> dict:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import gc
+    import pygame as pg
+    from config import WINDOW_SIZE, FPS
+    from game import Game
+
+    pg.display.init()
+    pg.font.init()
+    screen = pg.display.set_mode(WINDOW_SIZE)
+    clock = pg.time.Clock()
+    game = Game(screen)
+    game.settings_watcher.stop()
+    s = game.settings
+    s.input_mode, s.control_mode, s.record_sessions = "rehab", "position", False
+    s.rehab_serial_port, s.rehab_protocol, s.rehab_rate_hz = dev.port, protocol, dev.rate_hz
+    s.rehab_channels, s.rehab_channel = dev.channels, 0
+    game._action_start()
+    if getattr(game.input, "reader", None) is None:
+        raise SystemExit("soak needs pyserial to open the emulated port")
+    fps = fps or FPS
+    rate = dev.rate_hz
+
+    windows = []
+    frame_ms, lat_ms, age_ms = [], [], []
+    frames = 0
+    ring = game.input.ring
+    t_start = time.monotonic()
+    t_win, cpu_win, count_win, sent_win = t_start, time.process_time(), ring.count, dev.sent
+    dev_cpu_win = dev.cpu_s
+    last = time.perf_counter()
+    while True:
+        clock.tick(fps)
+        t_frame = time.perf_counter()
+        game.update(t_frame - last)
+        game.draw()
+        last = t_frame
+        frame_ms.append((time.perf_counter() - t_frame) * 1e3)
+        frames += 1
+        if game.scene == "dead":
+            game.scene = "playing"
+            game.reset()
+        now = time.monotonic()
+        newest = ring.latest()
+        if newest is not None:
+            age_ms.append((now - newest[0]) * 1e3)
+        reader = game.input.reader
+        if protocol == "binary" and reader.decoder.last_seq is not None:
+            lat = _seq_latency(dev, reader.decoder.last_seq, now, rate)
+            if lat is not None:
+                lat_ms.append(lat * 1e3)
+
+        if now - t_win >= interval or now - t_start >= seconds:
+            wall = now - t_win
+            cpu = time.process_time() - cpu_win
+            dev_cpu = dev.cpu_s - dev_cpu_win
+            st = game.input.stats()
+            w = {
+                "t": round(now - t_start, 1),
+                "fps": frames / wall,
+                "frame_ms_p95": _pct(frame_ms, 0.95),
+                "frame_ms_max": max(frame_ms, default=float("nan")),
+                "rate_sent": (dev.sent - sent_win) / wall,
+                "rate_received": (ring.count - count_win) / wall,
+                "game_cpu": (cpu - dev_cpu) / wall,
+                "device_cpu": dev_cpu / wall,
+                "latency_ms_p50": _pct(lat_ms, 0.5),
+                "latency_ms_p95": _pct(lat_ms, 0.95),
+                "input_age_ms_p50": _pct(age_ms, 0.5),
+                "input_age_ms_p95": _pct(age_ms, 0.95),
+                "rss_mb": _rss_mb(),
+                "objects": len(gc.get_objects()),
+                "threads": threading.active_count(),
+                **st,
+                **{f"device_{k}": v for k, v in dev.stats().items()},
+            }
+            windows.append(w)
+            log(f"{w['t']:>8.0f}s  fps {w['fps']:5.1f}  frame p95 {w['frame_ms_p95']:5.2f} ms  "
+                f"recv {w['rate_received']:7.0f}/s of {w['rate_sent']:7.0f}/s  cpu {w['game_cpu']:5.1%}  "
+                f"lat p95 {w['latency_ms_p95']:6.2f} ms  age p95 {w['input_age_ms_p95']:6.2f} ms  "
+                f"rss {w['rss_mb']:6.1f} MB  bad {st['malformed']} lost {st['lost']} reopen {st['errors']}")
+            if now - t_start >= seconds:
+                break
+            frames = 0
+            frame_ms, lat_ms, age_ms = [], [], []
+            t_win, cpu_win, count_win, sent_win = now, time.process_time(), ring.count, dev.sent
+            dev_cpu_win = dev.cpu_s
+
+    game.close()
+    pg.quit()
+    return {"seconds": seconds, "rate_hz": rate, "protocol": protocol, "fps_target": fps,
+            "windows": windows, "device": dev.stats()}
+
+def check(report: dict, max_rss_growth_mb: float = 32.0, max_object_growth: float = 0.10,
+          max_rate_drift: float = 0.02, max_latency_growth: float = 2.0) -> list[str]:
+    """Problems found in a soak report (empty = pass). The first window is warm-up."""
+    w = report["windows"]
+    if len(w) < 3:
+        return ["soak too short: need at least 3 windows"]
+    base, steady, last = w[1], w[1:], w[-1]
+    problems = []
+    rss = last["rss_mb"] - base["rss_mb"]
+    if rss > max_rss_growth_mb:
+        problems.append(f"RSS grew {rss:.1f} MB after warm-up")
+    objs = last["objects"] - base["objects"]
+    if objs > max(5000, max_object_growth * base["objects"]):
+        problems.append(f"{objs} more live objects than after warm-up")
+    if last["threads"] > base["threads"]:
+        problems.append(f"thread count grew {base['threads']} -> {last['threads']}")
+    sent = statistics.median(x["rate_sent"] for x in steady)
+    if abs(sent / report["rate_hz"] - 1) > max_rate_drift:
+        problems.append(f"device rate {sent:.0f}/s, nominal {report['rate_hz']:.0f}/s")
+    for x in steady:
+        if x["rate_received"] <= 0:
+            problems.append(f"no samples received in the window ending at {x['t']:.0f}s")
+    # medians: a dropout or disconnect in a window rightly inflates its p95, but not its p50
+    for key in ("latency_ms_p50", "input_age_ms_p50"):
+        v0, v1 = base[key], last[key]
+        if v0 == v0 and v1 == v1 and v1 > max_latency_growth * v0 + 5.0:
+            problems.append(f"{key} drifted {v0:.2f} -> {v1:.2f}")
+    return problems
+
+# ---------- commands ----------
+def _duration(text: str) -> float:
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text[-1:] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+def _device(args) -> PtyDevice:
+    return PtyDevice(make_wave(args.wave), args.rate, args.protocol, args.channels, args.noise, args.garbage,
+                     args.dropout_every, args.dropout_s, args.disconnect_every, args.reconnect_s,
+                     args.burst_ms, args.link, seed=args.seed)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    dev = argparse.ArgumentParser(add_help=False)
+    dev.add_argument("--wave", default="sine", help="sine[:hz] | step[:period_s] | trace:PATH")
+    dev.add_argument("--rate", type=float, default=250.0, help="samples per second (50..5000)")
+    dev.add_argument("--protocol", choices=("ascii", "binary"), default="ascii")
+    dev.add_argument("--channels", type=int, default=1)
+    dev.add_argument("--noise", type=float, default=0.0, help="Gaussian noise std added to each sample")
+    dev.add_argument("--garbage", type=float, default=0.0, help="chance per sample of a burst of junk bytes")
+    dev.add_argument("--dropout-every", type=float, default=0.0, help="mean seconds between dropouts (0 = none)")
+    dev.add_argument("--dropout-s", type=float, default=0.25, help="length of a dropout")
+    dev.add_argument("--disconnect-every", type=float, default=0.0, help="mean seconds between disconnects (0 = none)")
+    dev.add_argument("--reconnect-s", type=float, default=0.5, help="time the device stays unplugged")
+    dev.add_argument("--burst-ms", type=float, default=1.0, help="write interval; samples in between go out together")
+    dev.add_argument("--link", help="symlink to create for the pty (default: in a temp dir)")
+    dev.add_argument("--seed", type=int, default=0)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", parents=[dev], help="run the device until Ctrl+C")
+    r.add_argument("--stats-every", type=float, default=0.0, help="print device counters every N seconds")
+    s = sub.add_parser("soak", parents=[dev], help="run the game headless against the device")
+    s.add_argument("--duration", default="10m", help="e.g. 90s, 30m, 4h")
+    s.add_argument("--interval", type=float, default=60.0, help="seconds per report window")
+    s.add_argument("--fps", type=int)
+    s.add_argument("--report", help="write the JSON report here")
+    s.add_argument("--max-rss-growth-mb", type=float, default=32.0)
+    args = ap.parse_args(argv)
+
+    if not hasattr(os, "openpty"):
+        print("emulator.py needs a POSIX pseudo-terminal", file=sys.stderr)
+        return 2
+    d = _device(args)
+    d.start()
+    try:
+        if args.cmd == "run":
+            print(f"rehab device on {d.port} ({args.protocol}, {args.rate:g} Hz, wave {args.wave})")
+            print(f'set "rehab_serial_port": "{d.port}" in settings.json')
+            sys.stdout.flush()
+            try:
+                while True:
+                    time.sleep(args.stats_every or 3600)
+                    if args.stats_every:
+                        print(json.dumps(d.stats()))
+                        sys.stdout.flush()
+            except KeyboardInterrupt:
+                pass
+            return 0
+
+        report = soak(d, _duration(args.duration), args.interval, args.fps, args.protocol)
+        report["problems"] = check(report, args.max_rss_growth_mb)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        for p in report["problems"]:
+            print(f"FAIL: {p}", file=sys.stderr)
+        if not report["problems"]:
+            print("soak passed")
+        return 1 if report["problems"] else 0
+    finally:
+        d.stop()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,54 +1,108 @@
+from __future__ import annotations
+import random
+from collections import deque
 import pygame as pg
 from pygame import Rect
 from settings import Settings
-from config import COLOR_BIRD, COLOR_PIPE, COLOR_GROUND
+from sprites import get_atlas, TILE_W
 
 class Bird:
+    """`y` (top edge) and `vy` are the physics state; `rect` is its rounded pixel footprint for collisions."""
     def __init__(self, settings: Settings):
         self.settings = settings
         self.rect = Rect(100, 260, 28, 22)
+        self.y = float(self.rect.y)
+        self.prev_y = self.y
         self.vy = 0.0
         self.alive = True
 
+    def place(self, centery: float):
+        self.y = self.prev_y = centery - self.rect.height / 2
+        self.rect.y = round(self.y)
+        self.vy = 0.0
+
     def update(self, dt: float, flap: bool):
+        self.prev_y = self.y
         if flap:
             self.vy = self.settings.flap_impulse
         self.vy += self.settings.gravity * dt
         if self.vy > self.settings.max_fall_speed:
             self.vy = self.settings.max_fall_speed
-        self.rect.y += int(self.vy * dt)
-        if self.rect.top < 0:
-            self.rect.top = 0
+        self.y += self.vy * dt
+        if self.y < 0:
+            self.y = 0.0
             self.vy = 0
+        self.rect.y = round(self.y)
 
     def update_position_control(self, dt: float, target_y: int):
         follow_speed = 12.0
-        y = float(self.rect.centery)
+        self.prev_y = self.y
+        half = self.rect.height / 2
+        y = self.y + half
         y += (target_y - y) * min(1.0, dt * follow_speed)
-        self.rect.centery = int(y)
+        self.y = y - half
+        self.rect.y = round(self.y)
         self.vy = 0.0
 
+    def draw_y(self, alpha: float = 1.0) -> int:
+        """Top edge to draw at, `alpha` of the way from the previous physics step to the current one."""
+        return round(self.prev_y + (self.y - self.prev_y) * alpha)
+
+    def add_sprites(self, batch: list, dirty: list, alpha: float = 1.0):
+        r = Rect(self.rect.x, self.draw_y(alpha), self.rect.width, self.rect.height)
+        img, area = get_atlas().sprite("bird", r.size)
+        batch.append((img, r.topleft, area))
+        dirty.append(r)
+
     def draw(self, surf: pg.Surface):
-        pg.draw.rect(surf, COLOR_BIRD, self.rect, border_radius=6)
-        wing = self.rect.copy()
-        wing.width = max(8, self.rect.width // 3)
-        wing.height = 6
-        wing.centerx = self.rect.centerx - 4
-        wing.centery = self.rect.centery + 2
-        pg.draw.rect(surf, (255, 240, 140), wing, border_radius=3)
+        batch = []
+        self.add_sprites(batch, [])
+        surf.blits(batch, doreturn=False)
+
+class Course:
+    """Seeded, per-session sequence of gap positions with a precomputed lookahead buffer.
+
+    Positions are stored as fractions in [0, 1) and mapped onto the playable range when
+    taken, so the course stays the same even if ground height changes mid-session.
+    """
+    def __init__(self, seed: int | None = None, lookahead: int = 64):
+        self.seed = random.randrange(1 << 32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.lookahead = lookahead
+        self.buf = deque()
+        self.taken = 0
+
+    def _fill(self):
+        rnd = self.rng.random
+        self.buf.extend(rnd() for _ in range(self.lookahead))
+
+    def peek(self, k: int) -> list[float]:
+        """The next k gap fractions without consuming them."""
+        while len(self.buf) < k:
+            self._fill()
+        return [self.buf[i] for i in range(k)]
+
+    def next_gap_y(self, lo: int, hi: int) -> int:
+        """Next gap centre in [lo, hi], like randint(lo, hi)."""
+        if not self.buf:
+            self._fill()
+        self.taken += 1
+        return lo + int(self.buf.popleft() * (hi - lo + 1))
 
 class PipeManager:
-    def __init__(self, w: int, h: int, settings: Settings):
+    def __init__(self, w: int, h: int, settings: Settings, course: Course | None = None):
         self.w, self.h = w, h
         self.settings = settings
+        self.course = course or Course()
         self.t = 0.0
+        self.frac = 0.0      # sub-pixel part of the pipes' x (true x = rect.x + frac)
+        self.last_dx = 0.0   # float distance moved by the last update, for render interpolation
         self.pipes = []  # [top_rect, bot_rect, passed]
 
     def spawn(self):
-        from random import randint
         gh = self.settings.ground_height
         gap = self.settings.pipe_gap
-        gap_y = randint(120, self.h - gh - 120)
+        gap_y = self.course.next_gap_y(120, self.h - gh - 120)
         top_rect = Rect(self.w, 0, self.settings.pipe_width, gap_y - gap // 2)
         bot_rect = Rect(self.w, gap_y + gap // 2, self.settings.pipe_width, self.h - gh - (gap_y + gap // 2))
         self.pipes.append([top_rect, bot_rect, False])
@@ -58,19 +112,57 @@ class PipeManager:
         if self.t >= self.settings.pipe_spawn_every:
             self.t -= self.settings.pipe_spawn_every
             self.spawn()
-        dx = int(self.settings.pipe_speed * dt)
-        for p in self.pipes:
+        self.last_dx = self.settings.pipe_speed * dt
+        self.frac += self.last_dx
+        dx = int(self.frac)
+        self.frac -= dx
+        pipes = self.pipes
+        gone = 0
+        for p in pipes:
             p[0].x += dx
             p[1].x += dx
-        self.pipes = [p for p in self.pipes if p[0].right > -10]
+            if p[0].right <= -10:
+                gone += 1
+        if gone:
+            # in place: pipes that left the screen are normally the first ones
+            k = 0
+            while k < len(pipes) and pipes[k][0].right <= -10:
+                k += 1
+            if k == gone:
+                del pipes[:k]
+            else:   # a narrower pipe overtook a wider one's exit
+                pipes[:] = [p for p in pipes if p[0].right > -10]
 
-    def draw(self, surf: pg.Surface):
+    def draw_offset(self, alpha: float = 1.0) -> int:
+        """Whole-pixel x shift to add to every pipe rect when drawing at interpolation `alpha`."""
+        return round(self.frac - (1.0 - alpha) * self.last_dx)
+
+    def add_sprites(self, batch: list, dirty: list, alpha: float = 1.0):
+        atlas = get_atlas()
+        dx = self.draw_offset(alpha)
         for top, bot, _ in self.pipes:
-            pg.draw.rect(surf, COLOR_PIPE, top, border_radius=6)
-            pg.draw.rect(surf, COLOR_PIPE, bot, border_radius=6)
+            top, bot = top.move(dx, 0), bot.move(dx, 0)
+            atlas.add_pipe(batch, top, True)
+            atlas.add_pipe(batch, bot, False)
+            dirty.append(top.union(bot))   # one dirty column per pipe
+
+    def draw(self, surf: pg.Surface):
+        batch = []
+        self.add_sprites(batch, [])
+        surf.blits(batch, doreturn=False)
 
     def collides(self, rect: Rect) -> bool:
-        return any(rect.colliderect(top) or rect.colliderect(bot) for top, bot, _ in self.pipes)
+        for top, bot, _ in self.pipes:
+            if rect.colliderect(top) or rect.colliderect(bot):
+                return True
+        return False
+
+    def next_gap(self, left: int):
+        """Gap centre y of the first pipe whose right edge is still at/after `left`, or None."""
+        for top, bot, _ in self.pipes:
+            if top.right >= left:
+                return (top.bottom + bot.top) // 2
+        return None
 
     def count_passed(self, rect: Rect) -> int:
         gained = 0
@@ -87,20 +179,29 @@ class Ground:
         self.settings = settings
         self.rect = Rect(0, h - settings.ground_height, w, settings.ground_height)
         self.scroll = 0.0
+        self.last_dscroll = 0.0
 
     def update(self, dt: float):
-        self.scroll += -self.settings.pipe_speed * dt * 0.25
-        if self.scroll > 32:
-            self.scroll -= 32
+        self.last_dscroll = -self.settings.pipe_speed * dt * 0.25
+        self.scroll += self.last_dscroll
+        if self.scroll > TILE_W:
+            self.scroll -= TILE_W
         self.rect.height = self.settings.ground_height
         self.rect.top = self.h - self.settings.ground_height
 
+    def draw_scroll(self, alpha: float = 1.0) -> int:
+        return int(self.scroll - (1.0 - alpha) * self.last_dscroll)
+
+    def add_sprites(self, batch: list, dirty: list, alpha: float = 1.0):
+        g = self.rect
+        strip = get_atlas().ground_strip(g.width, g.height)
+        batch.append((strip, g.topleft, (self.draw_scroll(alpha) % TILE_W, 0, g.width, g.height)))
+        dirty.append(g.copy())
+
     def draw(self, surf: pg.Surface):
-        pg.draw.rect(surf, COLOR_GROUND, self.rect)
-        tile_w = 32
-        y = self.rect.top + 8
-        for i in range(0, self.w + tile_w, tile_w):
-            pg.draw.rect(surf, (120, 95, 70), (i - int(self.scroll) % tile_w, y, tile_w // 2, 10), border_radius=3)
+        batch = []
+        self.add_sprites(batch, [])
+        surf.blits(batch, doreturn=False)
 
     def collides(self, rect: Rect) -> bool:
         return rect.colliderect(self.rect)
@@ -0,0 +1,187 @@
+"""Monte Carlo preset evaluator: simulated patients play the real game rules headless.
+
+    python evaluate.py --sessions 2000                         # all PRESETS
+    python evaluate.py --preset old_lady --latency 0.35 --noise 0.08 --rom 0.2 0.8
+    python evaluate.py --sweep pipe_gap=130,160,210 pipe_speed=-140,-200 --sessions 300 --json out.json
+
+Sessions run in chunks across a process pool (one worker per core by default).
+"""
+from __future__ import annotations
+import argparse, itertools, json, os, random, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, fields, replace
+from sim import Simulation, InputSample, run
+from settings import Settings, PRESETS, load_settings, apply_preset, validate
+from config import WINDOW_W, WINDOW_H, PHYSICS_HZ
+
+DT = 1 / PHYSICS_HZ     # same fixed step as the game
+SURVIVAL_STEP = 5.0   # seconds between survival-curve points
+
+@dataclass
+class PatientProfile:
+    latency: float = 0.25    # seconds between seeing the course and the sensor reflecting it
+    noise: float = 0.05      # sd of per-frame jitter, in 0..1 input units
+    rom_lo: float = 0.0      # reachable input range (range of motion)
+    rom_hi: float = 1.0
+
+PATIENTS = {
+    "healthy": PatientProfile(latency=0.18, noise=0.02),
+    "mild":    PatientProfile(latency=0.30, noise=0.05, rom_lo=0.05, rom_hi=0.9),
+    "severe":  PatientProfile(latency=0.45, noise=0.10, rom_lo=0.15, rom_hi=0.75),
+}
+
+class PatientBot:
+    """Aims for the next gap, but acts on a delayed, noisy view and cannot leave its range of motion."""
+    def __init__(self, profile: PatientProfile, rng: random.Random, dt: float = DT):
+        self.p = profile
+        self.rng = rng
+        self.delay = deque([None] * max(1, round(profile.latency / dt)))
+
+    def __call__(self, sim: Simulation) -> InputSample:
+        floor = sim.h - sim.settings.ground_height
+        bird = sim.bird.rect
+        gap = sim.pipes.next_gap(bird.left)
+        if sim.settings.control_mode == "position":
+            want = 0.5 if gap is None else (floor - gap) / floor
+        else:
+            # flap when sinking below the gap centre (or the screen middle when no pipe is near)
+            want = bird.centery > (floor / 2 if gap is None else gap + 8) and sim.bird.vy >= 0
+        self.delay.append(want)
+        seen = self.delay.popleft()
+        if sim.settings.control_mode != "position":
+            return InputSample(flap=bool(seen))
+        v = 0.5 if seen is None else seen + self.rng.gauss(0.0, self.p.noise)
+        return InputSample(value01=min(self.p.rom_hi, max(self.p.rom_lo, v)))
+
+def run_session(settings: Settings, profile: PatientProfile, seed: int, max_seconds: float) -> tuple[int, int]:
+    """One bot session; returns (frames survived, score)."""
+    sim = Simulation(WINDOW_W, WINDOW_H, settings)
+    sim.reset(0.5 if settings.control_mode == "position" else None, seed=seed)
+    bot = PatientBot(profile, random.Random(seed ^ 0x5EED))
+    frames = run(sim, bot, DT, int(max_seconds / DT))
+    return frames, sim.score
+
+def _run_chunk(job):
+    settings, profile, seeds, max_seconds = job
+    return [run_session(settings, profile, s, max_seconds) for s in seeds]
+
+def summarize(results: list[tuple[int, int]], max_seconds: float) -> dict:
+    n = len(results)
+    secs = sorted(f * DT for f, _ in results)
+    scores = sorted(s for _, s in results)
+    q = lambda xs, p: xs[min(len(xs) - 1, int(p * len(xs)))]
+    curve = []
+    t, i = 0.0, 0
+    while t <= max_seconds + 1e-9:
+        while i < n and secs[i] < t:
+            i += 1
+        curve.append((round(t, 3), (n - i) / n))
+        t += SURVIVAL_STEP
+    total_min = sum(secs) / 60
+    hist = {}
+    for s in scores:
+        hist[s] = hist.get(s, 0) + 1
+    return {
+        "sessions": n,
+        "survival": curve,
+        "completed": sum(1 for f, _ in results if f * DT >= max_seconds - DT) / n,
+        "score_mean": sum(scores) / n,
+        "score_p10": q(scores, 0.10), "score_p50": q(scores, 0.50), "score_p90": q(scores, 0.90),
+        "score_hist": hist,
+        "seconds_p50": q(secs, 0.50),
+        "pipes_per_minute": sum(scores) / total_min if total_min else 0.0,
+    }
+
+def evaluate(configs: dict[str, Settings], profile: PatientProfile, sessions: int, max_seconds: float,
+             seed: int = 0, workers: int | None = None, chunk: int = 25) -> dict[str, dict]:
+    jobs, owners = [], []
+    for ci, (name, s) in enumerate(configs.items()):
+        base = seed * 1_000_003 + ci * sessions
+        for k in range(0, sessions, chunk):
+            jobs.append((s, profile, list(range(base + k, base + min(sessions, k + chunk))), max_seconds))
+            owners.append(name)
+    results = {name: [] for name in configs}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as ex:
+        for name, res in zip(owners, ex.map(_run_chunk, jobs)):
+            results[name].extend(res)
+    return {name: summarize(r, max_seconds) for name, r in results.items()}
+
+_BOOLS = {"true": True, "1": True, "false": False, "0": False}
+_PARSE = {"int": int, "float": float, "str": str, "bool": lambda v: _BOOLS[v.lower()]}
+
+def _parse_sweep(items: list[str]) -> dict[str, list]:
+    """KEY=V1,V2 items as {key: [values]}, typed and checked like settings.json entries."""
+    kinds = {f.name: f.type for f in fields(Settings)}
+    grid = {}
+    for it in items:
+        key, _, vals = it.partition("=")
+        if key not in kinds:
+            raise SystemExit(f"unknown setting in --sweep: {key}")
+        grid[key] = []
+        for text in filter(None, vals.split(",")):
+            try:
+                v = _PARSE[kinds[key]](text)
+            except (KeyError, ValueError):
+                raise SystemExit(f"--sweep {key}: expected {kinds[key]}, got {text!r}") from None
+            _, errors = validate({key: v})
+            if errors:
+                raise SystemExit(f"--sweep {errors[0]}")
+            grid[key].append(v)
+        if not grid[key]:
+            raise SystemExit(f"--sweep {key}: no values")
+    return grid
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--preset", action="append", choices=sorted(PRESETS), help="preset(s) to evaluate (default: all)")
+    ap.add_argument("--patient", choices=sorted(PATIENTS), default="mild")
+    ap.add_argument("--latency", type=float)
+    ap.add_argument("--noise", type=float)
+    ap.add_argument("--rom", type=float, nargs=2, metavar=("LO", "HI"))
+    ap.add_argument("--control-mode", choices=("position", "flap"))
+    ap.add_argument("--sweep", nargs="+", metavar="KEY=V1,V2", help="grid over settings, on top of each preset")
+    ap.add_argument("--sessions", type=int, default=500, help="sessions per configuration")
+    ap.add_argument("--max-seconds", type=float, default=120.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--json", help="write the full report here")
+    args = ap.parse_args(argv)
+
+    profile = PATIENTS[args.patient]
+    if args.latency is not None: profile = replace(profile, latency=args.latency)
+    if args.noise is not None: profile = replace(profile, noise=args.noise)
+    if args.rom: profile = replace(profile, rom_lo=args.rom[0], rom_hi=args.rom[1])
+
+    base = load_settings()
+    if args.control_mode:
+        base.control_mode = args.control_mode
+    configs = {}
+    for p in args.preset or list(PRESETS):
+        ps = apply_preset(replace(base), p)
+        if not args.sweep:
+            configs[p] = ps
+            continue
+        grid = _parse_sweep(args.sweep)
+        for combo in itertools.product(*grid.values()):
+            over = dict(zip(grid, combo))
+            configs[p + " " + " ".join(f"{k}={v}" for k, v in over.items())] = replace(ps, **over)
+
+    t0 = time.perf_counter()
+    report = evaluate(configs, profile, args.sessions, args.max_seconds, args.seed, args.workers)
+    el = time.perf_counter() - t0
+    total = sum(r["sessions"] for r in report.values())
+
+    print(f"patient {args.patient}: {asdict(profile)}")
+    print(f"{'configuration':<48} {'score p50':>9} {'p90':>5} {'pipes/min':>9} {'done':>6} {'med s':>6}")
+    for name, r in report.items():
+        print(f"{name:<48} {r['score_p50']:>9} {r['score_p90']:>5} {r['pipes_per_minute']:>9.1f} "
+              f"{r['completed']:>6.1%} {r['seconds_p50']:>6.1f}")
+    print(f"{total} sessions in {el:.1f}s ({total / el:.0f} sessions/s)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"patient": asdict(profile), "configs": {k: asdict(v) for k, v in configs.items()},
+                       "results": report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,41 @@
+from __future__ import annotations
+import os
+import time
+from dataclasses import asdict, replace
 import pygame as pg
 from config import (
     COLOR_BG, WINDOW_H,
     SLIDER_X, SLIDER_TOP, SLIDER_WIDTH, SLIDER_HANDLE_H
 )
-from graphics import draw_hud_text
-from ui import VerticalSlider, Button, draw_label
-from entities import Bird, PipeManager, Ground
+from graphics import draw_hud_text, render_text
+from ui import VerticalSlider, Button, draw_label, coalesce_motion, route_pointer
+from sim import Simulation, InputSample, FixedStep
+from render import PlayfieldRenderer, RetainedScene
+from profiler import FrameProfiler, EVENTS, INPUT, PHYSICS
+from gcpolicy import GcPolicy
+import recorder
 from input import make_input
-from settings import load_settings, save_settings, apply_preset
+from settings import save_settings, apply_preset, SettingsWatcher, DEFAULT_PATH
+
+# events each scene reacts to; everything else is dropped by SDL before it reaches the queue
+_BASE_EVENTS = [pg.QUIT, pg.KEYDOWN, pg.MOUSEBUTTONUP, pg.WINDOWEXPOSED, pg.VIDEOEXPOSE, pg.WINDOWSIZECHANGED]
+SCENE_EVENTS = {
+    "menu":     _BASE_EVENTS + [pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN],
+    "settings": _BASE_EVENTS + [pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN],
+    "playing":  _BASE_EVENTS + [pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN],
+    "dead":     _BASE_EVENTS,
+}
+# SDL's own event types (ids above 0x8000 are pygame proxies that alias QUIT, KEYDOWN, ...)
+_SDL_EVENTS = [t for t in range(pg.NOEVENT + 1, 0x8000) if pg.event.event_name(t) != "Unknown"]
 
 class Game:
-    def __init__(self, screen):
+    def __init__(self, screen, profiler: FrameProfiler | None = None, display=None):
         self.screen = screen
-        self.settings = load_settings()
+        self.display = display   # display.Display of the window (resize, fullscreen), None when headless
+        self.prof = profiler or FrameProfiler()
+        self.settings_watcher = SettingsWatcher()
+        self.settings_watcher.start()
+        self.settings = replace(self.settings_watcher.current)
 
         # Slider (for slider input testing)
         slider_bottom = WINDOW_H - self.settings.ground_height - 20
@@ -49,6 +72,25 @@ class Game:
         self.scene = "menu"    # "menu" | "settings" | "playing" | "dead"
         self._running = True
         self.input = None
+        self.recorder = None
+        self._detach_recorder = None
+        self.sim = Simulation(sw, sh, self.settings)
+        self.stepper = FixedStep()
+        self._sample = InputSample()
+        self.gc = GcPolicy(self.settings.gc_mode)
+        self.telemetry = None   # metrics.Telemetry when the station exports metrics
+        self.history = None     # history.RunTracker when the station keeps a session history
+        self.renderer = PlayfieldRenderer(self.screen)
+        self.menu_buttons = [self.btn_start, self.btn_settings, self.btn_quit]
+        self.settings_buttons = [self.btn_ctrl, self.btn_input, self.btn_preset, self.btn_apply, self.btn_back]
+        self.scenes = {
+            "menu": RetainedScene(self.screen, self.menu_buttons, self._draw_menu_static),
+            "settings": RetainedScene(self.screen, self.settings_buttons, self._draw_settings_static,
+                                      key=lambda: (self.settings.pipe_gap, self.settings.pipe_speed,
+                                                   self.settings.pipe_spawn_every)),
+        }
+        self._drawn_scene = None
+        self._filtered_scene = None
         self.reset()
 
     # ---------- helpers for preset cycler ----------
@@ -71,8 +113,11 @@ class Game:
     # ---------- actions ----------
     def _action_start(self):
         self.scene = "playing"
+        if self.input is not None:
+            self.input.close()
         self.input = make_input(self.settings, slider=self.slider)
         self.reset()
+        self._start_recording()
 
     def _action_go_settings(self):
         self.scene = "settings"
@@ -98,17 +143,55 @@ class Game:
         self._hot_reload_settings()
         self.scene = "menu"
 
+    # ---------- session recording ----------
+    def _start_recording(self):
+        if not self.settings.record_sessions or self.recorder is not None:
+            return
+        d = self.settings.record_dir
+        if not os.path.isabs(d):
+            d = os.path.join(os.path.dirname(DEFAULT_PATH), d)
+        path = os.path.join(d, time.strftime("session_%Y%m%d_%H%M%S.frrec"))
+        meta = {"settings": asdict(self.settings), "size": list(self.screen.get_size())}
+        self.recorder = recorder.SessionRecorder(path, meta=meta)
+        self._detach_recorder = recorder.attach(self, self.recorder)
+
+    def _stop_recording(self):
+        if self.recorder is None:
+            return
+        self._detach_recorder()
+        self.recorder.close()
+        self.recorder = self._detach_recorder = None
+
+    def close(self):
+        self.settings_watcher.stop()
+        self.gc.set_mode("auto")
+        self._stop_recording()
+        if self.history is not None:
+            self.history.close(self)
+        if self.input is not None:
+            self.input.close()
+
     # ---------- core ----------
     def reset(self):
-        w, h = self.screen.get_size()
-        self.bird = Bird(self.settings)
-        self.ground = Ground(w, h, self.settings)
-        self.pipes = PipeManager(w, h, self.settings)
-        self.score = 0
-        if self.scene == "playing":
-            v = self._read_input_value()
-            self.bird.rect.centery = self._target_from_input_value(v)
-            self.bird.vy = 0.0
+        self.sim.reset(self._read_input_value() if self.scene == "playing" else None)
+        self.stepper.reset()
+
+    # the entities live in the simulation core; these keep the old attribute names working
+    @property
+    def bird(self):
+        return self.sim.bird
+
+    @property
+    def pipes(self):
+        return self.sim.pipes
+
+    @property
+    def ground(self):
+        return self.sim.ground
+
+    @property
+    def score(self) -> int:
+        return self.sim.score
 
     def _read_input_value(self) -> float:
         v = 0.0
@@ -119,115 +202,201 @@ class Game:
         return max(0.0, min(1.0, v))
 
     def _target_from_input_value(self, v01: float) -> int:
-        playable_top = 0
-        playable_bot = WINDOW_H - self.settings.ground_height
-        return int(playable_bot - v01 * (playable_bot - playable_top))
+        return self.sim.target_from_value(v01)
+
+    def _sample_input(self) -> InputSample:
+        # one sample object, refilled every frame
+        sample = self._sample
+        if self.settings.control_mode == "position" and hasattr(self.input, "get_value01"):
+            sample.value01, sample.flap = self._read_input_value(), False
+        else:
+            sample.value01, sample.flap = None, self.input.get_flap()
+        return sample
 
     def _hot_reload_settings(self):
-        self.settings = load_settings()
+        # parsed on the watcher thread; picked up by update() at the next frame boundary
+        self.settings_watcher.request_reload()
+
+    def _apply_settings(self, snap):
+        # frame boundary: the watcher's snapshot is never mutated, the game works on its own copy
+        self.settings = replace(snap)
         self.slider.bottom = WINDOW_H - self.settings.ground_height - 20
-        self.ground.settings = self.settings
-        self.pipes.settings  = self.settings
-        self.bird.settings   = self.settings
+        self.sim.set_settings(self.settings)
+        if self.gc.mode != self.settings.gc_mode:
+            self.gc.set_mode(self.settings.gc_mode)
+        self._invalidate_screen()
+        self.btn_ctrl.label  = f"control_mode: {self.settings.control_mode}"
+        self.btn_input.label = f"input_mode: {self.settings.input_mode}"
+
+    def _invalidate_screen(self):
+        self.renderer.invalidate()
+        for sc in self.scenes.values():
+            sc.invalidate()
+
+    def _filter_events(self):
+        if self._filtered_scene != self.scene:
+            self._filtered_scene = self.scene
+            # block only what this scene ignores: blocking a type also drops queued events of that
+            # type, so set_blocked(None) would lose a QUIT/ESC/click that arrived with the switch
+            allowed = SCENE_EVENTS[self.scene]
+            pg.event.set_allowed(allowed)
+            pg.event.set_blocked([t for t in _SDL_EVENTS if t not in allowed])
+
+    @property
+    def idle(self) -> bool:
+        """Nothing on screen is moving, so the main loop may block until input arrives."""
+        return self.scene != "playing" and not self.prof.overlay
+
+    def _handle_key(self, event):
+        # edge-triggered: one action per key press, however long the key is held
+        if event.key == pg.K_ESCAPE:
+            if self.scene in ("playing", "dead"):
+                self.scene = "menu"
+            else:
+                self._running = False
+        elif event.key == pg.K_F5 or (event.key == pg.K_s and event.mod & pg.KMOD_SHIFT):
+            self._hot_reload_settings()
+        elif event.key == pg.K_s:
+            self.scene = "settings"
 
     # ---------- loop ----------
-    def update(self, dt: float) -> bool:
-        for event in pg.event.get():
+    def update(self, dt: float, events=None) -> bool:
+        """One frame. `events` are the ones the caller already took off the queue (idle wait), else pg.event.get()."""
+        snap = self.settings_watcher.poll()
+        if snap is not None:
+            self._apply_settings(snap)
+
+        self._filter_events()
+        started_in = self.scene
+        if events is None:
+            events = pg.event.get()
+        for event in coalesce_motion(events):
             if event.type == pg.QUIT:
                 self._running = False
+            elif event.type in (pg.WINDOWEXPOSED, pg.VIDEOEXPOSE):
+                self._invalidate_screen()
+            elif event.type == pg.WINDOWSIZECHANGED:
+                if self.display is not None:
+                    self.display.fit()
+                self._invalidate_screen()
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F11 and self.display is not None:
+                self.display.toggle_fullscreen()
+                self._invalidate_screen()
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                self.prof.overlay = not self.prof.overlay
+                self._invalidate_screen()
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F4:
+                self.prof.export_csv(time.strftime("frame_trace_%Y%m%d_%H%M%S.csv"))
+            elif event.type == pg.KEYDOWN:
+                self._handle_key(event)
 
             if self.scene == "menu":
-                self.btn_start.handle_event(event)
-                self.btn_settings.handle_event(event)
-                self.btn_quit.handle_event(event)
+                route_pointer(self.menu_buttons, event)
 
             elif self.scene == "settings":
-                self.btn_ctrl.handle_event(event)
-                self.btn_input.handle_event(event)
-                self.btn_preset.handle_event(event)
-                self.btn_apply.handle_event(event)
-                self.btn_back.handle_event(event)
+                route_pointer(self.settings_buttons, event)
 
             elif self.scene == "playing":
                 self.slider.handle_event(event)
 
         keys = pg.key.get_pressed()
-        mods = pg.key.get_mods()
-        if keys[pg.K_ESCAPE]:
-            if self.scene == "playing":
-                self.scene = "menu"
-            else:
-                self._running = False
-        if keys[pg.K_s] and (mods & pg.KMOD_SHIFT):
-            self._hot_reload_settings()
-        elif keys[pg.K_s]:
-            self.scene = "settings"
-
+        self.prof.mark(EVENTS)
 
-        if self.scene == "playing":
+        # the frame that starts a run (after an idle wait) carries no game time
+        if self.scene == "playing" and started_in == "playing":
             if self.input is None:
                 self.input = make_input(self.settings, slider=self.slider)
 
-            if self.settings.control_mode == "position" and hasattr(self.input, "get_value01"):
-                v = self._read_input_value()
-                target_y = self._target_from_input_value(v)
-                self.bird.update_position_control(dt, target_y)
-            else:
-                flap = getattr(self.input, "get_flap", lambda: False)()
-                self.bird.update(dt, flap)
-
-            self.pipes.update(dt)
-            self.ground.update(dt)
-            self.score += self.pipes.count_passed(self.bird.rect)
-
-            if self.pipes.collides(self.bird.rect) or self.ground.collides(self.bird.rect):
-                self.scene = "dead"
+            # physics runs in fixed steps; frames in between only re-draw (interpolated)
+            n = self.stepper.advance(dt)
+            sample = self._sample_input() if n else None
+            self.prof.mark(INPUT)
+            for _ in range(n):
+                if not self.sim.step(self.stepper.dt, sample):
+                    self.scene = "dead"
+                    break
+                sample.flap = False   # a flap is one impulse, not one per catch-up step
+            if self.history is not None:
+                self.history.frame(self.sim)
+            self.prof.mark(PHYSICS)
 
         elif self.scene == "dead":
             if keys[pg.K_r]:
                 self.scene = "playing"
                 self.reset()
 
+        if self.recorder is not None and self.scene in ("menu", "settings"):
+            self._stop_recording()
+        if self.scene != started_in:
+            self.gc.scene_changed(self.scene == "playing")
+            if self.telemetry is not None:
+                self.telemetry.scene_changed(started_in, self.scene, self.sim.score)
+            if self.history is not None:
+                self.history.scene_changed(started_in, self.scene, self)
+        self.gc.frame_end()
         return self._running
 
     def draw(self):
-        self.screen.fill(COLOR_BG)
+        """Draw the current scene. Returns the dirty rects to present, or None for a full flip."""
+        if self.scene != self._drawn_scene:
+            self._drawn_scene = self.scene
+            self._invalidate_screen()
 
         if self.scene in ("playing", "dead"):
-            self.pipes.draw(self.screen)
-            self.ground.draw(self.screen)
-            self.bird.draw(self.screen)
-            self.slider.draw(self.screen)
-            title = "FLAPPY REHAB"
-            hint = "Drag slider • R restart • ESC menu • S reload settings"
-            if self.scene == "dead":
-                hint = "Crashed! Press R to restart or ESC for menu"
-            draw_hud_text(self.screen, title, 18, (10, 8), color=(200, 230, 255))
-            draw_hud_text(self.screen, f"Score: {self.score}", 22, (10, 30))
-            draw_hud_text(self.screen, hint, 14, (10, WINDOW_H - 24), color=(180, 200, 220))
-
-        elif self.scene == "menu":
-            self._draw_title("FLAPPY REHAB — Menu")
-            self.btn_start.draw(self.screen)
-            self.btn_settings.draw(self.screen)
-            self.btn_quit.draw(self.screen)
-            draw_hud_text(self.screen, "Start the game or open Settings for presets.", 14, (10, WINDOW_H - 24))
-
-        elif self.scene == "settings":
-            self._draw_title("Settings")
-            self.btn_ctrl.draw(self.screen)
-            self.btn_input.draw(self.screen)
-            self.btn_preset.draw(self.screen)
-            # live readout of the three preset-driven settings
-            cx = self.screen.get_width() // 2
-            draw_label(self.screen, f"Pipe Gap: {int(self.settings.pipe_gap)} px", cx, 360)
-            draw_label(self.screen, f"Pipe Speed: {int(self.settings.pipe_speed)} px/s", cx, 390)
-            draw_label(self.screen, f"Spawn Every: {self.settings.pipe_spawn_every:.2f} s", cx, 420)
-            self.btn_apply.draw(self.screen)
-            self.btn_back.draw(self.screen)
-
-    def _draw_title(self, text):
-        font = pg.font.SysFont("arial", 28)
-        img = font.render(text, True, (220, 235, 250))
-        r = img.get_rect(center=(self.screen.get_width()//2, 120))
-        self.screen.blit(img, r)
+            return self._draw_playfield()
+
+        scene = self.scenes[self.scene]
+        dirty = scene.draw()
+        if self.prof.overlay:
+            panel = self._draw_profiler(self.screen.blit)
+            scene.overdraw(panel)
+            if dirty is not None:
+                dirty.append(panel)
+        return dirty
+
+    def _draw_menu_static(self, surf):
+        surf.fill(COLOR_BG)
+        self._draw_title(surf, "FLAPPY REHAB — Menu")
+        draw_hud_text(surf, "Start the game or open Settings for presets.", 14, (10, WINDOW_H - 24))
+
+    def _draw_settings_static(self, surf):
+        surf.fill(COLOR_BG)
+        self._draw_title(surf, "Settings")
+        # live readout of the three preset-driven settings
+        cx = surf.get_width() // 2
+        draw_label(surf, f"Pipe Gap: {int(self.settings.pipe_gap)} px", cx, 360)
+        draw_label(surf, f"Pipe Speed: {int(self.settings.pipe_speed)} px/s", cx, 390)
+        draw_label(surf, f"Spawn Every: {self.settings.pipe_spawn_every:.2f} s", cx, 420)
+
+    def _draw_playfield(self):
+        r = self.renderer
+        r.begin()
+        r.draw_sim(self.sim, self.stepper.alpha if self.scene == "playing" else 1.0)
+        sl = self.slider
+        sl.draw(self.screen)
+        r.mark((sl.x - 16, sl.top - sl.handle_h // 2, 33, sl.bottom - sl.top + sl.handle_h + 1))
+        title = "FLAPPY REHAB"
+        hint = "Drag slider • R restart • ESC menu • S reload settings"
+        if self.scene == "dead":
+            hint = "Crashed! Press R to restart or ESC for menu"
+        r.blit(render_text(title, 18, (200, 230, 255)), (10, 8))
+        r.blit(render_text(f"Score: {self.score}", 22), (10, 30))
+        r.blit(render_text(hint, 14, (180, 200, 220)), (10, WINDOW_H - 24))
+        if self.prof.overlay:
+            r.mark(self._draw_profiler(r.blit))
+        return r.end()
+
+    def _draw_profiler(self, blit):
+        lines = self.prof.overlay_lines()
+        w, lh = 190, 15
+        x, y = self.screen.get_width() - w - 6, 6
+        panel = pg.Rect(x - 4, y - 2, w + 8, lh * len(lines) + 4)
+        self.screen.fill((0, 0, 0), panel)
+        for i, line in enumerate(lines):
+            blit(render_text(line, 13, (200, 255, 200)), (x, y + i * lh))
+        return panel
+
+    def _draw_title(self, surf, text):
+        img = render_text(text, 28, (220, 235, 250))
+        r = img.get_rect(center=(surf.get_width()//2, 120))
+        surf.blit(img, r)
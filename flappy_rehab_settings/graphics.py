@@ -1,17 +1,104 @@
+import json
+import os
+from collections import OrderedDict
 import pygame as pg
 from config import COLOR_FG
 
+FONT_NAME = "arial"
+
 _font_cache = {}
+_font_paths = {}
+
+def font_index_path() -> str:
+    """Where resolved font files are remembered between runs (delete it to rescan)."""
+    base = (os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "flappy_rehab", "fonts.json")
+
+def font_path(name: str = FONT_NAME):
+    """File of system font `name`, or None for pygame's bundled default.
+
+    Finding it means scanning the system font directories (what SysFont does on every first
+    call), so the answer is kept in font_index_path() and only re-resolved if the file is gone.
+    """
+    if name in _font_paths:
+        return _font_paths[name]
+    index_file = font_index_path()
+    try:
+        with open(index_file, encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    path = index.get(name, "")
+    if path == "" or (path is not None and not os.path.exists(path)):
+        path = pg.font.match_font(name)
+        index[name] = path
+        try:
+            os.makedirs(os.path.dirname(index_file), exist_ok=True)
+            tmp = index_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp, index_file)
+        except OSError:
+            pass
+    _font_paths[name] = path
+    return path
 
 def get_font(size: int) -> pg.font.Font:
     key = size
     f = _font_cache.get(key)
     if f is None:
-        f = pg.font.SysFont("arial", size)
+        f = pg.font.Font(font_path(), size)
         _font_cache[key] = f
     return f
 
+class TextCache:
+    """LRU of rendered text surfaces keyed by (text, size, color, antialias), bounded by pixel memory."""
+    def __init__(self, max_bytes: int = 4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def render(self, text: str, size: int, color=COLOR_FG, antialias: bool = True) -> pg.Surface:
+        key = (text, size, tuple(color), antialias)
+        img = self._items.get(key)
+        if img is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return img
+        self.misses += 1
+        img = get_font(size).render(text, antialias, color)
+        cost = img.get_bytesize() * img.get_width() * img.get_height()
+        self._items[key] = img
+        self.bytes += cost
+        while self.bytes > self.max_bytes and len(self._items) > 1:
+            _, old = self._items.popitem(last=False)
+            self.bytes -= old.get_bytesize() * old.get_width() * old.get_height()
+            self.evictions += 1
+        return img
+
+    def clear(self):
+        self._items.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._items),
+            "bytes": self.bytes,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+text_cache = TextCache()
+
+def render_text(text: str, size: int, color=COLOR_FG, antialias: bool = True) -> pg.Surface:
+    return text_cache.render(text, size, color, antialias)
+
 def draw_hud_text(surf: pg.Surface, text: str, size: int, pos: tuple[int, int], color=COLOR_FG):
-    font = get_font(size)
-    img = font.render(text, True, color)
-    surf.blit(img, pos)
+    surf.blit(render_text(text, size, color), pos)
@@ -0,0 +1,434 @@
+"""Session history: every run (patient, preset, settings, score, duration, per-pipe outcomes) in SQLite.
+
+    python history.py list --patient P017 --last 20
+    python history.py list --preset old_lady --since 2025-01-01
+    python history.py export --out runs.jsonl [--patient P017]
+    python history.py import runs.jsonl other_station.jsonl
+    python history.py bench --sessions 1000000        # synthetic history in a temp file, indexed vs scan
+
+The station writes runs as they end (main.py opens the database named by the history_db setting;
+patient_id is stored with each run). The game thread only snapshots the run and puts it on a
+queue; a writer thread owns the connection and inserts whatever has queued up in one transaction,
+so game-over never waits on the disk. Settings snapshots are stored once and shared by every run
+that used them. A run is identified by (patient, started, settings, score), so importing the same
+export twice, or one that overlaps the station's own history, adds nothing. The (patient, started, score) and (preset, started, score) indexes answer the
+per-patient and per-preset queries below without touching the table.
+
+Per-pipe outcomes are a packed PIPE array per run: time, gap centre, gap size, bird offset from
+the gap centre (px, + = below) and PASSED / HIT_TOP / HIT_BOTTOM.
+"""
+from __future__ import annotations
+import argparse, json, os, queue, random, shutil, sqlite3, struct, sys, tempfile, threading, time
+from dataclasses import asdict, replace
+from settings import Settings, PRESETS, DEFAULT_PATH, apply_preset, preset_of
+
+PIPE = struct.Struct("<fhhhB")   # t, gap_y, gap, offset, outcome
+PASSED, HIT_TOP, HIT_BOTTOM = 0, 1, 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings_snapshots (
+    id INTEGER PRIMARY KEY,
+    json TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    patient TEXT NOT NULL,           -- settings.patient_id, '' if not set
+    started REAL NOT NULL,           -- unix time
+    duration_s REAL NOT NULL,        -- game time played
+    preset TEXT NOT NULL,            -- settings.preset_of(), 'custom' if none matches
+    control_mode TEXT NOT NULL,
+    input_mode TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    end_reason TEXT NOT NULL,        -- 'pipe' | 'ground' | 'quit'
+    settings_id INTEGER NOT NULL REFERENCES settings_snapshots(id),
+    pipes BLOB NOT NULL              -- PIPE records
+);
+"""
+# a run's natural key; an index rather than a table constraint so databases from before it get it too
+NATURAL_KEY = "CREATE UNIQUE INDEX IF NOT EXISTS sessions_natural ON sessions(patient, started, settings_id, score)"
+# run one by one with execute(): executescript() commits first, which would break import_runs' transaction
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS sessions_by_patient ON sessions(patient, started, score)",
+    "CREATE INDEX IF NOT EXISTS sessions_by_preset ON sessions(preset, started, score)",
+)
+COLUMNS = ("patient", "started", "duration_s", "preset", "control_mode", "input_mode",
+           "score", "end_reason", "settings_id", "pipes")
+_INSERT = f"INSERT OR IGNORE INTO sessions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+QUERIES = {
+    "patient_recent": "SELECT started, score, preset FROM sessions {hint} WHERE patient = ? "
+                      "ORDER BY started DESC LIMIT 20",
+    "patient_monthly": "SELECT strftime('%Y-%m', started, 'unixepoch') AS month, COUNT(*), AVG(score), MAX(score) "
+                       "FROM sessions {hint} WHERE patient = ? GROUP BY month",
+    "preset_window": "SELECT COUNT(*), AVG(score), MAX(score) FROM sessions {hint} WHERE preset = ? AND started >= ?",
+}
+
+def resolve_path(path: str) -> str:
+    """Relative paths are taken next to settings.json, like record_dir."""
+    return path if os.path.isabs(path) else os.path.join(os.path.dirname(DEFAULT_PATH), path)
+
+def connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")      # readers (list/export) do not block the station
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    for sql in INDEXES:
+        conn.execute(sql)
+    try:
+        conn.execute(NATURAL_KEY)
+    except sqlite3.IntegrityError:    # an older database with duplicate imports: keep the first copy
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE id NOT IN (SELECT MIN(id) FROM sessions "
+                         "GROUP BY patient, started, settings_id, score)")
+        conn.execute(NATURAL_KEY)
+    return conn
+
+def pack_pipes(pipes) -> bytes:
+    return b"".join(PIPE.pack(*p) for p in pipes)
+
+def decode_pipes(blob: bytes) -> list[tuple]:
+    return list(PIPE.iter_unpack(blob))
+
+def _settings_id(conn, cache: dict, settings: dict) -> int:
+    key = tuple(settings.items())    # much cheaper than encoding the JSON for every run
+    sid = cache.get(key)
+    if sid is None:
+        js = json.dumps(settings, sort_keys=True)
+        conn.execute("INSERT OR IGNORE INTO settings_snapshots (json) VALUES (?)", (js,))
+        (sid,) = conn.execute("SELECT id FROM settings_snapshots WHERE json = ?", (js,)).fetchone()
+        cache[key] = sid
+    return sid
+
+def _row(conn, cache: dict, run: dict) -> tuple:
+    """A run dict (see RunTracker / export) as a sessions row."""
+    s = run["settings"]
+    return (run.get("patient", ""), run["started"], run["duration_s"], run.get("preset") or preset_of(s),
+            s.get("control_mode", ""), s.get("input_mode", ""), run["score"], run["end_reason"],
+            _settings_id(conn, cache, s), pack_pipes(run.get("pipes", ())))
+
+# ---------- writing (station) ----------
+class HistoryWriter(threading.Thread):
+    """Owns the database connection; submit() is a queue put and never touches the disk."""
+    BATCH = 256           # runs per transaction at most
+    LINGER = 0.5          # seconds to wait for more runs before committing a batch
+
+    def __init__(self, path: str):
+        super().__init__(name="history-writer", daemon=True)
+        self.path = path
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.write_s = 0.0
+        self._q = queue.SimpleQueue()
+
+    def submit(self, run: dict):
+        self._q.put(run)
+
+    def close(self, timeout: float = 10.0):
+        self._q.put(None)
+        self.join(timeout)
+
+    def run(self):
+        try:
+            conn = connect(self.path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"history: {self.path}: {e}", file=sys.stderr)
+            conn = None      # keep draining the queue so close() returns; runs are counted as failed
+        cache = {}
+        try:
+            while True:
+                item = self._q.get()
+                batch = []
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) == self.BATCH:
+                        break
+                    try:
+                        item = self._q.get(timeout=self.LINGER)
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write(conn, cache, batch)
+                if item is None:
+                    return
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _write(self, conn, cache, batch):
+        if conn is None:
+            self.failed += len(batch)
+            return
+        t0 = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(_INSERT, [_row(conn, cache, dict(r, settings=asdict(r["settings"]))) for r in batch])
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as e:
+            cache.clear()    # a rolled back snapshot insert may be cached
+            self.failed += len(batch)
+            print(f"history: {e}", file=sys.stderr)
+        self.write_s += time.perf_counter() - t0
+
+class RunTracker:
+    """Follows the game's runs and hands each finished one to a HistoryWriter.
+
+    Game.update calls frame() after the physics of every playing frame (one int compare unless
+    a pipe was just cleared) and scene_changed() on scene switches.
+    """
+    def __init__(self, writer: HistoryWriter):
+        self.writer = writer
+        self._run = None
+        self._score = 0
+
+    def scene_changed(self, old: str, new: str, game):
+        if old == "playing" and self._run is not None:
+            self._finish(game.sim, crashed=new == "dead")
+        if new == "playing":
+            s = game.settings
+            # a copy: the settings screen edits game.settings in place
+            self._run = dict(patient=s.patient_id, started=time.time(), settings=replace(s), pipes=[])
+            self._score = game.sim.score
+
+    def frame(self, sim):
+        score = sim.score
+        if score == self._score or self._run is None:
+            return
+        k, self._score = score - self._score, score
+        by = sim.bird.rect.centery
+        for top, bot, passed in reversed(sim.pipes.pipes):
+            if passed:
+                gap_y = (top.bottom + bot.top) // 2
+                self._run["pipes"].append((sim.time, gap_y, bot.top - top.bottom, by - gap_y, PASSED))
+                k -= 1
+                if not k:
+                    break
+
+    def _finish(self, sim, crashed: bool):
+        run, self._run = self._run, None
+        reason = "quit"
+        if crashed:
+            reason = "ground"
+            b = sim.bird.rect
+            for top, bot, _ in sim.pipes.pipes:
+                hit = HIT_TOP if b.colliderect(top) else HIT_BOTTOM if b.colliderect(bot) else None
+                if hit is not None:
+                    gap_y = (top.bottom + bot.top) // 2
+                    run["pipes"].append((sim.time, gap_y, bot.top - top.bottom, b.centery - gap_y, hit))
+                    reason = "pipe"
+                    break
+        run.update(duration_s=sim.time, score=sim.score, end_reason=reason)
+        self.writer.submit(run)
+
+    def close(self, game):
+        """Record a run still in progress and flush everything to disk."""
+        if self._run is not None:
+            self._finish(game.sim, crashed=False)
+        self.writer.close()
+
+def open_history(settings: Settings) -> RunTracker | None:
+    if not settings.history_db:
+        return None
+    writer = HistoryWriter(resolve_path(settings.history_db))
+    writer.start()
+    return RunTracker(writer)
+
+# ---------- bulk import / export ----------
+def export_runs(conn, out, where: str = "", args=()) -> int:
+    """Write runs as JSON lines (settings and pipes inline); returns the count."""
+    snaps = {sid: json.loads(js) for sid, js in conn.execute("SELECT id, json FROM settings_snapshots")}
+    n = 0
+    for row in conn.execute(f"SELECT {', '.join(COLUMNS)} FROM sessions {where} ORDER BY started", args):
+        run = dict(zip(COLUMNS, row))
+        run["settings"] = snaps[run.pop("settings_id")]
+        run["pipes"] = decode_pipes(run["pipes"])
+        out.write(json.dumps(run) + "\n")
+        n += 1
+    return n
+
+def import_runs(conn, runs, batch: int = 10_000, defer_indexes: bool = False) -> int:
+    """Insert an iterable of run dicts in one transaction; returns how many were new (runs already
+    in the database are skipped). With defer_indexes the query indexes are dropped first and rebuilt
+    once at the end, which is much faster for large imports."""
+    cache = {}
+    n = 0
+    with conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN")    # sqlite3 only begins implicitly before DML, not before the DROPs
+        if defer_indexes:
+            conn.execute("DROP INDEX IF EXISTS sessions_by_patient")
+            conn.execute("DROP INDEX IF EXISTS sessions_by_preset")
+        rows = []
+        for run in runs:
+            rows.append(_row(conn, cache, run))
+            if len(rows) == batch:
+                n += conn.executemany(_INSERT, rows).rowcount     # ignored duplicates are not counted
+                rows.clear()
+        n += conn.executemany(_INSERT, rows).rowcount
+        if defer_indexes:
+            for sql in INDEXES:
+                conn.execute(sql)
+    return n
+
+def _read_jsonl(paths):
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+# ---------- benchmark ----------
+def synthetic_runs(n: int, patients: int = 2000, years: float = 5.0, seed: int = 1):
+    """Plausible runs: each patient plays a preset for a while, scores drift up with practice."""
+    rnd = random.Random(seed)
+    presets = []
+    for name in PRESETS:
+        s = asdict(apply_preset(Settings(), name))
+        presets.append((name, s))
+    t_end = time.time()
+    t_start = t_end - years * 365 * 86400
+    for i in range(n):
+        p = rnd.randrange(patients)
+        name, s = presets[p % len(presets)]
+        score = int(rnd.expovariate(1 / (3 + 12 * i / n)))
+        pipes = [(1.25 * (k + 2), 200 + k * 37 % 200, s["pipe_gap"], rnd.randint(-40, 40), PASSED) for k in range(score)]
+        yield dict(patient=f"P{p:05d}", started=rnd.uniform(t_start, t_end), duration_s=1.25 * score + 2.5,
+                   preset=name, settings=s, score=score, end_reason="pipe" if rnd.random() < 0.8 else "ground",
+                   pipes=pipes)
+
+def remove_db(path: str):
+    """Delete a database together with its WAL and shared-memory files."""
+    for p in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+
+def bench(path: str | None, sessions: int, queries: int = 200, seed: int = 1, force: bool = False) -> dict:
+    """Build a synthetic history and time the queries. path=None uses a temp file that is removed
+    afterwards; an existing path is only overwritten with force=True."""
+    tmp = None
+    if path is None:
+        tmp = tempfile.mkdtemp(prefix="history_bench")
+        path = os.path.join(tmp, "bench.sqlite3")
+    elif os.path.exists(path):
+        if not force:
+            raise FileExistsError(f"{path} exists (pass force=True to overwrite it)")
+        remove_db(path)
+    try:
+        return _bench(path, sessions, queries, seed)
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+def _bench(path: str, sessions: int, queries: int, seed: int) -> dict:
+    conn = connect(path)
+    t0 = time.perf_counter()
+    n = import_runs(conn, synthetic_runs(sessions, seed=seed), defer_indexes=True)
+    t_import = time.perf_counter() - t0
+    rnd = random.Random(seed)
+    presets = list(PRESETS)
+    since = time.time() - 90 * 86400
+    args = {
+        "patient_recent": lambda: (f"P{rnd.randrange(2000):05d}",),
+        "patient_monthly": lambda: (f"P{rnd.randrange(2000):05d}",),
+        "preset_window": lambda: (rnd.choice(presets), since),
+    }
+    out = dict(sessions=n, import_s=round(t_import, 2), rows_per_s=round(n / t_import),
+               db_mb=round(os.path.getsize(path) / 1e6, 1), queries={})
+    for name, sql in QUERIES.items():
+        res = {}
+        for label, hint, reps in (("indexed", "", queries), ("scan", "NOT INDEXED", 3)):
+            q = sql.format(hint=hint)
+            times = []
+            for _ in range(reps):
+                t0 = time.perf_counter()
+                conn.execute(q, args[name]()).fetchall()
+                times.append(time.perf_counter() - t0)
+            times.sort()
+            res[f"{label}_ms_p50"] = round(1e3 * times[len(times) // 2], 3)
+            res[f"{label}_ms_max"] = round(1e3 * times[-1], 3)
+        out["queries"][name] = res
+    conn.close()
+    return out
+
+# ---------- CLI ----------
+def _where(args) -> tuple[str, list]:
+    cond, vals = [], []
+    if args.patient:
+        cond.append("patient = ?")
+        vals.append(args.patient)
+    if args.preset:
+        cond.append("preset = ?")
+        vals.append(args.preset)
+    if args.since:
+        cond.append("started >= ?")
+        vals.append(time.mktime(time.strptime(args.since, "%Y-%m-%d")))
+    return ("WHERE " + " AND ".join(cond) if cond else ""), vals
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default=None, help="database (default: the history_db setting)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("list", "export"):
+        p = sub.add_parser(name)
+        p.add_argument("--patient")
+        p.add_argument("--preset")
+        p.add_argument("--since", metavar="YYYY-MM-DD")
+        if name == "list":
+            p.add_argument("--last", type=int, default=20)
+        else:
+            p.add_argument("--out", default="-", help="JSON lines file (default stdout)")
+    p = sub.add_parser("import")
+    p.add_argument("files", nargs="+", help="JSON lines written by export")
+    p.add_argument("--rebuild-indexes", action="store_true",
+                   help="drop the indexes while importing and rebuild them after (default when the database is empty)")
+    p = sub.add_parser("bench")
+    p.add_argument("--sessions", type=int, default=1_000_000)
+    p.add_argument("--queries", type=int, default=200, help="indexed queries per kind")
+    p.add_argument("--out", help="write the results as JSON here too")
+    p.add_argument("--bench-db", help="keep the benchmark database here (default: a temp file, removed after)")
+    p.add_argument("--force", action="store_true", help="overwrite an existing --bench-db")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "bench":
+        if args.bench_db and os.path.exists(args.bench_db) and not args.force:
+            ap.error(f"{args.bench_db} exists; pass --force to overwrite it")
+        res = bench(args.bench_db, args.sessions, args.queries, force=args.force)
+        print(json.dumps(res, indent=1))
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(res, f, indent=1)
+        return 0
+
+    from settings import load_settings
+    conn = connect(args.db or resolve_path(load_settings().history_db or Settings().history_db))
+    if args.cmd == "import":
+        (existing,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        t0 = time.perf_counter()
+        n = import_runs(conn, _read_jsonl(args.files), defer_indexes=args.rebuild_indexes or not existing)
+        print(f"{n} runs imported in {time.perf_counter() - t0:.1f}s")
+    elif args.cmd == "export":
+        where, vals = _where(args)
+        if args.out == "-":
+            n = export_runs(conn, sys.stdout, where, vals)
+        else:
+            with open(args.out, "w", encoding="utf-8") as f:
+                n = export_runs(conn, f, where, vals)
+        print(f"{n} runs exported", file=sys.stderr)
+    else:
+        where, vals = _where(args)
+        rows = conn.execute(f"SELECT started, patient, preset, score, duration_s, end_reason, pipes FROM sessions "
+                            f"{where} ORDER BY started DESC LIMIT ?", vals + [args.last]).fetchall()
+        for started, patient, preset, score, dur, reason, pipes in reversed(rows):
+            cleared = [p for p in decode_pipes(pipes) if p[4] == PASSED]
+            off = sum(abs(p[3]) for p in cleared) / len(cleared) if cleared else 0.0
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(started))}  {patient or '-':10} {preset:16} "
+                  f"score {score:3}  {dur:6.1f}s  {reason:6}  mean |offset| {off:5.1f}px")
+        count, best, mean = conn.execute(f"SELECT COUNT(*), MAX(score), AVG(score) FROM sessions {where}", vals).fetchone()
+        print(f"{count} runs, best {best}, mean {mean or 0:.1f}")
+    conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
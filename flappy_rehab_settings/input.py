@@ -1,15 +1,30 @@
+import math
+import struct
 import time
+import threading
+from array import array
+from collections import deque
 import pygame as pg
 from settings import Settings
 
+def _import_serial():
+    """pyserial, imported only once a rehab device is actually opened (None if not installed)."""
+    try:
+        import serial  # pyserial
+    except ImportError:
+        return None
+    return serial
+
 try:
-    import serial  # pyserial
+    import numpy as np
 except ImportError:
-    serial = None
+    np = None
 
 class InputBase:
     def get_flap(self) -> bool:
         raise NotImplementedError
+    def close(self):
+        pass
 
 class KeyboardInput(InputBase):
     def __init__(self):
@@ -29,47 +44,436 @@ class SliderInput(InputBase):
     def get_flap(self) -> bool:
         return False
 
-class RehabFingerInput(InputBase):
-    """Reads a normalized float [0..1] over serial; also supports flap edge detect if needed."""
-    def __init__(self, settings: Settings):
-        self.s = settings
-        self.prev_val = 0.0
-        self.last_time = 0.0
+class SampleRing:
+    """Fixed-size ring of (monotonic time, value) samples. One writer thread, any number of readers.
+
+    `count` only ever grows; the newest sample lives at (count - 1) % capacity. Each sample also
+    keeps the device value it was filtered from (`raw`, for recording).
+    """
+    def __init__(self, capacity: int = 2048):
+        self.capacity = capacity
+        self.t = array("d", bytes(8 * capacity))
+        self.v = array("d", bytes(8 * capacity))
+        self.raw = array("d", bytes(8 * capacity))
+        self.count = 0
+        self.consumed = 0     # count as of the last read
+        self.overflowed = 0   # samples overwritten before any read saw them
+
+    def push(self, t: float, v: float, raw: float = math.nan):
+        n = self.count
+        if n - self.consumed >= self.capacity:
+            self.overflowed += 1
+        i = n % self.capacity
+        self.t[i] = t
+        self.v[i] = v
+        self.raw[i] = raw
+        self.count = n + 1   # publish last, after the slot is written
+
+    def latest(self):
+        n = self.count
+        if n == 0:
+            return None
+        self.consumed = n
+        i = (n - 1) % self.capacity
+        return self.t[i], self.v[i]
+
+    def since(self, start: int):
+        """Samples with sequence number >= start (clipped to what is still in the ring), oldest first."""
+        n = self.count
+        start = max(start, n - self.capacity, 0)
+        self.consumed = n
+        cap = self.capacity
+        return [(self.t[k % cap], self.v[k % cap]) for k in range(start, n)], n
+
+    def consumed_raw(self) -> float:
+        """Unfiltered value of the newest sample the last latest()/since() returned."""
+        n = self.consumed
+        return self.raw[(n - 1) % self.capacity] if n else math.nan
+
+    def window(self, n: int):
+        """The newest n samples, oldest first."""
+        samples, _ = self.since(self.count - n)
+        return samples
+
+# ---- Wire protocols ----
+# ascii:  one float per line, e.g. b"0.42\n"
+# binary: SYNC, seq (u8, wraps), channels * u16 LE (0..65535 -> 0..1), CRC-8/ATM over seq + payload
+SYNC = 0xA5
+
+def _crc8_table(poly: int = 0x07):
+    table = []
+    for b in range(256):
+        c = b
+        for _ in range(8):
+            c = ((c << 1) ^ poly) & 0xFF if c & 0x80 else (c << 1) & 0xFF
+        table.append(c)
+    return bytes(table)
+
+CRC8_TABLE = _crc8_table()
+_CRC8_NP = np.frombuffer(CRC8_TABLE, np.uint8) if np is not None else None
+
+def crc8(data) -> int:
+    c = 0
+    for b in data:
+        c = CRC8_TABLE[c ^ b]
+    return c
+
+def encode_frame(seq: int, values) -> bytes:
+    """One binary frame; values are 0..1 floats, one per channel."""
+    body = struct.pack(f"<B{len(values)}H", seq & 0xFF, *(max(0, min(65535, round(v * 65535))) for v in values))
+    return bytes((SYNC,)) + body + bytes((crc8(body),))
+
+class AsciiDecoder:
+    MAX_LINE = 64
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.malformed = 0
+        self.dropped = 0
+        self.lost = 0
+
+    def feed(self, chunk: bytes) -> list[float]:
+        buf = self.buf
+        buf += chunk
+        out = []
+        start = 0
+        while True:
+            nl = buf.find(b"\n", start)
+            if nl < 0:
+                break
+            line = buf[start:nl].strip()
+            start = nl + 1
+            if not line:
+                continue
+            try:
+                val = float(line)
+            except ValueError:
+                self.malformed += 1
+                continue
+            if not math.isfinite(val):  # "nan", "inf" would poison the filters for good
+                self.malformed += 1
+                continue
+            out.append(val)
+        del buf[:start]
+        if len(buf) > self.MAX_LINE:
+            self.dropped += 1
+            buf.clear()
+        return out
+
+    def reset(self):
+        if self.buf:
+            self.dropped += 1
+            self.buf.clear()
+
+class BinaryDecoder:
+    """Decodes whole blocks of frames at once (NumPy when available, struct.iter_unpack otherwise).
+
+    Bytes that do not start a frame with a valid CRC are skipped up to the next SYNC (counted in
+    `dropped`); gaps in the sequence numbers are counted in `lost`.
+    """
+    def __init__(self, channels: int = 1, channel: int = 0):
+        self.channels = channels
+        self.channel = min(channel, channels - 1)
+        self.frame_size = 3 + 2 * channels
+        self._frame = struct.Struct(f"<BB{channels}HB")
+        self.buf = bytearray()
+        self.last_seq = None
+        self.last_frame = None   # all channels of the newest frame, 0..1
+        self.malformed = 0       # CRC failures
+        self.dropped = 0         # bytes skipped while resynchronising
+        self.lost = 0            # frames missing from the sequence (CRC rejects included)
+
+    def _count_lost(self, seqs):
+        """Sequence gaps before and within a run of good frames (a list, or a uint8 array)."""
+        if not len(seqs):
+            return
+        if self.last_seq is not None:
+            self.lost += (int(seqs[0]) - self.last_seq - 1) & 0xFF
+        if np is not None and isinstance(seqs, np.ndarray):
+            # widen first: uint8 arithmetic would wrap (and warn) before the & 0xFF
+            self.lost += int(((np.diff(seqs.astype(np.int32)) - 1) & 0xFF).sum())
+        else:
+            self.lost += sum((b - a - 1) & 0xFF for a, b in zip(seqs, seqs[1:]))
+        self.last_seq = int(seqs[-1])
+
+    def _decode_run(self, block: bytes) -> tuple[int, list[float]]:
+        """Decode the leading run of valid frames in `block`; returns (frames used, values)."""
+        fs = self.frame_size
+        n = len(block) // fs
+        if np is not None:
+            arr = np.frombuffer(block, np.uint8, n * fs).reshape(n, fs)
+            ok = arr[:, 0] == SYNC
+            crc = np.zeros(n, np.uint8)
+            for c in range(1, fs - 1):
+                crc = _CRC8_NP[crc ^ arr[:, c]]
+            ok &= crc == arr[:, fs - 1]
+            k = int(ok.argmin()) if not ok.all() else n
+            if not k:
+                return 0, []
+            self._count_lost(arr[:k, 1])
+            payload = np.ascontiguousarray(arr[:k, 2:fs - 1]).view("<u2") * (1.0 / 65535)
+            self.last_frame = payload[-1].tolist()
+            return k, payload[:, self.channel].tolist()
+        k, out, seqs = 0, [], []
+        table = CRC8_TABLE
+        for fr in self._frame.iter_unpack(block[:n * fs]):
+            if fr[0] != SYNC:
+                break
+            c = 0
+            for b in block[k * fs + 1:(k + 1) * fs - 1]:
+                c = table[c ^ b]
+            if c != fr[-1]:
+                break
+            seqs.append(fr[1])
+            out.append(fr[2 + self.channel] / 65535)
+            self.last_frame = [v / 65535 for v in fr[2:-1]]
+            k += 1
+        self._count_lost(seqs)
+        return k, out
+
+    def feed(self, chunk: bytes) -> list[float]:
+        buf = self.buf
+        buf += chunk
+        fs = self.frame_size
+        out = []
+        pos = 0
+        while len(buf) - pos >= fs:
+            k, vals = self._decode_run(bytes(buf[pos:pos + (len(buf) - pos) // fs * fs]))
+            out.extend(vals)
+            pos += k * fs
+            if len(buf) - pos < fs:
+                break
+            # the frame at pos is bad (or misaligned): skip to the next sync byte
+            if buf[pos] == SYNC:
+                self.malformed += 1
+            nxt = buf.find(SYNC, pos + 1)
+            if nxt < 0:
+                nxt = len(buf)
+            self.dropped += nxt - pos
+            pos = nxt
+        del buf[:pos]
+        return out
+
+    def reset(self):
+        self.dropped += len(self.buf)
+        self.buf.clear()
+        self.last_seq = None
+
+# ---- Filters (applied to each decoded block before it reaches the ring) ----
+class MovingAverage:
+    def __init__(self, window: int):
+        self.hist = deque(maxlen=window)
+        self.total = 0.0
+
+    def process(self, values: list[float], dt: float) -> list[float]:
+        hist, out = self.hist, []
+        for v in values:
+            if len(hist) == hist.maxlen:
+                self.total -= hist[0]
+            hist.append(v)
+            self.total += v
+            out.append(self.total / len(hist))
+        return out
+
+class OneEuroFilter:
+    """Casiez et al. 1€ filter: low lag when the finger moves, heavy smoothing when it rests."""
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.5, d_cutoff: float = 1.0):
+        self.min_cutoff, self.beta, self.d_cutoff = min_cutoff, beta, d_cutoff
+        self.x = None
+        self.dx = 0.0
+
+    @staticmethod
+    def _alpha(cutoff: float, dt: float) -> float:
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def process(self, values: list[float], dt: float) -> list[float]:
+        out = []
+        a_d = self._alpha(self.d_cutoff, dt)
+        for v in values:
+            if self.x is None:
+                self.x = v
+            else:
+                self.dx += a_d * ((v - self.x) / dt - self.dx)
+                a = self._alpha(self.min_cutoff + self.beta * abs(self.dx), dt)
+                self.x += a * (v - self.x)
+            out.append(self.x)
+        return out
+
+class Calibration:
+    """Maps the patient's measured raw range onto 0..1 (and clamps)."""
+    def __init__(self, lo: float = 0.0, hi: float = 1.0):
+        self.lo = lo
+        self.scale = 1.0 / (hi - lo) if hi > lo else 1.0
+
+    def process(self, values: list[float], dt: float) -> list[float]:
+        lo, k = self.lo, self.scale
+        return [0.0 if v <= lo else min(1.0, (v - lo) * k) for v in values]
+
+def make_filters(s: Settings) -> list:
+    chain = []
+    if s.rehab_filter == "moving_average":
+        chain.append(MovingAverage(s.rehab_filter_window))
+    elif s.rehab_filter == "one_euro":
+        chain.append(OneEuroFilter(s.rehab_one_euro_min_cutoff, s.rehab_one_euro_beta))
+    chain.append(Calibration(s.rehab_cal_min, s.rehab_cal_max))
+    return chain
+
+def make_decoder(s: Settings):
+    if s.rehab_protocol == "binary":
+        return BinaryDecoder(s.rehab_channels, s.rehab_channel)
+    return AsciiDecoder()
+
+class SerialReader(threading.Thread):
+    """Drains a serial port continuously: decode -> filter -> SampleRing."""
+    def __init__(self, open_port, ring: SampleRing, decoder=None, filters=(), rate_hz: float = 100.0,
+                 reopen_every: float = 0.5):
+        super().__init__(name="rehab-serial", daemon=True)
+        self.open_port = open_port
+        self.ring = ring
+        self.decoder = decoder or AsciiDecoder()
+        self.filters = list(filters) or [Calibration()]
+        self.sample_dt = 1.0 / rate_hz
+        self.reopen_every = reopen_every
         self.ser = None
-        if serial is not None:
+        self.errors = 0      # port errors (disconnects, failed opens)
+        self._stop_evt = threading.Event()
+
+    # decoder counters, exposed under the names the rest of the game uses
+    @property
+    def dropped(self) -> int:
+        return self.decoder.dropped
+
+    @property
+    def malformed(self) -> int:
+        return self.decoder.malformed
+
+    @property
+    def lost(self) -> int:
+        return self.decoder.lost
+
+    def stop(self):
+        self._stop_evt.set()
+
+    def _publish(self, values: list[float], t: float):
+        sdt = self.sample_dt
+        raw = values
+        for f in self.filters:
+            values = f.process(values, sdt)
+        # samples in one block arrived together; spread them back at the nominal device rate
+        n = len(values)
+        push = self.ring.push
+        for i, v in enumerate(values):
+            push(t - (n - 1 - i) * sdt, v, raw[i])
+
+    def run(self):
+        while not self._stop_evt.is_set():
+            if self.ser is None:
+                try:
+                    self.ser = self.open_port()
+                except Exception:
+                    self.ser = None
+                if self.ser is None:
+                    self.errors += 1
+                    self._stop_evt.wait(self.reopen_every)
+                    continue
             try:
-                self.ser = serial.Serial(self.s.rehab_serial_port, self.s.rehab_baud, timeout=0)
+                chunk = self.ser.read(self.ser.in_waiting or 1)
             except Exception:
+                self.errors += 1
+                self.decoder.reset()
+                try:
+                    self.ser.close()
+                except Exception:
+                    pass
                 self.ser = None
+                continue
+            if not chunk:
+                continue
+            t = time.monotonic()
+            values = self.decoder.feed(chunk)
+            if values:
+                self._publish(values, t)
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            self.ser = None
+
+class RehabFingerInput(InputBase):
+    """Reads a normalized float [0..1] over serial; also supports flap edge detect if needed.
+
+    A background SerialReader fills `ring`; the game only ever reads from the ring, never the port.
+    """
+    def __init__(self, settings: Settings, ring_size: int = 2048, open_port=None):
+        self.s = settings
+        self.prev_val = 0.0
+        self.last_time = -1e9
+        self.last_val = 0.0
+        self.last_raw = math.nan    # device value behind last_val, before filters and calibration
+        self.ring = SampleRing(ring_size)
+        self._flap_seq = 0
+        self.reader = None
+        self._closed_stats = None
+        # open_port lets tests and tools substitute any object with read()/in_waiting/close()
+        if open_port is None:
+            self._serial = _import_serial()
+            if self._serial is not None:
+                open_port = self._open_port
+        if open_port is not None:
+            self.reader = SerialReader(open_port, self.ring, make_decoder(settings), make_filters(settings),
+                                       settings.rehab_rate_hz)
+            self.reader.start()
+
+    def _open_port(self):
+        return self._serial.Serial(self.s.rehab_serial_port, self.s.rehab_baud, timeout=0.05)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader.join(timeout=1.0)
+            self._closed_stats = self.stats()   # counters stay readable after close
+            self.reader = None
 
     def read_signal(self) -> float:
-        if self.ser is None:
-            return 0.0
-        try:
-            raw = self.ser.readline().strip()
-            if not raw:
-                return 0.0
-            val = float(raw)
-            if val < 0: val = 0.0
-            if val > 1: val = 1.0
-            return val
-        except Exception:
-            return 0.0
+        s = self.ring.latest()
+        if s is not None:
+            self.last_val = s[1]
+            self.last_raw = self.ring.consumed_raw()
+        return self.last_val
 
     def get_value01(self) -> float:
         return self.read_signal()
 
     def get_flap(self) -> bool:
-        now_val = self.read_signal()
-        t = time.time()
-        crossed = (self.prev_val < self.s.rehab_flap_threshold) and (now_val >= self.s.rehab_flap_threshold)
-        allowed = (t - self.last_time) >= self.s.rehab_cooldown
-        fire = crossed and allowed
-        if fire:
-            self.last_time = t
-        self.prev_val = now_val
+        # scan every sample that arrived since the last call so short pulses between frames still count
+        samples, self._flap_seq = self.ring.since(self._flap_seq)
+        thr = self.s.rehab_flap_threshold
+        fire = False
+        for t, v in samples:
+            if self.prev_val < thr <= v and (t - self.last_time) >= self.s.rehab_cooldown:
+                self.last_time = t
+                fire = True
+            self.prev_val = v
+        if samples:
+            self.last_val = samples[-1][1]
+            self.last_raw = self.ring.consumed_raw()
         return fire
 
+    def stats(self) -> dict:
+        r = self.reader
+        if r is None and self._closed_stats is not None:
+            return self._closed_stats
+        return {
+            "samples": self.ring.count,
+            "overflowed": self.ring.overflowed,
+            "dropped": r.dropped if r else 0,
+            "malformed": r.malformed if r else 0,
+            "lost": r.lost if r else 0,
+            "errors": r.errors if r else 0,
+        }
+
 def make_input(settings: Settings, slider=None) -> InputBase:
     if settings.input_mode == "rehab":
         return RehabFingerInput(settings)
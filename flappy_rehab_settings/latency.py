@@ -0,0 +1,205 @@
+"""Input-to-photon latency harness for the rehab position-control pipeline.
+
+A synthetic device emits timestamped step changes (alternating LOW/HIGH) as ASCII lines into
+the real SerialReader of a RehabFingerInput. Each step is followed through:
+
+    serial     device emit           -> sample lands in the ring (SerialReader timestamp)
+    queueing   ring                  -> first Game._read_input_value() returning it
+    smoothing  read                  -> bird centre within --settle-px of _target_from_input_value()
+    render     physics of that frame -> pg.display.update/flip of that frame returns
+
+Runs the real Game loop (SDL dummy driver unless --window) at the configured frame rate.
+
+    python latency.py --seconds 20 --max-p95-ms 450     # exits 1 if total p95 exceeds the budget
+"""
+from __future__ import annotations
+import argparse, json, os, sys, threading, time
+from collections import deque
+
+LOW, HIGH = 0.2, 0.8
+STAGES = ("serial", "queueing", "smoothing", "render", "total")
+
+class SyntheticPort:
+    """Serial stand-in: a device thread emits lines, SerialReader reads them (read/in_waiting/close)."""
+    def __init__(self, rate_hz: float, period_s: float):
+        self.rate_hz = rate_hz
+        self.period_s = period_s
+        self.level = LOW
+        self.steps = []                 # (emit time, level) for each step change
+        self._buf = bytearray()
+        self._cv = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._device, name="synthetic-device", daemon=True)
+        self._thread.start()
+
+    def _device(self):
+        period = 1.0 / self.rate_hz
+        next_step = time.monotonic() + self.period_s
+        t_next = time.monotonic()
+        while not self._closed:
+            now = time.monotonic()
+            if now >= next_step:
+                self.level = HIGH if self.level == LOW else LOW
+                self.steps.append((now, self.level))
+                next_step += self.period_s
+            with self._cv:
+                self._buf += b"%.6f\n" % self.level
+                self._cv.notify()
+            t_next += period
+            time.sleep(max(0.0, t_next - time.monotonic()))
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._buf)
+
+    def read(self, n: int = 1) -> bytes:
+        with self._cv:
+            if not self._buf:
+                self._cv.wait(0.05)
+            out = bytes(self._buf[:n])
+            del self._buf[:n]
+            return out
+
+    def close(self):
+        self._closed = True
+
+def _pct(values, p):
+    if not values:
+        return float("nan")
+    v = sorted(values)
+    return v[min(len(v) - 1, int(p * len(v)))]
+
+def measure(seconds: float = 20.0, rate_hz: float = 250.0, period_s: float = 0.75, settle_px: int = 2,
+            fps: int | None = None, window: bool = False) -> dict:
+    if not window:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame as pg
+    from config import WINDOW_SIZE, FPS
+    from game import Game
+    from input import RehabFingerInput
+
+    pg.init()
+    screen = pg.display.set_mode(WINDOW_SIZE)
+    clock = pg.time.Clock()
+    game = Game(screen)
+    game.settings.control_mode = "position"
+    game.settings.invert_input = False
+    game.scene = "playing"
+    port = SyntheticPort(rate_hz, period_s)
+    game.input = RehabFingerInput(game.settings, open_port=lambda: port)
+    game.reset()
+    # latency only: the bird must never crash
+    game.sim.pipes.collides = lambda rect: False
+    game.sim.ground.collides = lambda rect: False
+
+    reads = deque(maxlen=1024)           # (time, value) from _read_input_value
+    read_value = game._read_input_value
+    def tagged_read():
+        v = read_value()
+        reads.append((time.monotonic(), v))
+        return v
+    game._read_input_value = tagged_read
+
+    ring = game.input.ring
+    ring_seq = 0
+    ring_seen = deque(maxlen=8192)       # (ring time, value) samples not yet matched
+    pending = []                         # open measurements: dict per step
+    done = []
+    timeouts = 0
+    fps = fps or FPS
+    t_end = time.monotonic() + seconds
+
+    while time.monotonic() < t_end:
+        dt = clock.tick(fps) / 1000.0
+        game.update(dt)
+        t_phys = time.monotonic()
+        dirty = game.draw()
+        if dirty is None:
+            pg.display.flip()
+        else:
+            pg.display.update(dirty)
+        t_present = time.monotonic()
+
+        while len(pending) + len(done) + timeouts < len(port.steps):
+            t_emit, level = port.steps[len(pending) + len(done) + timeouts]
+            for m in pending:   # a newer step supersedes anything still settling
+                m["superseded"] = True
+            pending.append({"emit": t_emit, "level": level})
+        samples, ring_seq = ring.since(ring_seq)
+        ring_seen.extend(samples)
+
+        target = game._target_from_input_value
+        bird_y = game.sim.bird.rect.centery
+        for m in list(pending):
+            lvl = m["level"]
+            if "ring" not in m:
+                while ring_seen and "ring" not in m:
+                    t, v = ring_seen.popleft()
+                    if abs(v - lvl) < 1e-6 and t >= m["emit"]:
+                        m["ring"] = t
+            if "ring" in m and "read" not in m:
+                while reads:
+                    t, v = reads.popleft()
+                    if abs(v - lvl) < 1e-6 and t >= m["ring"]:
+                        m["read"] = t
+                        break
+            if "read" in m and abs(bird_y - target(lvl)) <= settle_px:
+                m["settle"], m["present"] = t_phys, t_present
+                pending.remove(m)
+                done.append(m)
+            elif m.get("superseded"):
+                pending.remove(m)
+                timeouts += 1
+
+    port.close()
+    game.close()
+    pg.quit()
+
+    stages = {
+        "serial": [m["ring"] - m["emit"] for m in done],
+        "queueing": [m["read"] - m["ring"] for m in done],
+        "smoothing": [m["settle"] - m["read"] for m in done],
+        "render": [m["present"] - m["settle"] for m in done],
+        "total": [m["present"] - m["emit"] for m in done],
+    }
+    return {
+        "steps": len(done),
+        "timeouts": timeouts,
+        "fps": fps,
+        "rate_hz": rate_hz,
+        "settle_px": settle_px,
+        "stages_ms": {k: {"p50": _pct(v, 0.5) * 1e3, "p95": _pct(v, 0.95) * 1e3,
+                          "p99": _pct(v, 0.99) * 1e3, "max": max(v, default=float("nan")) * 1e3}
+                      for k, v in stages.items()},
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seconds", type=float, default=20.0)
+    ap.add_argument("--rate", type=float, default=250.0, help="synthetic sensor rate (Hz)")
+    ap.add_argument("--period", type=float, default=0.75, help="seconds between step changes")
+    ap.add_argument("--settle-px", type=int, default=2, help="how close to the target counts as arrived")
+    ap.add_argument("--fps", type=int)
+    ap.add_argument("--window", action="store_true", help="use a real window instead of the dummy driver")
+    ap.add_argument("--max-p95-ms", type=float, help="fail (exit 1) if total p95 latency exceeds this")
+    ap.add_argument("--json", help="write the report here")
+    args = ap.parse_args(argv)
+
+    r = measure(args.seconds, args.rate, args.period, args.settle_px, args.fps, args.window)
+    print(f"{r['steps']} steps measured, {r['timeouts']} did not settle before the next step")
+    print(f"{'stage':<10} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}   (ms)")
+    for k in STAGES:
+        s = r["stages_ms"][k]
+        print(f"{k:<10} {s['p50']:8.2f} {s['p95']:8.2f} {s['p99']:8.2f} {s['max']:8.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, indent=2)
+    if args.max_p95_ms is not None:
+        p95 = r["stages_ms"]["total"]["p95"]
+        if not r["steps"] or p95 > args.max_p95_ms:
+            print(f"FAIL: total p95 {p95:.1f} ms > {args.max_p95_ms} ms", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
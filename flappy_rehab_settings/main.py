@@ -1,22 +1,114 @@
+import time
+_T0 = time.perf_counter()   # startup timing includes our own imports (pygame's is most of it)
+import argparse
 import pygame as pg
 from game import Game
-from config import WINDOW_SIZE, FPS
+from config import WINDOW_SIZE, FPS, IDLE_WAIT_MS
+from graphics import get_font
+from display import Display, SCALING
+from profiler import FrameProfiler, StartupTimer, DRAW, PRESENT
 
-def main():
-    pg.init()
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Flappy Rehab")
+    ap.add_argument("--profile-csv", metavar="PATH", help="write the per-frame phase trace here on exit")
+    ap.add_argument("--fps", type=int, default=FPS,
+                    help=f"frame cap (default {FPS}; 0 = uncapped, lower to throttle weak machines)")
+    ap.add_argument("--vsync", action="store_true", help="pace frames by the display refresh instead of --fps")
+    ap.add_argument("--fullscreen", action="store_true", help="fill the screen (F11 toggles)")
+    ap.add_argument("--scaling", choices=SCALING,
+                    help="integer: whole multiples of the logical size only (crisp, letterboxed); fit: as large as "
+                         "fits. Default: integer in a window, fit fullscreen")
+    ap.add_argument("--window-scale", type=int, metavar="N", help="open the window at N times the logical size")
+    ap.add_argument("--smooth", action="store_true", help="filter when scaling instead of repeating pixels")
+    ap.add_argument("--startup-report", action="store_true", help="print a startup phase breakdown after the first frame")
+    ap.add_argument("--metrics", metavar="[HOST:]PORT",
+                    help="serve live telemetry in Prometheus format at http://HOST:PORT/metrics (default host 127.0.0.1)")
+    ap.add_argument("--no-history", action="store_true", help="do not write runs to the session history database")
+    ap.add_argument("--capture", metavar="PATH",
+                    help="record the screen: .frv (delta + zlib), a directory (PNG frames) or e.g. .mp4 (needs ffmpeg)")
+    ap.add_argument("--capture-fps", type=float, default=15.0, help="capture frame rate (default 15)")
+    ap.add_argument("--capture-scale", type=float, default=0.5, help="capture size relative to the window (default 0.5)")
+    ap.add_argument("--capture-slots", type=int, default=8,
+                    help="frame buffers waiting for the encoder; beyond that frames are dropped (default 8)")
+    args = ap.parse_args(argv)
+    startup = StartupTimer(_T0)
+    startup.mark("imports")
+
+    # only the subsystems we use; pg.init() would also bring up audio, joystick, etc.
+    pg.display.init()
+    pg.font.init()
     pg.display.set_caption("Flappy Rehab — Settings Enabled")
-    screen = pg.display.set_mode(WINDOW_SIZE)
+    # the game draws at WINDOW_SIZE whatever the screen; SDL scales it (see display.py)
+    display = Display(WINDOW_SIZE, fullscreen=args.fullscreen, vsync=args.vsync, scaling=args.scaling,
+                      window_scale=args.window_scale, smooth=args.smooth)
+    screen = display.open()
+    fps = 0 if display.vsync else args.fps
     clock = pg.time.Clock()
+    startup.mark("display")
+    get_font(28)   # resolves the font file (cached on disk after the first run)
+    startup.mark("font")
 
-    game = Game(screen)
+    prof = FrameProfiler()
+    game = Game(screen, profiler=prof, display=display)
+    if game.settings.history_db and not args.no_history:
+        from history import open_history
+        game.history = open_history(game.settings)
+    telemetry = metrics_server = None
+    if args.metrics:
+        from metrics import Telemetry, MetricsServer, parse_listen
+        telemetry = game.telemetry = Telemetry()
+        metrics_server = MetricsServer(telemetry, parse_listen(args.metrics)).start()
+    capture = None
+    if args.capture:
+        from capture import FrameCapture
+        capture = FrameCapture(args.capture, screen.get_size(), args.capture_fps, args.capture_scale,
+                               args.capture_slots, like=screen)
+    startup.mark("game")
 
+    # gameplay speed comes from the fixed physics step, so the frame rate is free to vary;
+    # dt is measured with perf_counter because tick() only has millisecond resolution
     running = True
+    last = time.perf_counter()
     while running:
-        dt = clock.tick(FPS) / 1000.0  # seconds
-        running = game.update(dt)
-        game.draw()
-        pg.display.flip()
+        events = None
+        if game.idle:
+            # static screen: sleep until input arrives (the timeout keeps settings auto-reload going)
+            e = pg.event.wait(IDLE_WAIT_MS)
+            events = [] if e.type == pg.NOEVENT else [e]
+            events += pg.event.get()
+        else:
+            clock.tick(fps)
+        now = time.perf_counter()
+        dt, last = now - last, now
+        prof.begin_frame()
+        running = game.update(dt, events)
+        dirty = game.draw()
+        prof.mark(DRAW)
+        if dirty is None:
+            pg.display.flip()
+        else:
+            pg.display.update(dirty)
+        if capture is not None:
+            capture.grab(screen, now)   # counted as present
+        prof.mark(PRESENT)
+        prof.end_frame(dt)
+        if telemetry is not None:
+            telemetry.frame(dt, time.perf_counter() - now, game)
+        if startup is not None:
+            startup.mark("first frame")
+            game.gc.freeze()   # fonts, sprites and settings now exist and live for the whole run
+            if args.startup_report:
+                print(startup.report())
+            startup = None
 
+    game.close()
+    if capture is not None:
+        capture.close()
+        print(capture.report())
+    if metrics_server is not None:
+        metrics_server.stop()
+    if args.profile_csv:
+        prof.export_csv(args.profile_csv)
     pg.quit()
 
 if __name__ == "__main__":
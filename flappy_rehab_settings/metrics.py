@@ -0,0 +1,181 @@
+"""Opt-in live telemetry for a station, served in Prometheus text format.
+
+    python main.py --metrics 9464                 # http://127.0.0.1:9464/metrics
+    python main.py --metrics 0.0.0.0:9464         # reachable from the clinic network
+
+The game thread is the only writer: main.main calls Telemetry.frame() once per frame and
+Game.update reports scene changes (attempts, deaths). A scrape runs on the HTTP server's own
+thread and only reads those plain attributes, so there is no lock the render loop could wait
+on; a scrape may see a frame half-counted, which Prometheus does not mind. Input counters
+(samples, CRC/parse errors, lost frames, port errors) come from the active RehabFingerInput;
+when the game replaces its input object the old totals are folded in, so counters only grow.
+The time spent in Telemetry.frame() itself is exported as flappy_telemetry_overhead_seconds.
+"""
+from __future__ import annotations
+import bisect, threading, time
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from settings import preset_of
+
+FRAME_BUCKETS = (0.002, 0.004, 0.008, 0.0125, 0.0167, 0.025, 0.0333, 0.05, 0.1, 0.25)
+INPUT_COUNTERS = ("samples", "malformed", "dropped", "lost", "errors")
+
+_now = time.perf_counter_ns
+
+class Histogram:
+    def __init__(self, bounds=FRAME_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float):
+        self.counts[bisect.bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+def _input_totals(inp) -> dict:
+    stats = getattr(inp, "stats", None)
+    if stats is None:
+        return dict.fromkeys(INPUT_COUNTERS, 0)
+    st = stats()
+    return {k: st.get(k, 0) for k in INPUT_COUNTERS}
+
+class Telemetry:
+    """Per-frame accumulators, written by the game thread only."""
+    def __init__(self):
+        self.started = time.time()
+        self.frames = 0
+        self.frame_time = Histogram()    # seconds between frames
+        self.work_time = Histogram()     # update + draw + present
+        self.overhead_ns = 0
+        self.attempts = 0
+        self.deaths = 0
+        self.score = 0
+        self.best = 0
+        self.scene = "menu"
+        self.game = None
+        # (input object, totals of the inputs it replaced); swapped as one tuple so a scrape
+        # never sees the new base next to the old input
+        self._input = (None, dict.fromkeys(INPUT_COUNTERS, 0))
+
+    def frame(self, dt: float, work: float, game):
+        t0 = _now()
+        self.frames += 1
+        self.frame_time.observe(dt)
+        self.work_time.observe(work)
+        self.score = game.sim.score
+        self.game = game
+        inp, base = self._input
+        if game.input is not inp:
+            old = _input_totals(inp)
+            self._input = (game.input, {k: base[k] + old[k] for k in INPUT_COUNTERS})
+        self.overhead_ns += _now() - t0
+
+    def scene_changed(self, old: str, new: str, score: int):
+        self.scene = new
+        if new == "playing":
+            self.attempts += 1
+        elif new == "dead" and old == "playing":
+            self.deaths += 1
+            self.best = max(self.best, score)
+
+    def input_totals(self) -> dict:
+        inp, base = self._input
+        cur = _input_totals(inp)
+        return {k: base[k] + cur[k] for k in INPUT_COUNTERS}
+
+# ---------- Prometheus text format ----------
+def _metric(out: list, name: str, kind: str, help_: str, samples):
+    out.append(f"# HELP {name} {help_}")
+    out.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        out.append(f"{name}{labels} {value}")
+
+def _histogram(out: list, name: str, help_: str, h: Histogram):
+    counts = list(h.counts)   # copy once; the game thread keeps counting
+    samples, acc = [], 0
+    for bound, c in zip((*h.bounds, "+Inf"), counts):
+        acc += c
+        samples.append((f'{{le="{bound}"}}', acc))
+    _metric(out, name, "histogram", help_, [])
+    out.extend(f"{name}_bucket{labels} {v}" for labels, v in samples)
+    out.append(f"{name}_sum {h.sum}")
+    out.append(f"{name}_count {acc}")
+
+def _label(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render(t: Telemetry) -> str:
+    out = []
+    _metric(out, "flappy_up_seconds", "gauge", "Seconds since the station started.",
+            [("", round(time.time() - t.started, 3))])
+    _metric(out, "flappy_frames_total", "counter", "Frames presented.", [("", t.frames)])
+    _histogram(out, "flappy_frame_interval_seconds", "Time between frames.", t.frame_time)
+    _histogram(out, "flappy_frame_work_seconds", "Update, draw and present time per frame.", t.work_time)
+    _metric(out, "flappy_telemetry_overhead_seconds_total", "counter",
+            "Time the game thread spent in Telemetry.frame().", [("", t.overhead_ns * 1e-9)])
+    _metric(out, "flappy_attempts_total", "counter", "Runs started.", [("", t.attempts)])
+    _metric(out, "flappy_deaths_total", "counter", "Runs ended by a crash.", [("", t.deaths)])
+    _metric(out, "flappy_score", "gauge", "Score of the current run.", [("", t.score)])
+    _metric(out, "flappy_best_score", "gauge", "Best score since the station started.", [("", t.best)])
+    _metric(out, "flappy_scene", "gauge", "1 for the scene on screen.",
+            [(f'{{scene="{s}"}}', int(s == t.scene)) for s in ("menu", "settings", "playing", "dead")])
+    inp = t.input_totals()
+    _metric(out, "flappy_input_samples_total", "counter", "Rehab sensor samples received.", [("", inp["samples"])])
+    _metric(out, "flappy_input_errors_total", "counter",
+            "Rehab input problems: unparsable lines or CRC failures, skipped bytes, lost frames, port errors.",
+            [('{kind="malformed"}', inp["malformed"]), ('{kind="dropped"}', inp["dropped"]),
+             ('{kind="lost"}', inp["lost"]), ('{kind="port"}', inp["errors"])])
+    game = t.game
+    if game is not None:
+        prof = game.prof
+        _metric(out, "flappy_hitches_total", "counter", "Frames over the frame budget.", [("", prof.hitch_count)])
+        _metric(out, "flappy_gc_collections_total", "counter", "Garbage collections seen by the profiler.",
+                [("", prof.gc_collections)])
+        s = asdict(game.settings)
+        # patient_id stays off the network
+        _metric(out, "flappy_settings_info", "gauge", "Current preset and text settings.",
+                [("{" + ",".join([f'preset="{preset_of(s)}"'] +
+                                 [f'{k}="{_label(v)}"' for k, v in s.items()
+                                  if isinstance(v, str) and k != "patient_id"]) + "}", 1)])
+        _metric(out, "flappy_setting", "gauge", "Current numeric settings (booleans as 0/1).",
+                [(f'{{name="{k}"}}', float(v)) for k, v in s.items() if isinstance(v, (int, float))])
+    out.append("")
+    return "\n".join(out)
+
+# ---------- HTTP ----------
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render(self.server.telemetry).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+def parse_listen(spec: str) -> tuple[str, int]:
+    """'9464' or 'host:9464'."""
+    host, _, port = spec.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+class MetricsServer:
+    def __init__(self, telemetry: Telemetry, addr=("127.0.0.1", 9464)):
+        self.httpd = HTTPServer(addr, _Handler)
+        self.httpd.telemetry = telemetry
+        self.address = self.httpd.server_address
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
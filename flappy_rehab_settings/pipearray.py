@@ -0,0 +1,263 @@
+"""NumPy structure-of-arrays pipe stores.
+
+PipeArray is a drop-in replacement for entities.PipeManager (same spawn rules, same integer
+movement with a shared sub-pixel remainder, same Rect collision semantics) that keeps pipes in parallel arrays instead of a
+list of [top_rect, bot_rect, passed]. PipeCourses steps many independent courses at once.
+"""
+from __future__ import annotations
+import numpy as np
+import pygame as pg
+from pygame import Rect
+from settings import Settings
+from entities import Course
+from sprites import get_atlas
+
+def _span_overlap(a0, a1, b0, b1):
+    # pygame.Rect semantics: empty spans never overlap, negative sizes are normalised
+    return (a0 != a1) & (b0 != b1) & (np.minimum(a0, a1) < np.maximum(b0, b1)) & (np.maximum(a0, a1) > np.minimum(b0, b1))
+
+class PipeArray:
+    """Live pipes occupy [head, tail) of each array, oldest (leftmost) first."""
+    def __init__(self, w: int, h: int, settings: Settings, course: Course | None = None, capacity: int = 16):
+        self.w, self.h = w, h
+        self.settings = settings
+        self.course = course or Course()
+        self.t = 0.0
+        self.frac = 0.0
+        self.last_dx = 0.0
+        self.head = 0
+        self.tail = 0
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int):
+        old = None
+        if getattr(self, "x", None) is not None:
+            old = self._live_arrays()
+        self.capacity = capacity
+        self.x = np.zeros(capacity, np.int64)
+        self.gap_y = np.zeros(capacity, np.int64)
+        self.gap = np.zeros(capacity, np.int64)
+        self.width = np.zeros(capacity, np.int64)
+        self.floor = np.zeros(capacity, np.int64)   # h - ground_height at spawn time
+        self.passed = np.zeros(capacity, bool)
+        if old is not None:
+            n = len(old[0])
+            for dst, src in zip(self._arrays(), old):
+                dst[:n] = src
+            self.head, self.tail = 0, n
+
+    def _arrays(self):
+        return self.x, self.gap_y, self.gap, self.width, self.floor, self.passed
+
+    def _live_arrays(self):
+        return tuple(a[self.head:self.tail].copy() for a in self._arrays())
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def _compact(self):
+        n = self.tail - self.head
+        if self.head:
+            for a in self._arrays():
+                a[:n] = a[self.head:self.tail]
+        self.head, self.tail = 0, n
+
+    def spawn(self):
+        gh = self.settings.ground_height
+        gap = self.settings.pipe_gap
+        gap_y = self.course.next_gap_y(120, self.h - gh - 120)
+        if self.tail == self.capacity:
+            self._compact()
+            if self.tail == self.capacity:
+                self._alloc(self.capacity * 2)
+        i = self.tail
+        self.x[i] = self.w
+        self.gap_y[i] = gap_y
+        self.gap[i] = gap
+        self.width[i] = self.settings.pipe_width
+        self.floor[i] = self.h - gh
+        self.passed[i] = False
+        self.tail = i + 1
+
+    def update(self, dt: float):
+        self.t += dt
+        if self.t >= self.settings.pipe_spawn_every:
+            self.t -= self.settings.pipe_spawn_every
+            self.spawn()
+        self.last_dx = self.settings.pipe_speed * dt
+        self.frac += self.last_dx
+        dx = int(self.frac)
+        self.frac -= dx
+        h, t = self.head, self.tail
+        if h == t:
+            return
+        x = self.x[h:t]
+        x += dx
+        keep = x + self.width[h:t] > -10
+        first = int(keep.argmax()) if keep.any() else t - h
+        if keep[first:].all():
+            self.head = h + first
+        else:
+            # a narrower pipe overtook a wider one's exit; fall back to in-place compaction
+            sel = np.flatnonzero(keep) + h
+            n = len(sel)
+            for a in self._arrays():
+                a[h:h + n] = a[sel]
+            self.tail = h + n
+
+    def _rects(self, i: int):
+        x, w = int(self.x[i]), int(self.width[i])
+        half = int(self.gap[i]) // 2
+        gy, fl = int(self.gap_y[i]), int(self.floor[i])
+        return Rect(x, 0, w, gy - half), Rect(x, gy + half, w, fl - (gy + half))
+
+    @property
+    def pipes(self):
+        """PipeManager-compatible [top_rect, bot_rect, passed] view (allocates; not for hot paths)."""
+        return [[*self._rects(i), bool(self.passed[i])] for i in range(self.head, self.tail)]
+
+    def draw_offset(self, alpha: float = 1.0) -> int:
+        return round(self.frac - (1.0 - alpha) * self.last_dx)
+
+    def add_sprites(self, batch: list, dirty: list, alpha: float = 1.0):
+        atlas = get_atlas()
+        dx = self.draw_offset(alpha)
+        for i in range(self.head, self.tail):
+            top, bot = self._rects(i)
+            top.x += dx
+            bot.x += dx
+            atlas.add_pipe(batch, top, True)
+            atlas.add_pipe(batch, bot, False)
+            dirty.append(top.union(bot))
+
+    def draw(self, surf: pg.Surface):
+        batch = []
+        self.add_sprites(batch, [])
+        surf.blits(batch, doreturn=False)
+
+    def collides(self, rect: Rect) -> bool:
+        h, t = self.head, self.tail
+        if h == t:
+            return False
+        # pipes are in x order, so only a short run can overlap the bird horizontally
+        x = self.x[h:t]
+        lo = int(np.searchsorted(x, rect.left - int(self.width[h:t].max()), "right"))
+        hi = int(np.searchsorted(x, rect.right, "left"))
+        if lo >= hi:
+            return False
+        s = slice(h + lo, h + hi)
+        px, pw = self.x[s], self.width[s]
+        half = self.gap[s] // 2
+        top_b = self.gap_y[s] - half
+        bot_t = self.gap_y[s] + half
+        bx = _span_overlap(rect.left, rect.right, px, px + pw)
+        hit_top = _span_overlap(rect.top, rect.bottom, 0, top_b)
+        hit_bot = _span_overlap(rect.top, rect.bottom, bot_t, self.floor[s])
+        return bool((bx & (hit_top | hit_bot)).any())
+
+    def next_gap(self, left: int):
+        # right edges are not sorted once pipe_width changes mid-run, so mask rather than bisect
+        h, t = self.head, self.tail
+        ahead = self.x[h:t] + self.width[h:t] >= left
+        if not ahead.any():
+            return None
+        k = int(np.where(ahead, self.x[h:t], np.iinfo(np.int64).max).argmin()) + h
+        return int(self.gap_y[k])
+
+    def count_passed(self, rect: Rect) -> int:
+        h, t = self.head, self.tail
+        newly = ~self.passed[h:t] & (self.x[h:t] + self.width[h:t] < rect.left)
+        n = int(newly.sum())
+        if n:
+            self.passed[h:t] |= newly
+        return n
+
+class PipeCourses:
+    """Many independent pipe courses stepped together in (courses, slots) arrays.
+
+    Each course has its own speed/gap/width/spawn interval so a whole parameter sweep can run
+    as one batch. Pipe k of a course lives in slot k % slots; `live` marks occupied slots.
+    """
+    def __init__(self, n: int, w: int, h: int, *, pipe_gap, pipe_width, pipe_speed, pipe_spawn_every,
+                 ground_height, slots: int = 8, seed=None):
+        self.n, self.w, self.h = n, w, h
+        as_col = lambda v, dt: np.broadcast_to(np.asarray(v, dt), (n,)).copy()
+        self.pipe_gap = as_col(pipe_gap, np.int64)
+        self.pipe_width = as_col(pipe_width, np.int64)
+        self.pipe_speed = as_col(pipe_speed, np.float64)
+        self.pipe_spawn_every = as_col(pipe_spawn_every, np.float64)
+        self.ground_height = as_col(ground_height, np.int64)
+        self.rng = np.random.default_rng(seed)
+        self.slots = slots
+        shape = (n, slots)
+        self.x = np.zeros(shape, np.int64)
+        self.gap_y = np.zeros(shape, np.int64)
+        self.gap = np.zeros(shape, np.int64)
+        self.width = np.zeros(shape, np.int64)
+        self.floor = np.zeros(shape, np.int64)
+        self.live = np.zeros(shape, bool)
+        self.passed = np.zeros(shape, bool)
+        self.t = np.zeros(n)
+        self.frac = np.zeros(n)
+        self.spawned = np.zeros(n, np.int64)
+        self._rows = np.arange(n)
+
+    def reset(self, rows):
+        """Clear the given courses (bool mask or index array) so they start over."""
+        self.live[rows] = False
+        self.passed[rows] = False
+        self.t[rows] = 0.0
+        self.frac[rows] = 0.0
+
+    def _spawn(self, rows):
+        if len(rows) == 0:
+            return
+        k = self.spawned[rows] % self.slots
+        if self.live[rows, k].any():
+            raise OverflowError("PipeCourses slots exhausted; increase `slots`")
+        floor = self.h - self.ground_height[rows]
+        self.gap_y[rows, k] = self.rng.integers(120, floor - 120 + 1)
+        self.x[rows, k] = self.w
+        self.gap[rows, k] = self.pipe_gap[rows]
+        self.width[rows, k] = self.pipe_width[rows]
+        self.floor[rows, k] = floor
+        self.live[rows, k] = True
+        self.passed[rows, k] = False
+        self.spawned[rows] += 1
+
+    def update(self, dt: float, active=None):
+        """Advance every course (or only those where `active` is True) by dt."""
+        rows = self._rows if active is None else np.flatnonzero(active)
+        self.t[rows] += dt
+        due = rows[self.t[rows] >= self.pipe_spawn_every[rows]]
+        self.t[due] -= self.pipe_spawn_every[due]
+        self._spawn(due)
+        # whole pixels move, the remainder carries over (like PipeManager)
+        self.frac[rows] += self.pipe_speed[rows] * dt
+        dx = self.frac[rows].astype(np.int64)
+        self.frac[rows] -= dx
+        self.x[rows] += dx[:, None]
+        self.live &= self.x + self.width > -10
+
+    def collides(self, left, top, right, bottom):
+        """Per-course bird rect edges (arrays of shape (n,)) -> bool array of pipe hits."""
+        left, top, right, bottom = (np.asarray(a)[:, None] for a in (left, top, right, bottom))
+        near = self.live & _span_overlap(left, right, self.x, self.x + self.width)
+        half = self.gap // 2
+        hit_top = _span_overlap(top, bottom, 0, self.gap_y - half)
+        hit_bot = _span_overlap(top, bottom, self.gap_y + half, self.floor)
+        return (near & (hit_top | hit_bot)).any(axis=1)
+
+    def count_passed(self, left):
+        newly = self.live & ~self.passed & (self.x + self.width < np.asarray(left)[:, None])
+        self.passed |= newly
+        return newly.sum(axis=1)
+
+    def next_gap(self, left):
+        """Gap centre y of the first live, not-yet-cleared pipe ahead of each bird (nan if none)."""
+        ahead = self.live & (self.x + self.width >= np.asarray(left)[:, None])
+        x = np.where(ahead, self.x, np.iinfo(np.int64).max)
+        k = x.argmin(axis=1)
+        out = self.gap_y[self._rows, k].astype(np.float64)
+        out[~ahead.any(axis=1)] = np.nan
+        return out
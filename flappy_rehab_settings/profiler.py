@@ -0,0 +1,186 @@
+"""Per-phase frame profiler with hitch detection, on-screen overlay and CSV export.
+
+The main loop calls begin_frame(), then mark(PHASE) after each phase, then end_frame(dt).
+Each mark charges the time since the previous mark to that phase. Records go into a
+preallocated ring, so profiling is always on; the overlay (F3) and CSV export (F4) only read it.
+Each frame also records the container objects it left behind (created minus freed, the number
+that drives the cyclic collector) and the time spent in garbage collection.
+"""
+import csv
+import gc
+import time
+from array import array
+from collections import deque
+from config import FPS
+
+PHASES = ("events", "input", "physics", "draw", "present")
+EVENTS, INPUT, PHYSICS, DRAW, PRESENT = range(len(PHASES))
+
+_now = time.perf_counter_ns
+
+class _GcClock:
+    """gc.callbacks hook: time spent collecting, and objects created net of frees between takes."""
+    def __init__(self):
+        self.ms = 0.0
+        self.collections = 0
+        self.objects = 0
+        self._c0 = gc.get_count()[0]
+        self._t = 0
+        gc.callbacks.append(self._callback)
+
+    def _callback(self, phase, info):
+        if phase == "start":
+            self._t = _now()
+            self.objects += gc.get_count()[0] - self._c0   # the collection resets the count
+        else:
+            self.ms += (_now() - self._t) * 1e-6
+            self.collections += 1
+            self._c0 = gc.get_count()[0]
+
+    def take(self):
+        """(objects left behind, collections, ms collecting) since the previous take()."""
+        c = gc.get_count()[0]
+        out = (self.objects + c - self._c0, self.collections, self.ms)
+        self.objects, self.collections, self.ms, self._c0 = 0, 0, 0.0, c
+        return out
+
+_gc_clock = _GcClock()
+
+class FrameProfiler:
+    def __init__(self, capacity: int = 2048, budget_ms: float = 1000.0 / FPS, stats_every: int = 30):
+        n = len(PHASES)
+        self.capacity = capacity
+        self.budget_ms = budget_ms
+        self.stats_every = stats_every
+        self.phase_ms = array("d", bytes(8 * capacity * n))   # row-major: frame slot x phase
+        self.work_ms = array("d", bytes(8 * capacity))
+        self.interval_ms = array("d", bytes(8 * capacity))
+        self.frame_no = array("q", bytes(8 * capacity))
+        self.objects = array("q", bytes(8 * capacity))
+        self.gc_ms = array("d", bytes(8 * capacity))
+        self.gc_collections = 0
+        self.gc_max_ms = 0.0
+        self.count = 0                      # frames recorded so far
+        self.hitches = deque(maxlen=64)     # (frame, work ms, culprit phase, culprit ms)
+        self.hitch_count = 0
+        self.overlay = False
+        self.summary = {}
+        self._row = 0
+        self._t0 = self._t = _now()
+        _gc_clock.take()
+
+    def begin_frame(self):
+        self._row = (self.count % self.capacity) * len(PHASES)
+        pm = self.phase_ms
+        for i in range(self._row, self._row + len(PHASES)):
+            pm[i] = 0.0
+        self._t0 = self._t = _now()
+
+    def mark(self, phase: int):
+        t = _now()
+        self.phase_ms[self._row + phase] += (t - self._t) * 1e-6
+        self._t = t
+
+    def end_frame(self, dt: float):
+        i = self.count % self.capacity
+        work = (_now() - self._t0) * 1e-6
+        self.work_ms[i] = work
+        self.interval_ms[i] = dt * 1000.0
+        self.frame_no[i] = self.count
+        # everything since the previous frame ended, so allocations while waiting count too
+        objects, collections, gc_ms = _gc_clock.take()
+        self.objects[i] = objects
+        self.gc_ms[i] = gc_ms
+        if collections:
+            self.gc_collections += collections
+            self.gc_max_ms = max(self.gc_max_ms, gc_ms)
+        if work > self.budget_ms:
+            row = self._row
+            worst = max(range(len(PHASES)), key=lambda p: self.phase_ms[row + p])
+            culprit, ms = PHASES[worst], self.phase_ms[row + worst]
+            if gc_ms * 2 >= ms:
+                culprit, ms = "gc", gc_ms
+            self.hitches.append((self.count, work, culprit, ms))
+            self.hitch_count += 1
+        self.count += 1
+        if self.overlay and self.count % self.stats_every == 0:
+            self.summary = self.stats()
+
+    # ---------- reporting ----------
+    def _slots(self):
+        n = min(self.count, self.capacity)
+        start = self.count - n
+        return [k % self.capacity for k in range(start, self.count)]
+
+    @staticmethod
+    def _pct(values, ps=(0.50, 0.95, 0.99)):
+        if not values:
+            return tuple(0.0 for _ in ps)
+        v = sorted(values)
+        return tuple(v[min(len(v) - 1, int(p * len(v)))] for p in ps)
+
+    def stats(self) -> dict:
+        """p50/p95/p99 in ms for the whole frame, the frame interval, each phase and GC; objects per frame."""
+        slots = self._slots()
+        n = len(PHASES)
+        out = {
+            "frame": self._pct([self.work_ms[i] for i in slots]),
+            "interval": self._pct([self.interval_ms[i] for i in slots]),
+        }
+        for p, name in enumerate(PHASES):
+            out[name] = self._pct([self.phase_ms[i * n + p] for i in slots])
+        out["gc"] = self._pct([self.gc_ms[i] for i in slots])
+        out["objects"] = self._pct([self.objects[i] for i in slots])
+        return out
+
+    def export_csv(self, path: str) -> int:
+        """Write every frame still in the ring; returns the number of rows."""
+        n = len(PHASES)
+        hitch_frames = {h[0] for h in self.hitches}
+        slots = self._slots()
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["frame", "interval_ms", "work_ms", *(p + "_ms" for p in PHASES),
+                        "gc_ms", "objects", "hitch"])
+            for i in slots:
+                fn = self.frame_no[i]
+                w.writerow([fn, f"{self.interval_ms[i]:.3f}", f"{self.work_ms[i]:.3f}",
+                            *(f"{self.phase_ms[i * n + p]:.3f}" for p in range(n)),
+                            f"{self.gc_ms[i]:.3f}", self.objects[i],
+                            int(self.work_ms[i] > self.budget_ms or fn in hitch_frames)])
+        return len(slots)
+
+    def overlay_lines(self) -> list[str]:
+        s = self.summary or self.stats()
+        lines = ["ms      p50    p95    p99"]
+        for name in ("frame", "interval", *PHASES, "gc"):
+            p50, p95, p99 = s.get(name, (0.0, 0.0, 0.0))
+            lines.append(f"{name:<8}{p50:6.2f} {p95:6.2f} {p99:6.2f}")
+        p50, p95, p99 = s.get("objects", (0, 0, 0))
+        lines.append(f"objects {p50:6.0f} {p95:6.0f} {p99:6.0f}")
+        lines.append(f"gc runs {self.gc_collections} (max {self.gc_max_ms:.1f} ms)")
+        lines.append(f"hitches {self.hitch_count} (> {self.budget_ms:.1f} ms)")
+        if self.hitches:
+            fn, work, phase, ms = self.hitches[-1]
+            lines.append(f"last #{fn}: {work:.1f} ms, {phase} {ms:.1f} ms")
+        return lines
+
+class StartupTimer:
+    """Wall-clock breakdown of program start; mark(name) closes the phase that ends now."""
+    def __init__(self, t0: float | None = None):
+        self.t0 = self._last = time.perf_counter() if t0 is None else t0
+        self.phases = []
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._last) * 1e3))
+        self._last = now
+
+    @property
+    def total_ms(self) -> float:
+        return (self._last - self.t0) * 1e3
+
+    def report(self) -> str:
+        lines = [f"{name:<14} {ms:8.1f} ms" for name, ms in self.phases]
+        lines.append(f"{'first frame at':<14} {self.total_ms:8.1f} ms")
+        return "\n".join(lines)
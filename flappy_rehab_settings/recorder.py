@@ -0,0 +1,268 @@
+"""Compact binary session recorder.
+
+Every simulated frame becomes one fixed-layout record (RECORD). Records are packed into
+preallocated blocks on the game thread; full blocks go to a writer thread that appends them
+as (optionally zlib-compressed) chunks. The chunk index and a JSON trailer are written on close,
+and the header is patched to point at them, so readers can seek by time without scanning.
+
+File layout:
+    header   MAGIC, version, record size, flags, index offset, meta length, meta JSON
+    chunk*   CHUNK header (records, payload bytes, first t, last t) + payload
+    index    u32 chunk count, then INDEX_ENTRY per chunk, then u32 trailer length + trailer JSON
+"""
+from __future__ import annotations
+import bisect, json, math, os, queue, struct, threading, time, zlib
+from dataclasses import asdict
+
+MAGIC = b"FRREC\x00\x01\x00"
+VERSION = 2
+MAX_PIPES = 4
+
+# t, dt, frame, attempt, raw, value, flap, flags, score, bird_y, bird_vy, npipes, pipes (x, gap_y, gap, width) * MAX_PIPES
+# dt and value are doubles so a replay feeds the simulation bit-identical inputs
+RECORD = struct.Struct("<ddIHfdBBHffB1x" + "hhhh" * MAX_PIPES)
+FIELDS = ("t", "dt", "frame", "attempt", "raw", "value", "flap", "flags", "score",
+          "bird_y", "bird_vy", "npipes") + tuple(f"pipe{i}_{k}" for i in range(MAX_PIPES) for k in ("x", "gap_y", "gap", "width"))
+FLAG_ALIVE, FLAG_COLLIDED, FLAG_RESET = 1, 2, 4
+
+HEADER = struct.Struct("<8sIIIQI")          # magic, version, record size, flags, index offset, meta length
+CHUNK = struct.Struct("<IIdd")              # records, payload bytes, first t, last t
+INDEX_ENTRY = struct.Struct("<QdI")         # chunk offset, first t, records
+HEADER_COMPRESSED = 1
+_INDEX_OFFSET_POS = struct.calcsize("<8sIII")   # patched on close
+
+NAN = float("nan")
+
+class SessionRecorder:
+    def __init__(self, path: str, meta: dict | None = None, block_records: int = 1024,
+                 blocks: int = 8, compress: bool = True):
+        self.path = path
+        self.block_records = block_records
+        self.compress = compress
+        self.dropped = 0          # records lost because every block was waiting on the writer
+        self.records = 0
+        self.bytes_written = 0
+        self.trailer = {}
+        self._free = queue.SimpleQueue()
+        for _ in range(blocks):
+            self._free.put(bytearray(RECORD.size * block_records))
+        self._full = queue.SimpleQueue()
+        self._buf = self._free.get()
+        self._n = 0
+        self._t_first = 0.0
+        self._t_last = 0.0
+        self._index = []
+        self._pipe_vals = [0] * (4 * MAX_PIPES)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(path, "wb")
+        meta = dict(meta or {}, record_format=RECORD.format, fields=FIELDS, created=time.time())
+        mb = json.dumps(meta).encode("utf-8")
+        self._f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, HEADER_COMPRESSED if compress else 0, 0, len(mb)))
+        self._f.write(mb)
+        self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- game thread ----------
+    def record(self, t, dt, frame, attempt, raw, value, flap, flags, score, bird_y, bird_vy, pipes):
+        """Append one frame. `pipes` is the PipeManager-style [top, bot, passed] list."""
+        if self._buf is None:
+            try:
+                self._buf = self._free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return
+        pv = self._pipe_vals
+        n = 0
+        for top, bot, _ in pipes:
+            if n == MAX_PIPES:
+                break
+            j = 4 * n
+            pv[j] = top.x
+            pv[j + 1] = (top.bottom + bot.top) // 2
+            pv[j + 2] = bot.top - top.bottom
+            pv[j + 3] = top.width
+            n += 1
+        for j in range(4 * n, 4 * MAX_PIPES):
+            pv[j] = 0
+        if self._n == 0:
+            self._t_first = t
+        RECORD.pack_into(self._buf, self._n * RECORD.size, t, dt, frame, attempt, raw, value, flap, flags,
+                         min(score, 0xFFFF), bird_y, bird_vy, n, *pv)
+        self._t_last = t
+        self._n += 1
+        self.records += 1
+        if self._n == self.block_records:
+            self._hand_off()
+
+    def note(self, key: str, value):
+        """Attach a value to the JSON trailer written on close (e.g. per-attempt seeds)."""
+        self.trailer[key] = value
+
+    def _hand_off(self):
+        self._full.put((self._buf, self._n, self._t_first, self._t_last))
+        self._n = 0
+        try:
+            self._buf = self._free.get_nowait()
+        except queue.Empty:
+            self._buf = None
+
+    def close(self):
+        if self._f is None:
+            return
+        if self._n and self._buf is not None:
+            self._hand_off()
+        self._full.put(None)
+        self._writer.join()
+        f = self._f
+        index_off = f.tell()
+        f.write(struct.pack("<I", len(self._index)))
+        for e in self._index:
+            f.write(INDEX_ENTRY.pack(*e))
+        tb = json.dumps(dict(self.trailer, records=self.records, dropped=self.dropped)).encode("utf-8")
+        f.write(struct.pack("<I", len(tb)))
+        f.write(tb)
+        f.seek(_INDEX_OFFSET_POS)
+        f.write(struct.pack("<Q", index_off))
+        f.close()
+        self._f = None
+
+    # ---------- writer thread ----------
+    def _write_loop(self):
+        f = self._f
+        while True:
+            item = self._full.get()
+            if item is None:
+                return
+            buf, n, t0, t1 = item
+            payload = memoryview(buf)[:n * RECORD.size]
+            if self.compress:
+                payload = zlib.compress(payload, 1)
+            self._index.append((f.tell(), t0, n))
+            f.write(CHUNK.pack(n, len(payload), t0, t1))
+            f.write(payload)
+            self.bytes_written += CHUNK.size + len(payload)
+            self._free.put(buf)
+
+# ---------- attaching to a Game ----------
+def _raw_signal(inp) -> float:
+    if inp is None:
+        return NAN
+    if hasattr(inp, "last_raw"):    # rehab: the device value, before filters and calibration
+        return float(inp.last_raw)
+    if hasattr(inp, "slider"):
+        return float(inp.slider.value)
+    return NAN
+
+def attach(game, recorder: SessionRecorder):
+    """Record every step of game.sim by wrapping the instance's step(); gameplay code is untouched.
+
+    Per-attempt course seeds / start values and mid-session settings changes go into the trailer,
+    which is everything replay.py needs to re-run the session frame for frame.
+    """
+    sim = game.sim
+    step = sim.step
+    state = {"attempt": 0, "t": 0.0, "frame": 0, "settings": sim.settings}
+    attempts = recorder.trailer.setdefault("attempts", [])
+    changes = recorder.trailer.setdefault("settings_changes", [])
+
+    def recording_step(dt, sample):
+        reset = sim.frame == 0
+        if reset:
+            state["attempt"] += 1
+            attempts.append({"attempt": state["attempt"], "frame": state["frame"],
+                             "seed": sim.seed, "start_value": sim.start_value})
+        if sim.settings is not state["settings"]:
+            state["settings"] = sim.settings
+            changes.append({"frame": state["frame"], "settings": asdict(sim.settings)})
+        alive = step(dt, sample)
+        state["t"] += dt
+        flags = (FLAG_ALIVE if alive else FLAG_COLLIDED) | (FLAG_RESET if reset else 0)
+        value = NAN if sample.value01 is None else sample.value01
+        b = sim.bird
+        recorder.record(state["t"], dt, state["frame"], state["attempt"], _raw_signal(game.input), value,
+                        sample.flap, flags, sim.score, b.rect.centery, b.vy, sim.pipes.pipes)
+        state["frame"] += 1
+        return alive
+
+    sim.step = recording_step
+    def detach():
+        if sim.__dict__.get("step") is recording_step:
+            del sim.step
+    return detach
+
+# ---------- reading ----------
+class SessionReader:
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        magic, version, rsize, flags, index_off, mlen = HEADER.unpack(self._f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a session recording")
+        if rsize != RECORD.size:
+            raise ValueError(f"{path}: record size {rsize}, expected {RECORD.size}")
+        self.version = version
+        self.compressed = bool(flags & HEADER_COMPRESSED)
+        self.meta = json.loads(self._f.read(mlen))
+        self.data_start = HEADER.size + mlen
+        self.trailer = {}
+        self.index = []   # (offset, first t, records)
+        if index_off:
+            self._f.seek(index_off)
+            (n,) = struct.unpack("<I", self._f.read(4))
+            self.index = [INDEX_ENTRY.unpack(self._f.read(INDEX_ENTRY.size)) for _ in range(n)]
+            (tl,) = struct.unpack("<I", self._f.read(4))
+            self.trailer = json.loads(self._f.read(tl))
+        else:
+            self._scan()   # recorder did not close cleanly; rebuild the index from chunk headers
+        self._times = [e[1] for e in self.index]
+
+    def _scan(self):
+        f = self._f
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        off = self.data_start
+        while off + CHUNK.size <= end:
+            f.seek(off)
+            n, plen, t0, _ = CHUNK.unpack(f.read(CHUNK.size))
+            if off + CHUNK.size + plen > end:
+                break
+            self.index.append((off, t0, n))
+            off += CHUNK.size + plen
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def records(self) -> int:
+        return sum(e[2] for e in self.index)
+
+    def chunk_bytes(self, i: int) -> bytes:
+        """Raw record bytes of chunk i (decompressed)."""
+        off = self.index[i][0]
+        self._f.seek(off)
+        n, plen, _, _ = CHUNK.unpack(self._f.read(CHUNK.size))
+        payload = self._f.read(plen)
+        return zlib.decompress(payload) if self.compressed else payload
+
+    def chunk_for_time(self, t: float) -> int:
+        return max(0, bisect.bisect_right(self._times, t) - 1)
+
+    def iter_records(self, t_from: float = -math.inf, t_to: float = math.inf):
+        """Yield record tuples (see FIELDS) with t_from <= t <= t_to, seeking straight to t_from."""
+        start = self.chunk_for_time(t_from) if self.index else 0
+        for i in range(start, len(self.index)):
+            if self.index[i][1] > t_to:
+                return
+            for rec in RECORD.iter_unpack(self.chunk_bytes(i)):
+                if rec[0] < t_from:
+                    continue
+                if rec[0] > t_to:
+                    return
+                yield rec
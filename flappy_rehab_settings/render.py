@@ -0,0 +1,118 @@
+"""Playfield renderer (atlas sprites, batched blits, dirty rects) and retained-mode UI scenes.
+
+The bird, pipes and ground come from the sprite atlas (see sprites.py). Each frame erases
+what was drawn last frame, blits everything with a single Surface.blits call and reports
+the changed areas so the caller can present with pg.display.update(rects) instead of a
+full flip. Moving things are drawn `alpha` of the way between the last two physics steps
+(see sim.FixedStep).
+"""
+import pygame as pg
+from pygame import Rect
+from config import COLOR_BG
+
+class PlayfieldRenderer:
+    # above this share of the screen a full fill + flip is cheaper than many small rects
+    FULL_FRAME_SHARE = 0.6
+
+    def __init__(self, screen: pg.Surface):
+        self.screen = screen
+        self.full = True
+        self.frame_full = True
+        # reused every frame: the playing loop should not leave objects behind for the collector
+        self._prev = []
+        self._cur = []
+        self._dirty = []
+        self._batch = []
+
+    def invalidate(self):
+        """Repaint and present the whole screen on the next frame (scene switch, resize, reload)."""
+        self.full = True
+
+    # ---------- per frame ----------
+    def begin(self):
+        sw, sh = self.screen.get_size()
+        area = sum(r.w * r.h for r in self._prev)
+        self.frame_full = self.full or area > self.FULL_FRAME_SHARE * sw * sh
+        if self.frame_full:
+            self.screen.fill(COLOR_BG)
+        else:
+            for r in self._prev:
+                self.screen.fill(COLOR_BG, r)
+        self._cur.clear()
+
+    def draw_sim(self, sim, alpha: float = 1.0):
+        batch = self._batch
+        sim.add_sprites(batch, self._cur, alpha)
+        self.screen.blits(batch, doreturn=False)
+        batch.clear()
+
+    def blit(self, img: pg.Surface, pos):
+        self._cur.append(self.screen.blit(img, pos))
+
+    def mark(self, rect):
+        """Register an area the caller drew into directly (e.g. the slider)."""
+        self._cur.append(Rect(rect))
+
+    def end(self):
+        """Finish the frame; returns the rects to present (a list reused next frame), or None when the whole screen changed."""
+        cur, prev = self._cur, self._prev
+        if self.frame_full:
+            self.full = False
+            dirty = None
+        else:
+            dirty = self._dirty
+            dirty.clear()
+            dirty += prev
+            dirty += cur
+        self._prev, self._cur = cur, prev
+        return dirty
+
+class RetainedScene:
+    """A static screen (menu, settings): everything but the widgets is composed once into a
+    background surface; afterwards only widgets whose state changed are redrawn and presented.
+
+    `draw_static(surf)` paints the background. `key()` returns whatever that painting depends
+    on (e.g. the settings shown); when it changes the background is rebuilt.
+    """
+    def __init__(self, screen: pg.Surface, widgets, draw_static, key=lambda: None):
+        self.screen = screen
+        self.widgets = widgets
+        self.draw_static = draw_static
+        self.key = key
+        self.background = None
+        self._bg_key = None
+        self._overdrawn = []     # rects painted over this frame (overlays), restored next frame
+
+    def invalidate(self):
+        self.background = None
+
+    def overdraw(self, rect):
+        """Someone drew over the scene at rect; restore it from the background next frame."""
+        self._overdrawn.append(Rect(rect))
+
+    def draw(self):
+        """Returns the rects to present, or None after a full repaint."""
+        key = self.key()
+        if self.background is None or key != self._bg_key or self.background.get_size() != self.screen.get_size():
+            bg = pg.Surface(self.screen.get_size()).convert()
+            self.draw_static(bg)
+            self.background, self._bg_key = bg, key
+            self.screen.blit(bg, (0, 0))
+            for w in self.widgets:
+                w.draw(self.screen)
+            self._overdrawn.clear()
+            return None
+        dirty = []
+        for r in self._overdrawn:
+            self.screen.blit(self.background, r, r)
+            dirty.append(r)
+            for w in self.widgets:
+                if w.rect.colliderect(r):
+                    w.dirty = True
+        self._overdrawn.clear()
+        for w in self.widgets:
+            if w.dirty:
+                self.screen.blit(self.background, w.rect, w.rect)
+                w.draw(self.screen)
+                dirty.append(w.rect.copy())
+        return dirty
@@ -0,0 +1,239 @@
+"""Frame-exact replay of recorded sessions (see recorder.py).
+
+Each attempt is re-run from its course seed, start value and the recorded per-frame
+inputs (dt, value, flap), headless and without a frame cap. Checkpoints taken while
+replaying make seeking cheap. Frames the recorder dropped cannot be replayed: an attempt
+stops at its first missing frame and is reported as incomplete, not as a mismatch.
+
+    python replay.py sessions/*.frrec                    # re-score every attempt and verify it
+    python replay.py s.frrec --attempt 2 --seek 42.5     # state of attempt 2 at t=42.5s
+    python replay.py s.frrec --attempt 2 --seek 42.5 --show
+"""
+from __future__ import annotations
+import argparse, bisect, copy, glob, math, time
+from array import array
+from dataclasses import dataclass, fields
+from recorder import SessionReader, FIELDS, FLAG_ALIVE
+from settings import Settings
+from sim import Simulation, InputSample
+from entities import PipeManager
+from config import WINDOW_W, WINDOW_H
+
+_I = {name: i for i, name in enumerate(FIELDS)}
+
+def settings_from_dict(d: dict) -> Settings:
+    known = {f.name for f in fields(Settings)}
+    return Settings(**{k: v for k, v in d.items() if k in known})
+
+class SessionLog:
+    """The parts of a recording a replay needs, loaded into flat arrays indexed by global frame.
+
+    Frames the recorder dropped get placeholder rows (dt 0, no input) and are listed in `gaps`.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.gaps = []     # [first, end) global frame ranges that were not recorded
+        with SessionReader(path) as r:
+            self.meta = r.meta
+            self.trailer = r.trailer
+            cols = {"t": array("d"), "dt": array("d"), "value": array("d"), "flap": array("b"),
+                    "score": array("I"), "bird_y": array("f"), "flags": array("B")}
+            idx = [(_I[name], col.append) for name, col in cols.items()]
+            fi = _I["frame"]
+            for rec in r.iter_records():
+                if rec[fi] != len(cols["dt"]):
+                    self._fill(cols, rec[fi])
+                for i, append in idx:
+                    append(rec[i])
+            total = self.trailer.get("records", 0) + self.trailer.get("dropped", 0)
+            if total > len(cols["dt"]):
+                self._fill(cols, total)     # dropped at the very end
+        for name, col in cols.items():
+            setattr(self, name, col)
+        self.settings = settings_from_dict(self.meta.get("settings", {}))
+        self.size = tuple(self.meta.get("size", (WINDOW_W, WINDOW_H)))
+        self.attempts = self.trailer.get("attempts", [])
+        self.changes = [(c["frame"], settings_from_dict(c["settings"])) for c in self.trailer.get("settings_changes", [])]
+        if not self.attempts:
+            raise ValueError(f"{path}: no attempt seeds in trailer (recorded before replay support?)")
+
+    def _fill(self, cols: dict, frame: int):
+        n = len(cols["dt"])
+        if frame < n:
+            raise ValueError(f"{self.path}: frame {frame} recorded out of order")
+        t = cols["t"][-1] if n else 0.0
+        for name, col in cols.items():
+            col.extend([t if name == "t" else math.nan if name == "value" else 0] * (frame - n))
+        self.gaps.append((n, frame))
+
+    def __len__(self):
+        return len(self.dt)
+
+    def first_gap(self, start: int, end: int) -> tuple[int, int] | None:
+        """The first dropped [first, end) range overlapping frames [start, end), clipped to them."""
+        for g0, g1 in self.gaps:
+            if g0 < end and g1 > start:
+                return max(g0, start), min(g1, end)
+        return None
+
+    def attempt_range(self, n: int) -> tuple[int, int]:
+        """[first, end) global frame numbers of attempt n (1-based)."""
+        a = self.attempts[n - 1]
+        end = self.attempts[n]["frame"] if n < len(self.attempts) else len(self)
+        return a["frame"], end
+
+    def settings_at(self, frame: int) -> Settings:
+        s = self.settings
+        for f, cs in self.changes:
+            if f > frame:
+                break
+            s = cs
+        return s
+
+@dataclass
+class ReplayResult:
+    attempt: int
+    frames: int
+    score: int
+    recorded_score: int
+    mismatches: int
+    first_mismatch: int | None
+    missing_from: int | None = None   # attempt-relative frame where unrecorded frames begin
+
+class Replay:
+    def __init__(self, log: SessionLog, attempt: int, checkpoint_every: int = 600, pipes_cls=PipeManager):
+        self.log = log
+        self.attempt = attempt
+        self.start, self.end = log.attempt_range(attempt)
+        # inputs after a dropped frame are unknown: replay (and verify) only up to it
+        self.gap = log.first_gap(self.start, self.end)
+        if self.gap is not None:
+            self.end = self.gap[0]
+        self.checkpoint_every = checkpoint_every
+        self.pipes_cls = pipes_cls
+        self.checkpoints = {}     # frame -> deep copy of the simulation before that frame
+        self.mismatches = 0
+        self.first_mismatch = None
+        self._change_frames = {f: s for f, s in log.changes}
+        self.rewind()
+
+    def rewind(self):
+        a = self.log.attempts[self.attempt - 1]
+        w, h = self.log.size
+        self.sim = Simulation(w, h, copy.copy(self.log.settings_at(self.start)), self.pipes_cls)
+        self.sim.reset(a["start_value"], seed=a["seed"])
+        self.frame = self.start
+
+    def step(self, verify: bool = True) -> bool:
+        """Replay one recorded frame; returns False at the end of the attempt."""
+        f = self.frame
+        if f >= self.end:
+            return False
+        if (f - self.start) % self.checkpoint_every == 0 and f not in self.checkpoints:
+            self.checkpoints[f] = copy.deepcopy(self.sim)
+        s = self._change_frames.get(f)
+        if s is not None:
+            self.sim.set_settings(copy.copy(s))
+        log = self.log
+        v = log.value[f]
+        alive = self.sim.step(log.dt[f], InputSample(None if math.isnan(v) else v, bool(log.flap[f])))
+        if verify and (self.sim.score != log.score[f] or self.sim.bird.rect.centery != int(log.bird_y[f])
+                       or alive != bool(log.flags[f] & FLAG_ALIVE)):
+            self.mismatches += 1
+            if self.first_mismatch is None:
+                self.first_mismatch = f - self.start
+        self.frame = f + 1
+        return True
+
+    def seek_frame(self, frame: int):
+        """Move to just before attempt-relative `frame`, resuming from the nearest checkpoint."""
+        target = min(self.end, self.start + max(0, frame))
+        lo = self.start if target < self.frame else self.frame + 1
+        best = max((f for f in self.checkpoints if lo <= f <= target), default=None)
+        if best is not None:
+            self.sim = copy.deepcopy(self.checkpoints[best])
+            self.frame = best
+        elif target < self.frame:
+            self.rewind()
+        while self.frame < target:
+            self.step(verify=False)
+
+    def seek_time(self, t: float):
+        """Move to the first frame of this attempt whose end time is >= t (session seconds)."""
+        i = bisect.bisect_left(self.log.t, t, self.start, self.end)
+        self.seek_frame(i - self.start)
+
+    def run(self, verify: bool = True) -> ReplayResult:
+        while self.step(verify):
+            pass
+        rec_score = self.log.score[self.end - 1] if self.end > self.start else 0
+        return ReplayResult(self.attempt, self.end - self.start, self.sim.score, rec_score,
+                            self.mismatches, self.first_mismatch,
+                            None if self.gap is None else self.gap[0] - self.start)
+
+def _show(rp: Replay, speed: float):
+    import pygame as pg
+    from config import COLOR_BG
+    pg.init()
+    screen = pg.display.set_mode(rp.log.size)
+    pg.display.set_caption(f"Replay — attempt {rp.attempt}")
+    clock = pg.time.Clock()
+    acc = 0.0
+    while True:
+        for e in pg.event.get():
+            if e.type == pg.QUIT or (e.type == pg.KEYDOWN and e.key == pg.K_ESCAPE):
+                return
+            if e.type == pg.KEYDOWN and e.key in (pg.K_LEFT, pg.K_RIGHT):
+                jump = 300 if e.key == pg.K_RIGHT else -300
+                rp.seek_frame(rp.frame - rp.start + jump)
+        acc += clock.tick(60) / 1000.0 * speed
+        while acc > 0 and rp.frame < rp.end:
+            acc -= rp.log.dt[rp.frame]
+            rp.step(verify=False)
+        screen.fill(COLOR_BG)
+        rp.sim.draw(screen)
+        pg.display.flip()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("paths", nargs="+")
+    ap.add_argument("--attempt", type=int, help="only this attempt (1-based)")
+    ap.add_argument("--seek", type=float, metavar="SECONDS", help="print the state at this session time")
+    ap.add_argument("--show", action="store_true", help="watch the replay (arrow keys jump 5 s)")
+    ap.add_argument("--speed", type=float, default=1.0)
+    ap.add_argument("--no-verify", action="store_true")
+    args = ap.parse_args(argv)
+
+    paths = [p for pat in args.paths for p in (glob.glob(pat) or [pat])]
+    total_frames, failed = 0, 0
+    t0 = time.perf_counter()
+    for path in paths:
+        log = SessionLog(path)
+        if log.gaps:
+            print(f"{path}: {sum(g1 - g0 for g0, g1 in log.gaps)} frames were not recorded; "
+                  f"attempts are replayed up to their first missing frame")
+        for n in ([args.attempt] if args.attempt else range(1, len(log.attempts) + 1)):
+            rp = Replay(log, n)
+            if args.seek is not None or args.show:
+                if args.seek is not None:
+                    rp.seek_time(args.seek)
+                b = rp.sim.bird
+                print(f"{path} attempt {n} frame {rp.frame - rp.start}: score {rp.sim.score} "
+                      f"bird y {b.rect.centery} vy {b.vy:.1f} pipes {len(rp.sim.pipes.pipes)}")
+                if args.show:
+                    _show(rp, args.speed)
+                continue
+            res = rp.run(verify=not args.no_verify)
+            total_frames += res.frames
+            ok = res.mismatches == 0 and res.score == res.recorded_score
+            failed += not ok
+            print(f"{path} attempt {n}: {res.frames} frames, score {res.score} (recorded {res.recorded_score})"
+                  + ("" if ok else f"  MISMATCH x{res.mismatches} from frame {res.first_mismatch}")
+                  + ("" if res.missing_from is None else f"  INCOMPLETE: not recorded from frame {res.missing_from}"))
+    el = time.perf_counter() - t0
+    if total_frames:
+        print(f"replayed {total_frames} frames in {el:.2f}s ({total_frames / el:,.0f} frames/s)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
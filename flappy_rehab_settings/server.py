@@ -0,0 +1,533 @@
+"""Clinic server: several rehab stations driven from one PC.
+
+Each station is a headless Simulation fed by its own sensor stream (a serial port, or a TCP /
+Unix socket standing in for a device), read with asyncio and decoded/filtered exactly like the
+game's rehab input. All stations advance together on one 60 Hz tick. Viewers connect to a local
+socket, pick a station and receive one JSON state line per tick.
+
+    python server.py serve --station serial:/dev/ttyUSB0 --station tcp://127.0.0.1:9001 --listen unix:/tmp/flappy.sock
+    python server.py serve --demo 8 --stats-every 5        # 8 synthetic devices, print per-station stats
+    python server.py serve --demo 16 --shards 2 --listen tcp://127.0.0.1:8700   # shard k listens on port + k
+    python server.py watch --connect unix:/tmp/flappy.sock --station 3
+    python server.py stats --connect unix:/tmp/flappy.sock
+
+Viewer protocol, one JSON object per line: send {"watch": id}, {"reset": id} or {"stats": true}.
+State lines look like {"station", "t", "score", "alive", "bird": [x, y, w, h], "ground",
+"pipes": [[x, gap_y, gap, width], ...]}. A viewer that falls behind misses frames instead of
+delaying everyone else.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, math, multiprocessing, random, socket, sys, threading, time
+from collections import deque
+from dataclasses import replace
+from sim import Simulation, InputSample, FixedStep
+from input import make_decoder, make_filters, encode_frame
+from settings import Settings, load_settings
+from config import WINDOW_W, WINDOW_H
+
+try:
+    import serial  # pyserial
+except ImportError:
+    serial = None
+
+TICK_HZ = 60
+RECONNECT_S = 0.5        # wait before reopening a lost device
+RESTART_AFTER = 2.0      # seconds a crashed station shows its crash before the next attempt
+MAX_VIEWER_BACKLOG = 64 * 1024   # bytes queued for a viewer before its frames are skipped
+
+def parse_addr(spec: str) -> tuple:
+    if spec.startswith("tcp://"):
+        host, _, port = spec[6:].rpartition(":")
+        return ("tcp", host or "127.0.0.1", int(port))
+    if spec.startswith("unix:"):
+        return ("unix", spec[5:])
+    if spec.startswith("serial:"):
+        port, _, baud = spec[7:].partition("@")
+        return ("serial", port, int(baud) if baud else None)
+    raise ValueError(f"bad address {spec!r} (tcp://host:port, unix:/path or serial:/dev/x[@baud])")
+
+def format_addr(addr: tuple) -> str:
+    if addr[0] == "tcp":
+        return f"tcp://{addr[1]}:{addr[2]}"
+    if addr[0] == "unix":
+        return f"unix:{addr[1]}"
+    return f"serial:{addr[1]}" + (f"@{addr[2]}" if addr[2] else "")
+
+def shard_addr(addr: tuple, k: int, shards: int) -> tuple:
+    """Listen address of shard k: TCP port + k, or the Unix path with a .k suffix."""
+    if shards == 1:
+        return addr
+    if addr[0] == "tcp":
+        return ("tcp", addr[1], addr[2] + k)
+    return ("unix", f"{addr[1]}.{k}")
+
+def _pct(values, p):
+    if not values:
+        return None
+    v = sorted(values)
+    return v[min(len(v) - 1, int(p * len(v)))]
+
+def _ms(values) -> dict:
+    return {k: None if x is None else round(x * 1e3, 3)
+            for k, x in (("p50", _pct(values, 0.5)), ("p95", _pct(values, 0.95)), ("max", max(values, default=None)))}
+
+class Station:
+    """One patient: device decoding state, a simulation and its viewers."""
+    def __init__(self, sid: int, device: tuple, settings: Settings, size=(WINDOW_W, WINDOW_H)):
+        self.id = sid
+        self.device = device
+        self.settings = settings
+        self.sim = Simulation(*size, settings)
+        self.stepper = FixedStep()
+        self.decoder = make_decoder(settings)
+        self.filters = make_filters(settings)
+        self.value = None           # newest filtered sample; None until the device has sent one
+        self.value_t = 0.0
+        self._prev_val = 0.0
+        self._last_flap = -1e9
+        self._flap = False
+        self.viewers = set()
+        self.connected = False
+        self.dead_since = None
+        self.attempts = 0
+        self.best = 0
+        self.samples = 0
+        self.reconnects = 0
+        self.sent = 0
+        self.skipped = 0            # state lines not sent because a viewer was behind
+        self.input_age = deque(maxlen=600)   # newest sample -> tick that used it
+        self.step_time = deque(maxlen=600)
+        self.reset()
+
+    def reset(self):
+        v = self._value01()
+        self.sim.reset(v if self.settings.control_mode == "position" else None)
+        self.stepper.reset()
+        self.attempts += 1
+        self.dead_since = None
+
+    def _value01(self):
+        if self.value is None:
+            return None
+        v = 1.0 - self.value if self.settings.invert_input else self.value
+        return max(0.0, min(1.0, v))
+
+    def feed(self, chunk: bytes, t: float):
+        values = self.decoder.feed(chunk)
+        if not values:
+            return
+        sdt = 1.0 / self.settings.rehab_rate_hz
+        for f in self.filters:
+            values = f.process(values, sdt)
+        self.samples += len(values)
+        # flap mode: rising threshold crossings with a cooldown, as in RehabFingerInput.get_flap
+        thr, cool = self.settings.rehab_flap_threshold, self.settings.rehab_cooldown
+        n = len(values)
+        for i, v in enumerate(values):
+            ts = t - (n - 1 - i) * sdt
+            if self._prev_val < thr <= v and ts - self._last_flap >= cool:
+                self._last_flap = ts
+                self._flap = True
+            self._prev_val = v
+        self.value = values[-1]
+        self.value_t = t
+
+    def tick(self, dt: float, now: float):
+        if self.value is None:       # waiting for the device
+            return
+        if not self.sim.alive:
+            if self.dead_since is None:
+                self.dead_since = now
+            elif now - self.dead_since >= RESTART_AFTER:
+                self.reset()
+            return
+        n = self.stepper.advance(dt)
+        if not n:
+            return
+        self.input_age.append(now - self.value_t)
+        position = self.settings.control_mode == "position"
+        sample = InputSample(self._value01() if position else None, self._flap)
+        self._flap = False
+        t0 = time.perf_counter()
+        for _ in range(n):
+            if not self.sim.step(self.stepper.dt, sample):
+                break
+            if sample.flap:
+                sample = InputSample(sample.value01)
+        self.step_time.append(time.perf_counter() - t0)
+        self.best = max(self.best, self.sim.score)
+
+    def state(self) -> dict:
+        sim = self.sim
+        b = sim.bird.rect
+        return {
+            "station": self.id, "t": round(sim.time, 3), "score": sim.score, "alive": sim.alive,
+            "bird": [b.x, b.y, b.w, b.h], "ground": sim.settings.ground_height,
+            "pipes": [[top.x, (top.bottom + bot.top) // 2, bot.top - top.bottom, top.width]
+                      for top, bot, _ in sim.pipes.pipes],
+        }
+
+    def stats(self) -> dict:
+        d = self.decoder
+        return {
+            "station": self.id, "device": format_addr(self.device), "connected": self.connected,
+            "attempts": self.attempts, "score": self.sim.score, "best": self.best,
+            "samples": self.samples, "malformed": d.malformed, "dropped": d.dropped, "lost": d.lost,
+            "reconnects": self.reconnects, "viewers": len(self.viewers), "sent": self.sent,
+            "skipped": self.skipped, "input_age_ms": _ms(self.input_age), "step_ms": _ms(self.step_time),
+        }
+
+class ClinicServer:
+    def __init__(self, stations: list[Station], listen: tuple | None = None, shard: int = 0):
+        self.stations = {st.id: st for st in stations}
+        self.listen = listen
+        self.shard = shard
+        self.ticks = 0
+        self.late_ticks = 0
+        self.tick_time = deque(maxlen=600)
+        self.tick_jitter = deque(maxlen=600)
+        self._tasks = []
+
+    # ---------- devices ----------
+    async def _device_loop(self, st: Station):
+        while True:
+            try:
+                await self._read_device(st)
+            except (OSError, EOFError):
+                pass
+            if st.connected:
+                st.reconnects += 1
+            st.connected = False
+            st.decoder.reset()
+            await asyncio.sleep(RECONNECT_S)
+
+    async def _read_device(self, st: Station):
+        kind = st.device[0]
+        if kind == "serial":
+            return await self._read_serial(st)
+        if kind == "tcp":
+            reader, writer = await asyncio.open_connection(st.device[1], st.device[2])
+        else:
+            reader, writer = await asyncio.open_unix_connection(st.device[1])
+        st.connected = True
+        try:
+            while chunk := await reader.read(4096):
+                st.feed(chunk, time.monotonic())
+        finally:
+            writer.close()
+
+    async def _read_serial(self, st: Station):
+        # pyserial has no asyncio API; a non-blocking port registered with the loop does the job (POSIX)
+        if serial is None:
+            raise OSError("pyserial is not installed")
+        _, port, baud = st.device
+        ser = serial.Serial(port, baud or st.settings.rehab_baud, timeout=0)
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def readable():
+            try:
+                chunk = ser.read(ser.in_waiting or 1)
+            except serial.SerialException as e:
+                if not done.done():
+                    done.set_exception(OSError(str(e)))
+                return
+            if chunk:
+                st.feed(chunk, time.monotonic())
+
+        loop.add_reader(ser.fileno(), readable)
+        st.connected = True
+        try:
+            await done
+        finally:
+            loop.remove_reader(ser.fileno())
+            ser.close()
+
+    # ---------- simulation tick ----------
+    async def _tick_loop(self):
+        loop = asyncio.get_running_loop()
+        period = 1.0 / TICK_HZ
+        next_t = loop.time()
+        last = time.monotonic()
+        while True:
+            next_t += period
+            delay = next_t - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.late_ticks += 1
+                if delay < -4 * period:     # far behind (machine stalled): don't burst to catch up
+                    next_t = loop.time()
+            now = time.monotonic()
+            dt, last = now - last, now
+            self.tick_jitter.append(abs(dt - period))
+            t0 = time.perf_counter()
+            for st in self.stations.values():
+                st.tick(dt, now)
+            self._broadcast()
+            self.tick_time.append(time.perf_counter() - t0)
+            self.ticks += 1
+
+    def _broadcast(self):
+        for st in self.stations.values():
+            if not st.viewers:
+                continue
+            line = (json.dumps(st.state(), separators=(",", ":")) + "\n").encode()
+            for w in list(st.viewers):
+                if w.transport.is_closing():
+                    st.viewers.discard(w)
+                elif w.transport.get_write_buffer_size() > MAX_VIEWER_BACKLOG:
+                    st.skipped += 1
+                else:
+                    w.write(line)
+                    st.sent += 1
+
+    # ---------- viewers ----------
+    def _station(self, sid):
+        """The station a request names, or None (ids are ints; lists and objects are not keys)."""
+        return self.stations.get(sid) if isinstance(sid, int) else None
+
+    async def _viewer(self, reader, writer):
+        watching = None
+        try:
+            while line := await reader.readline():
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(msg, dict):    # valid JSON but not a request, e.g. 5 or null
+                    continue
+                if "watch" in msg:
+                    if watching is not None:
+                        watching.viewers.discard(writer)
+                    watching = self._station(msg["watch"])
+                    if watching is None:
+                        reply = {"error": f"no station {msg['watch']} on this shard",
+                                 "stations": sorted(self.stations)}
+                    else:
+                        watching.viewers.add(writer)
+                        reply = {"station": watching.id, "size": [watching.sim.w, watching.sim.h]}
+                elif "reset" in msg and self._station(msg["reset"]) is not None:
+                    self._station(msg["reset"]).reset()
+                    reply = {"reset": msg["reset"]}
+                elif "stats" in msg:
+                    reply = {"stats": self.stats()}
+                else:
+                    reply = {"error": "expected watch, reset or stats"}
+                writer.write((json.dumps(reply) + "\n").encode())
+        except ConnectionError:
+            pass
+        finally:
+            if watching is not None:
+                watching.viewers.discard(writer)
+            writer.close()
+
+    def stats(self) -> dict:
+        return {
+            "shard": self.shard, "ticks": self.ticks, "late_ticks": self.late_ticks,
+            "tick_ms": _ms(self.tick_time), "jitter_ms": _ms(self.tick_jitter),
+            "stations": [st.stats() for st in self.stations.values()],
+        }
+
+    async def serve(self, seconds: float | None = None, stats_every: float | None = None):
+        tasks = [asyncio.create_task(self._device_loop(st)) for st in self.stations.values()]
+        tasks.append(asyncio.create_task(self._tick_loop()))
+        if stats_every:
+            tasks.append(asyncio.create_task(self._print_stats(stats_every)))
+        srv = None
+        if self.listen is not None:
+            if self.listen[0] == "tcp":
+                srv = await asyncio.start_server(self._viewer, self.listen[1], self.listen[2])
+            else:
+                srv = await asyncio.start_unix_server(self._viewer, self.listen[1])
+        try:
+            if seconds is None:
+                await asyncio.gather(*tasks)
+            else:
+                await asyncio.sleep(seconds)
+        finally:
+            for t in tasks:
+                t.cancel()
+            if srv is not None:
+                srv.close()
+        return self.stats()
+
+    async def _print_stats(self, every: float):
+        while True:
+            await asyncio.sleep(every)
+            print_stats(self.stats())
+
+def print_stats(s: dict):
+    t = s["tick_ms"]
+    print(f"shard {s['shard']}: {s['ticks']} ticks, {s['late_ticks']} late, tick p95 {t['p95']} ms max {t['max']} ms")
+    for st in s["stations"]:
+        age = st["input_age_ms"]["p95"]
+        print(f"  #{st['station']:<3} {st['device']:<28} {'up' if st['connected'] else 'down':<4} "
+              f"attempt {st['attempts']:<3} score {st['score']:<3} best {st['best']:<3} "
+              f"samples {st['samples']:<7} lost {st['lost']:<4} bad {st['malformed']:<4} input age p95 {age} ms")
+    sys.stdout.flush()
+
+# ---------- synthetic devices (--demo) ----------
+async def start_demo_device(settings: Settings, seed: int):
+    """A TCP server on localhost that streams a slow noisy sine in the configured protocol."""
+    rng = random.Random(seed)
+    rate = settings.rehab_rate_hz
+    binary = settings.rehab_protocol == "binary"
+    freq, phase = rng.uniform(0.1, 0.4), rng.uniform(0, 2 * math.pi)
+
+    async def handle(reader, writer):
+        loop = asyncio.get_running_loop()
+        t0, sent = loop.time(), 0
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                due = int((loop.time() - t0) * rate)
+                out = bytearray()
+                for k in range(sent, due):
+                    v = 0.5 + 0.35 * math.sin(phase + 2 * math.pi * freq * k / rate) + rng.gauss(0.0, 0.02)
+                    v = min(1.0, max(0.0, v))
+                    out += encode_frame(k, [v] * settings.rehab_channels) if binary else b"%.4f\n" % v
+                sent = due
+                writer.write(out)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            writer.close()
+
+    srv = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return srv, ("tcp", "127.0.0.1", srv.sockets[0].getsockname()[1])
+
+async def _run_shard(specs, demo_ids, settings, listen, shard, seconds, stats_every):
+    stations = [Station(sid, addr, replace(settings)) for sid, addr in specs]
+    demo_servers = []
+    for sid in demo_ids:
+        srv, addr = await start_demo_device(settings, seed=sid)
+        demo_servers.append(srv)
+        stations.append(Station(sid, addr, replace(settings)))
+    server = ClinicServer(stations, listen, shard)
+    try:
+        return await server.serve(seconds, stats_every)
+    finally:
+        for srv in demo_servers:
+            srv.close()
+
+def run_shard(specs, demo_ids, settings, listen, shard, seconds=None, stats_every=None, results=None):
+    try:
+        stats = asyncio.run(_run_shard(specs, demo_ids, settings, listen, shard, seconds, stats_every))
+    except KeyboardInterrupt:
+        return
+    if results is not None:
+        results.put(stats)
+    return stats
+
+# ---------- viewer / stats clients ----------
+def _connect(addr: tuple) -> socket.socket:
+    if addr[0] == "tcp":
+        return socket.create_connection((addr[1], addr[2]))
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.connect(addr[1])
+    return s
+
+def watch(addr: tuple, station: int):
+    import pygame as pg
+    from config import COLOR_BG, COLOR_PIPE, COLOR_GROUND, COLOR_BIRD
+    from graphics import render_text
+    sock = _connect(addr)
+    sock.sendall((json.dumps({"watch": station}) + "\n").encode())
+    f = sock.makefile("rb")
+    hello = json.loads(f.readline())
+    if "error" in hello:
+        raise SystemExit(f"{hello['error']} (stations here: {hello.get('stations')})")
+    latest = {}
+
+    def pump():
+        for line in f:
+            latest["state"] = line
+    threading.Thread(target=pump, daemon=True).start()
+
+    pg.init()
+    w, h = hello["size"]
+    screen = pg.display.set_mode((w, h))
+    pg.display.set_caption(f"Flappy Rehab — station {station}")
+    clock = pg.time.Clock()
+    while True:
+        for e in pg.event.get():
+            if e.type == pg.QUIT or (e.type == pg.KEYDOWN and e.key == pg.K_ESCAPE):
+                sock.close()
+                return
+            if e.type == pg.KEYDOWN and e.key == pg.K_r:
+                sock.sendall((json.dumps({"reset": station}) + "\n").encode())
+        line = latest.get("state")
+        if line:
+            st = json.loads(line)
+            floor = h - st["ground"]
+            screen.fill(COLOR_BG)
+            for x, gy, gap, pw in st["pipes"]:
+                pg.draw.rect(screen, COLOR_PIPE, (x, 0, pw, gy - gap // 2), border_radius=6)
+                pg.draw.rect(screen, COLOR_PIPE, (x, gy + gap // 2, pw, floor - (gy + gap // 2)), border_radius=6)
+            screen.fill(COLOR_GROUND, (0, floor, w, st["ground"]))
+            pg.draw.rect(screen, COLOR_BIRD, st["bird"], border_radius=6)
+            screen.blit(render_text(f"Station {station}   Score: {st['score']}", 18), (10, 8))
+            if not st["alive"]:
+                screen.blit(render_text("Crashed — restarting", 18, (255, 180, 180)), (10, 32))
+            pg.display.flip()
+        clock.tick(60)
+
+def query_stats(addr: tuple) -> dict:
+    with _connect(addr) as sock:
+        sock.sendall(b'{"stats": true}\n')
+        return json.loads(sock.makefile("rb").readline())["stats"]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sv = sub.add_parser("serve")
+    sv.add_argument("--station", action="append", default=[], metavar="ADDR",
+                    help="device of one station: serial:/dev/x[@baud], tcp://host:port or unix:/path")
+    sv.add_argument("--demo", type=int, default=0, metavar="N", help="add N stations with synthetic devices")
+    sv.add_argument("--listen", default="unix:/tmp/flappy_rehab.sock", help="viewer socket (tcp://host:port or unix:/path)")
+    sv.add_argument("--shards", type=int, default=1, help="split the stations over this many processes")
+    sv.add_argument("--settings", help="settings.json for every station (default: the game's)")
+    sv.add_argument("--seconds", type=float, help="stop after this long and print the stats")
+    sv.add_argument("--stats-every", type=float, metavar="S")
+    w = sub.add_parser("watch")
+    w.add_argument("--connect", default="unix:/tmp/flappy_rehab.sock")
+    w.add_argument("--station", type=int, default=0)
+    st = sub.add_parser("stats")
+    st.add_argument("--connect", default="unix:/tmp/flappy_rehab.sock")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "watch":
+        return watch(parse_addr(args.connect), args.station)
+    if args.cmd == "stats":
+        print(json.dumps(query_stats(parse_addr(args.connect)), indent=2))
+        return 0
+
+    settings = load_settings(args.settings) if args.settings else load_settings()
+    specs = list(enumerate(parse_addr(s) for s in args.station))
+    demo_ids = list(range(len(specs), len(specs) + args.demo))
+    if not specs and not demo_ids:
+        ap.error("no stations: give --station and/or --demo")
+    listen = parse_addr(args.listen)
+    n = max(1, args.shards)
+    shard_jobs = [([s for s in specs if s[0] % n == k], [i for i in demo_ids if i % n == k],
+                   settings, shard_addr(listen, k, n), k, args.seconds, args.stats_every) for k in range(n)]
+    if n == 1:
+        stats = [run_shard(*shard_jobs[0])]
+    else:
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=run_shard, args=job + (results,), daemon=True) for job in shard_jobs]
+        for p in procs:
+            p.start()
+        try:
+            stats = [results.get() for _ in procs] if args.seconds else []
+            for p in procs:
+                p.join()
+        except KeyboardInterrupt:
+            stats = []
+    for s in stats:
+        if s is not None:
+            print_stats(s)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
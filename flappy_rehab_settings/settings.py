@@ -1,9 +1,9 @@
 """Runtime game settings with disk persistence (settings.json).
-Edit settings.json or press F5 in-game to hot-reload.
+Edit settings.json and the game picks it up within a frame or two (F5 / Shift+S forces a reload).
 """
 from __future__ import annotations
-import json, os
-from dataclasses import dataclass, asdict
+import json, os, sys, threading
+from dataclasses import dataclass, asdict, fields
 
 DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "settings.json")
 
@@ -19,6 +19,16 @@ class Settings:
     rehab_baud: int = 115200
     rehab_flap_threshold: float = 0.65
     rehab_cooldown: float = 0.18
+    rehab_protocol: str = "ascii"    # "ascii" (one float per line) | "binary" (framed, see input.py)
+    rehab_channels: int = 1          # binary: samples per frame
+    rehab_channel: int = 0           # binary: which channel drives the bird
+    rehab_rate_hz: float = 100.0     # nominal device rate, used to timestamp samples within a block
+    rehab_filter: str = "none"       # "none" | "moving_average" | "one_euro"
+    rehab_filter_window: int = 8     # moving_average: samples
+    rehab_one_euro_min_cutoff: float = 1.0
+    rehab_one_euro_beta: float = 0.5
+    rehab_cal_min: float = 0.0       # per-patient calibration: raw range mapped onto 0..1
+    rehab_cal_max: float = 1.0
 
     # Gameplay tuning
     gravity: float = 1200.0
@@ -33,26 +43,173 @@ class Settings:
     # Difficulty preset name (not enforced, just informational)
     difficulty: str = "normal"  # "easy" | "normal" | "hard"
 
-def load_settings(path: str = DEFAULT_PATH) -> Settings:
+    # Session recording (binary .frrec files, see recorder.py)
+    record_sessions: bool = False
+    record_dir: str = "sessions"     # relative paths are resolved next to settings.json
+
+    # Session history (SQLite, see history.py): one row per run, written by main.py
+    history_db: str = "history.sqlite3"   # relative paths are resolved next to settings.json; "" = off
+    patient_id: str = ""                  # stored with every run
+
+    # Garbage collection: "scheduled" keeps the collector out of play, "auto" leaves it alone (see gcpolicy.py)
+    gc_mode: str = "scheduled"
+
+# ---- Validation ----
+_TYPES = {"str": str, "int": int, "float": float, "bool": bool}
+
+CHOICES = {
+    "control_mode": ("flap", "position"),
+    "input_mode": ("keyboard", "rehab", "slider"),
+    "difficulty": ("easy", "normal", "hard"),
+    "rehab_protocol": ("ascii", "binary"),
+    "rehab_filter": ("none", "moving_average", "one_euro"),
+    "gc_mode": ("auto", "scheduled"),
+}
+
+RANGES = {
+    "rehab_baud": (300, 4_000_000),
+    "rehab_flap_threshold": (0.0, 1.0),
+    "rehab_cooldown": (0.0, 5.0),
+    "rehab_channels": (1, 16),
+    "rehab_channel": (0, 15),
+    "rehab_rate_hz": (1.0, 20_000.0),
+    "rehab_filter_window": (1, 1024),
+    "rehab_one_euro_min_cutoff": (0.01, 100.0),
+    "rehab_one_euro_beta": (0.0, 100.0),
+    "rehab_cal_min": (0.0, 1.0),
+    "rehab_cal_max": (0.0, 1.0),
+    "gravity": (0.0, 10_000.0),
+    "flap_impulse": (-3000.0, 0.0),
+    "max_fall_speed": (1.0, 5000.0),
+    "ground_height": (0, 300),
+    "pipe_gap": (40, 500),
+    "pipe_width": (10, 200),
+    "pipe_spawn_every": (0.2, 10.0),
+    "pipe_speed": (-2000.0, -1.0),
+}
+
+def validate(data: dict) -> tuple[Settings, list[str]]:
+    """Build Settings from a parsed dict. Bad entries keep their default and are reported."""
     s = Settings()
+    errors = []
+    if not isinstance(data, dict):
+        return s, ["top level must be a JSON object"]
+    types = {f.name: _TYPES[f.type] for f in fields(Settings)}
+    for k, v in data.items():
+        t = types.get(k)
+        if t is None:
+            errors.append(f"{k}: unknown setting")
+            continue
+        if t is float and isinstance(v, int) and not isinstance(v, bool):
+            v = float(v)
+        if type(v) is not t:
+            errors.append(f"{k}: expected {t.__name__}, got {type(v).__name__}")
+            continue
+        if k in CHOICES and v not in CHOICES[k]:
+            errors.append(f"{k}: {v!r} not one of {', '.join(CHOICES[k])}")
+            continue
+        if k in RANGES:
+            lo, hi = RANGES[k]
+            if not (lo <= v <= hi):
+                errors.append(f"{k}: {v} outside [{lo}, {hi}]")
+                continue
+        setattr(s, k, v)
+    return s, errors
+
+def read_settings(path: str = DEFAULT_PATH) -> tuple[Settings, list[str]]:
+    if not os.path.exists(path):
+        return Settings(), []
     try:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            for k, v in data.items():
-                if hasattr(s, k):
-                    setattr(s, k, v)
-    except Exception:
-        pass
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        return Settings(), [f"{os.path.basename(path)}: {e}"]
+    return validate(data)
+
+def load_settings(path: str = DEFAULT_PATH) -> Settings:
+    s, errors = read_settings(path)
+    for e in errors:
+        print(f"settings: {e}", file=sys.stderr)
     return s
 
 def save_settings(s: Settings, path: str = DEFAULT_PATH) -> None:
+    # write-then-rename so a watcher never sees a half-written file
+    tmp = path + ".tmp"
     try:
-        with open(path, "w", encoding="utf-8") as f:
+        with open(tmp, "w", encoding="utf-8") as f:
             json.dump(asdict(s), f, indent=2)
-    except Exception:
+        os.replace(tmp, path)
+    except OSError:
         pass
 
+class SettingsWatcher(threading.Thread):
+    """Watches settings.json by (mtime, size) and parses/validates changes off the render thread.
+
+    The game calls poll() once per frame: it returns a freshly built Settings snapshot the first
+    time after a change and None otherwise (one attribute read when idle; the hand-over itself is
+    a swap under a lock). Published snapshots are never touched again by the watcher.
+    """
+    def __init__(self, path: str = DEFAULT_PATH, interval: float = 0.25):
+        super().__init__(name="settings-watcher", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.errors = []
+        self.reloads = 0
+        self.current, errors = read_settings(path)
+        self._report(errors)
+        self._stamp = self._stat()
+        self._pending = None
+        self._lock = threading.Lock()    # guards _pending and _force
+        self._wake = threading.Event()
+        self._force = False
+        self._stop_evt = threading.Event()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _report(self, errors):
+        self.errors = errors
+        for e in errors:
+            print(f"settings: {e}", file=sys.stderr)
+
+    def request_reload(self):
+        """Re-read the file on the watcher thread even if it looks unchanged."""
+        with self._lock:
+            self._force = True
+        self._wake.set()
+
+    def poll(self) -> Settings | None:
+        if self._pending is None:    # a stale None only delays the snapshot by a frame
+            return None
+        with self._lock:
+            snap, self._pending = self._pending, None
+        return snap
+
+    def stop(self):
+        self._stop_evt.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stop_evt.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            stamp = self._stat()
+            with self._lock:
+                force, self._force = self._force, False
+            if stamp == self._stamp and not force:
+                continue
+            self._stamp = stamp
+            snap, errors = read_settings(self.path)
+            self._report(errors)
+            self.reloads += 1
+            self.current = snap
+            with self._lock:
+                self._pending = snap
+
 # ---- Persona presets ----
 PRESETS = {
     # "slower, bigger gaps"
@@ -78,6 +235,13 @@ PRESETS = {
     },
 }
 
+def preset_of(settings: dict) -> str:
+    """Name of the preset `settings` (an asdict) matches, or "custom"."""
+    for name, values in PRESETS.items():
+        if all(settings.get(k) == v for k, v in values.items()):
+            return name
+    return "custom"
+
 def apply_preset(s: Settings, preset_key: str) -> Settings:
     d = PRESETS.get(preset_key)
     if not d:
@@ -0,0 +1,153 @@
+"""Headless game core: Bird/PipeManager/Ground + scoring, stepped explicitly.
+
+No display, no event queue, no wall clock: the caller owns dt and the input sample,
+so the same rules run interactively (Game), faster than real time (bots, tests) or in bulk.
+Interactively, FixedStep turns variable frame times into whole PHYSICS_HZ steps and the
+leftover fraction is used to interpolate what gets drawn.
+"""
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from entities import Bird, PipeManager, Ground, Course
+from settings import Settings
+from config import WINDOW_W, WINDOW_H, PHYSICS_HZ, MAX_CATCHUP_STEPS
+
+@dataclass
+class InputSample:
+    value01: float | None = None   # position-mode reading in [0..1] (already inverted), None = no analog input
+    flap: bool = False
+
+class Simulation:
+    def __init__(self, w: int, h: int, settings: Settings, pipes_cls=PipeManager):
+        self.w, self.h = w, h
+        self.settings = settings
+        self.pipes_cls = pipes_cls   # PipeManager, or pipearray.PipeArray for the NumPy store
+        self.reset()
+
+    def reset(self, value01: float | None = None, seed: int | None = None):
+        """Start a new attempt. The course is drawn from `seed` (a fresh random seed if None)."""
+        self.course = Course(seed)
+        self.seed = self.course.seed
+        self.start_value = value01
+        self.bird = Bird(self.settings)
+        self.ground = Ground(self.w, self.h, self.settings)
+        self.pipes = self.pipes_cls(self.w, self.h, self.settings, self.course)
+        self.score = 0
+        self.alive = True
+        self.frame = 0
+        self.time = 0.0
+        if value01 is not None:
+            self.bird.place(self.target_from_value(value01))
+
+    def set_settings(self, settings: Settings):
+        self.settings = settings
+        self.ground.settings = settings
+        self.pipes.settings = settings
+        self.bird.settings = settings
+
+    def target_from_value(self, v01: float) -> int:
+        playable_top = 0
+        playable_bot = self.h - self.settings.ground_height
+        return int(playable_bot - v01 * (playable_bot - playable_top))
+
+    def step(self, dt: float, sample: InputSample) -> bool:
+        """Advance one frame. Returns False once the bird has crashed (further steps are no-ops)."""
+        if not self.alive:
+            return False
+        if self.settings.control_mode == "position" and sample.value01 is not None:
+            self.bird.update_position_control(dt, self.target_from_value(sample.value01))
+        else:
+            self.bird.update(dt, sample.flap)
+
+        self.pipes.update(dt)
+        self.ground.update(dt)
+        self.score += self.pipes.count_passed(self.bird.rect)
+        self.frame += 1
+        self.time += dt
+
+        if self.pipes.collides(self.bird.rect) or self.ground.collides(self.bird.rect):
+            self.alive = False
+        return self.alive
+
+    def add_sprites(self, batch: list, dirty: list, alpha: float = 1.0):
+        self.pipes.add_sprites(batch, dirty, alpha)
+        self.ground.add_sprites(batch, dirty, alpha)
+        self.bird.add_sprites(batch, dirty, alpha)
+
+    def draw(self, surf):
+        batch = []
+        self.add_sprites(batch, [])
+        surf.blits(batch, doreturn=False)
+
+class FixedStep:
+    """Fixed-timestep accumulator: feed it frame times, it hands back how many physics steps are due.
+
+    After a hitch at most `max_steps` run in one frame; the rest of the backlog is dropped
+    (counted in `dropped`) so a slow machine plays slower instead of spiralling.
+    """
+    def __init__(self, hz: float = PHYSICS_HZ, max_steps: int = MAX_CATCHUP_STEPS):
+        self.dt = 1.0 / hz
+        self.max_steps = max_steps
+        self.acc = 0.0
+        self.dropped = 0.0    # seconds of game time skipped
+
+    def reset(self):
+        self.acc = 0.0
+
+    def advance(self, frame_dt: float) -> int:
+        self.acc += frame_dt
+        n = int(self.acc / self.dt)
+        if n > self.max_steps:
+            self.dropped += (n - self.max_steps) * self.dt
+            self.acc -= (n - self.max_steps) * self.dt
+            n = self.max_steps
+        self.acc -= n * self.dt
+        if self.acc < 0.0:   # float round-off
+            self.acc = 0.0
+        return n
+
+    @property
+    def alpha(self) -> float:
+        """How far the display is between the last two physics states (0..1)."""
+        return min(1.0, self.acc / self.dt)
+
+def run(sim: Simulation, policy, dt: float = 1 / PHYSICS_HZ, max_frames: int = 60 * 60 * 10) -> int:
+    """Step `sim` with `policy(sim) -> InputSample` until it crashes or max_frames; returns frames run."""
+    n = 0
+    while n < max_frames:
+        n += 1
+        if not sim.step(dt, policy(sim)):
+            break
+    return n
+
+if __name__ == "__main__":
+    import argparse
+    from settings import load_settings
+
+    ap = argparse.ArgumentParser(description="Headless simulation throughput check.")
+    ap.add_argument("--frames", type=int, default=100_000)
+    ap.add_argument("--pipes", choices=("list", "array"), default="list")
+    args = ap.parse_args()
+    pipes_cls = PipeManager
+    if args.pipes == "array":
+        from pipearray import PipeArray as pipes_cls
+
+    s = load_settings()
+    s.control_mode = "position"
+    sim = Simulation(WINDOW_W, WINDOW_H, s, pipes_cls)
+
+    def follow_gap(sim):
+        # aim for the centre of the next pipe's gap
+        gap_mid = sim.pipes.next_gap(sim.bird.rect.left)
+        if gap_mid is None:
+            return InputSample(value01=0.5)
+        return InputSample(value01=1.0 - gap_mid / (sim.h - s.ground_height))
+
+    total, crashes = 0, 0
+    t0 = time.perf_counter()
+    while total < args.frames:
+        total += run(sim, follow_gap, max_frames=args.frames - total)
+        crashes += not sim.alive
+        sim.reset(0.5)
+    el = time.perf_counter() - t0
+    print(f"{total} frames in {el:.2f}s -> {total / el:,.0f} frames/s ({crashes} crashes)")
@@ -0,0 +1,184 @@
+"""Sprite atlas: all artwork in one converted surface, plus cached slices derived from it.
+
+Artwork comes from assets/atlas.png with its region index assets/atlas.json
+({"bird": [x, y, w, h], ...}) when those exist, otherwise it is painted once at startup.
+Entities append (surface, dest[, area]) items to a batch list and the caller draws the
+whole frame with one Surface.blits call. Anything that has to be resized (pipe caps for a
+non-default pipe width, tall pipe bodies, the ground strip, button frames) is built once per
+size and kept, so a frame is only blits of converted surfaces.
+"""
+from __future__ import annotations
+import json
+import os
+import pygame as pg
+from pygame import Rect
+from config import COLOR_BIRD, COLOR_PIPE, COLOR_GROUND
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+TILE_W = 32          # ground tile width; Ground.scroll wraps at this
+CAP_H = 12           # pipe lip at the gap end
+BUTTON_BORDER = 10   # button corners kept unscaled (nine-slice)
+PIPE_W = 60          # pipe width the generated art is painted at (Settings default)
+PAD = 2
+
+def _shade(color, k: float):
+    return tuple(max(0, min(255, int(c * k))) for c in color)
+
+# ---------- generated artwork ----------
+def _paint_bird(surf, r: Rect):
+    pg.draw.rect(surf, _shade(COLOR_BIRD, 0.7), r, border_radius=6)
+    pg.draw.rect(surf, COLOR_BIRD, r.inflate(-2, -2), border_radius=5)
+    wing = Rect(0, 0, max(8, r.width // 3), 6)
+    wing.center = (r.centerx - 4, r.centery + 2)
+    pg.draw.rect(surf, (255, 240, 140), wing, border_radius=3)
+    pg.draw.circle(surf, (255, 255, 255), (r.right - 8, r.top + 7), 3)
+    pg.draw.circle(surf, (20, 20, 20), (r.right - 7, r.top + 7), 1)
+    pg.draw.polygon(surf, (240, 130, 40), [(r.right - 6, r.centery), (r.right - 1, r.centery + 2), (r.right - 6, r.centery + 4)])
+
+def _paint_pipe_column(surf, r: Rect):
+    surf.fill(_shade(COLOR_PIPE, 0.6), r)
+    surf.fill(COLOR_PIPE, (r.x + 2, r.y, r.width - 4, r.height))
+    surf.fill(_shade(COLOR_PIPE, 1.35), (r.x + 6, r.y, max(2, r.width // 8), r.height))
+    surf.fill(_shade(COLOR_PIPE, 0.8), (r.right - 2 - r.width // 6, r.y, r.width // 6, r.height))
+
+def _paint_pipe_cap(surf, r: Rect):
+    pg.draw.rect(surf, _shade(COLOR_PIPE, 0.5), r, border_radius=3)
+    inner = r.inflate(-2, -2)
+    sub = surf.subsurface(inner)
+    _paint_pipe_column(sub, sub.get_rect())
+    surf.fill(_shade(COLOR_PIPE, 1.2), (inner.x, inner.y, inner.width, 2))
+
+def _paint_ground(surf, r: Rect):
+    surf.fill(COLOR_GROUND, r)
+    surf.fill((95, 160, 70), (r.x, r.y, r.width, 4))
+    surf.fill((70, 125, 55), (r.x, r.y + 4, r.width, 2))
+    pg.draw.rect(surf, (120, 95, 70), (r.x, r.y + 8, TILE_W // 2, 10), border_radius=3)
+
+def _button_painter(fill):
+    def paint(surf, r: Rect):
+        pg.draw.rect(surf, fill, r, border_radius=BUTTON_BORDER)
+        pg.draw.rect(surf, (200, 220, 240), r, width=2, border_radius=BUTTON_BORDER)
+    return paint
+
+def _layout(pipe_w: int):
+    return (
+        ("bird", (28, 22), _paint_bird),
+        ("pipe_cap", (pipe_w, CAP_H), _paint_pipe_cap),
+        ("pipe_body", (pipe_w, 8), _paint_pipe_column),
+        ("ground", (TILE_W, 24), _paint_ground),
+        ("button", (3 * BUTTON_BORDER, 3 * BUTTON_BORDER), _button_painter((70, 90, 110))),
+        ("button_hover", (3 * BUTTON_BORDER, 3 * BUTTON_BORDER), _button_painter((90, 115, 140))),
+    )
+
+class Atlas:
+    """One convert_alpha() surface holding every sprite; `regions` maps names to their rects."""
+    def __init__(self, surface: pg.Surface, regions: dict):
+        self.surface = surface
+        self.regions = {k: Rect(v) for k, v in regions.items()}
+        self._scaled = {}
+        self._bodies = {}      # pipe width -> tall body column
+        self._ground = {}
+        self._frames = {}
+
+    @classmethod
+    def generate(cls, pipe_w: int = PIPE_W) -> "Atlas":
+        items = _layout(pipe_w)
+        w = sum(size[0] + PAD for _, size, _ in items)
+        h = max(size[1] for _, size, _ in items)
+        surf = pg.Surface((w, h), pg.SRCALPHA)
+        regions, x = {}, 0
+        for name, size, paint in items:
+            r = Rect((x, 0), size)
+            paint(surf, r)
+            regions[name] = r
+            x += size[0] + PAD
+        return cls(surf.convert_alpha(), regions)
+
+    @classmethod
+    def load(cls, image: str, index: str) -> "Atlas":
+        with open(index, encoding="utf-8") as f:
+            regions = json.load(f)
+        return cls(pg.image.load(image).convert_alpha(), regions)
+
+    def area(self, name: str) -> Rect:
+        return self.regions[name]
+
+    def sprite(self, name: str, size) -> tuple:
+        """(surface, area) drawing region `name` at `size`; a resized copy is made once per size."""
+        r = self.regions[name]
+        if r.size == tuple(size):
+            return self.surface, r
+        key = (name, tuple(size))
+        img = self._scaled.get(key)
+        if img is None:
+            img = self._scaled[key] = pg.transform.smoothscale(self.surface.subsurface(r), size).convert_alpha()
+        return img, img.get_rect()
+
+    def pipe_body(self, width: int, height: int) -> pg.Surface:
+        """Body column at least `height` tall, tiled from the atlas slice; blit it with an area rect."""
+        col = self._bodies.get(width)
+        if col is None or col.get_height() < height:
+            tile, area = self.sprite("pipe_body", (width, self.regions["pipe_body"].height))
+            h = max(height, 1)
+            col = pg.Surface((width, h)).convert()
+            for y in range(0, h, area.height):
+                col.blit(tile, (0, y), area)
+            self._bodies[width] = col
+        return col
+
+    def ground_strip(self, w: int, h: int) -> pg.Surface:
+        """Ground tiles repeated across w + TILE_W, so scrolling is a moving area rect."""
+        strip = self._ground.get((w, h))
+        if strip is None:
+            strip = pg.Surface((w + TILE_W, h)).convert()
+            strip.fill(COLOR_GROUND)
+            tile = self.regions["ground"]
+            for x in range(0, w + TILE_W, tile.width):
+                strip.blit(self.surface, (x, 0), tile)
+            self._ground[(w, h)] = strip
+        return strip
+
+    def frame(self, name: str, size) -> pg.Surface:
+        """Nine-slice `name` stretched to `size` (corners kept as drawn)."""
+        key = (name, tuple(size))
+        img = self._frames.get(key)
+        if img is None:
+            r, b = self.regions[name], BUTTON_BORDER
+            w, h = size
+            img = pg.Surface(size, pg.SRCALPHA)
+            xs = ((0, b, 0, b), (b, r.width - 2 * b, b, w - 2 * b), (r.width - b, b, w - b, b))
+            ys = ((0, b, 0, b), (b, r.height - 2 * b, b, h - 2 * b), (r.height - b, b, h - b, b))
+            for sx, sw, dx, dw in xs:
+                for sy, sh, dy, dh in ys:
+                    if dw > 0 and dh > 0:
+                        part = self.surface.subsurface((r.x + sx, r.y + sy, sw, sh))
+                        img.blit(pg.transform.scale(part, (dw, dh)), (dx, dy))
+            img = self._frames[key] = img.convert_alpha()
+        return img
+
+    def add_pipe(self, batch: list, rect: Rect, cap_at_bottom: bool):
+        """Batch one pipe half: a lip at the gap end and a body cropped from the tall column."""
+        if rect.height <= 0 or rect.width <= 0:
+            return
+        cap, cap_area = self.sprite("pipe_cap", (rect.width, CAP_H))
+        cap_h = min(CAP_H, rect.height)
+        body_h = rect.height - cap_h
+        if body_h:
+            body_y = rect.y if cap_at_bottom else rect.y + cap_h
+            batch.append((self.pipe_body(rect.width, body_h), (rect.x, body_y), (0, 0, rect.width, body_h)))
+        cap_y = rect.bottom - cap_h if cap_at_bottom else rect.y
+        cut = CAP_H - cap_h if cap_at_bottom else 0   # a pipe shorter than its lip shows the gap end
+        batch.append((cap, (rect.x, cap_y), (cap_area.x, cap_area.y + cut, rect.width, cap_h)))
+
+_atlas = None
+
+def get_atlas() -> Atlas:
+    """The shared atlas (needs a display mode, for convert_alpha)."""
+    global _atlas
+    if _atlas is None:
+        image, index = os.path.join(ASSET_DIR, "atlas.png"), os.path.join(ASSET_DIR, "atlas.json")
+        if os.path.exists(image) and os.path.exists(index):
+            _atlas = Atlas.load(image, index)
+        else:
+            _atlas = Atlas.generate()
+    return _atlas
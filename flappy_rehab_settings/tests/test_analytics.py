@@ -0,0 +1,21 @@
+import math
+from dataclasses import asdict
+import pytest
+import analytics
+from recorder import SessionRecorder, NAN, FLAG_ALIVE
+from settings import Settings
+
+@pytest.mark.parametrize("control_mode", ["flap", "position"])
+def test_nan_signal_session(tmp_path, control_mode):
+    """Keyboard sessions record no rehab signal (raw and value are NaN)."""
+    path = str(tmp_path / "keyboard.frrec")
+    settings = asdict(Settings(control_mode=control_mode, input_mode="keyboard"))
+    rec = SessionRecorder(path, dict(settings=settings, size=(400, 600)), block_records=64)
+    for i in range(300):
+        rec.record(i / 60, 1 / 60, i, i // 150, NAN, NAN, i % 20 == 0, FLAG_ALIVE, i // 60, 300.0, 0.0, [])
+    rec.close()
+
+    row = analytics.analyze_file(path)
+    assert row["frames"] == 300
+    assert row["attempts"] == 2
+    assert math.isnan(row["rom"]) and math.isnan(row["jerk_rms"])
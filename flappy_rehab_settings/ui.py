@@ -1,4 +1,6 @@
 import pygame as pg
+from graphics import render_text
+from sprites import get_atlas
 
 class VerticalSlider:
     """Value in [0..1], 0 at bottom, 1 at top."""
@@ -49,32 +51,65 @@ class Button:
     def __init__(self, rect, label, on_click=None):
         import pygame as pg
         self.rect = pg.Rect(rect)
+        self.dirty = True          # needs drawing (hover or label changed since the last draw)
         self.label = label
         self.on_click = on_click
         self.hover = False
+        self._label_img = None
+        self._label_src = None
+        self._label_rect = None
+
+    @property
+    def label(self) -> str:
+        return self._label
+
+    @label.setter
+    def label(self, text: str):
+        if text != getattr(self, "_label", None):
+            self._label = text
+            self.dirty = True
 
     def handle_event(self, event):
         import pygame as pg
         if event.type == pg.MOUSEMOTION:
-            self.hover = self.rect.collidepoint(event.pos)
+            hover = bool(self.rect.collidepoint(event.pos))
+            if hover != self.hover:
+                self.hover = hover
+                self.dirty = True
         elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
             if self.rect.collidepoint(event.pos) and self.on_click:
                 self.on_click()
 
     def draw(self, surf):
-        import pygame as pg
-        bg = (70, 90, 110) if not self.hover else (90, 115, 140)
-        pg.draw.rect(surf, bg, self.rect, border_radius=10)
-        pg.draw.rect(surf, (200, 220, 240), self.rect, width=2, border_radius=10)
-        # label
-        font = pg.font.SysFont("arial", 20)
-        img = font.render(self.label, True, (240, 250, 255))
-        r = img.get_rect(center=self.rect.center)
-        surf.blit(img, r)
+        surf.blit(get_atlas().frame("button_hover" if self.hover else "button", self.rect.size), self.rect)
+        # label (re-rendered only when it changes)
+        if self._label_src != self.label or self._label_rect.center != self.rect.center:
+            self._label_src = self.label
+            self._label_img = render_text(self.label, 20, (240, 250, 255))
+            self._label_rect = self._label_img.get_rect(center=self.rect.center)
+        surf.blit(self._label_img, self._label_rect)
+        self.dirty = False
+
+def coalesce_motion(events):
+    """Drop every MOUSEMOTION that is immediately followed by another one; only the latest position matters."""
+    import pygame as pg
+    out = []
+    for e in events:
+        if e.type == pg.MOUSEMOTION and out and out[-1].type == pg.MOUSEMOTION:
+            out[-1] = e
+        else:
+            out.append(e)
+    return out
+
+def route_pointer(buttons, event):
+    """Give a pointer event only to the buttons it can affect (under the pointer, or losing hover)."""
+    pos = getattr(event, "pos", None)
+    for b in buttons:
+        if pos is None or b.hover or b.rect.collidepoint(pos):
+            b.handle_event(event)
 
 def draw_label(surf, text, center_x, y):
     import pygame as pg
-    font = pg.font.SysFont("arial", 20)
-    img = font.render(text, True, (220, 235, 250))
+    img = render_text(text, 20, (220, 235, 250))
     rect = img.get_rect(midtop=(center_x, y))
     surf.blit(img, rect)